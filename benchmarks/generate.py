@@ -0,0 +1,249 @@
+# Synthetic show tech generator
+#
+# Writes the output of "show tech-support" of a number of made up Cisco
+# switches, with the sections that tech2xl reads (show version, show
+# running-config, show interfaces, show interfaces status, show cdp
+# neighbors, show cdp neighbors detail, show inventory, show diag) and some
+# that it skips. The same arguments always give the same text.
+#
+# usage: python benchmarks/generate.py [--devices N] [--interfaces N] [--neighbors N] <output file>
+#
+# It can also be used from other scripts:
+#
+#   import generate
+#   with open("big.txt", "w") as outfile:
+#       generate.write_devices(outfile, devices=1000)
+
+import sys
+import argparse
+import random
+
+
+models = [("WS-C3750X-48P", "c3750e-universalk9-mz.150-2.SE11"),
+          ("WS-C2960X-48FPD-L", "c2960x-universalk9-mz.152-4.E10"),
+          ("WS-C3850-48P", "cat3k_caa-universalk9.16.12.05b.SPA")]
+
+
+def header(title):
+    return "------------------ %s ------------------\n\n" % title
+
+
+def device_name(number):
+    return "sw%05d" % number
+
+
+def port(interface):
+    return "1/0/%d" % (interface + 1)
+
+
+def serial(rnd):
+    return "FOC%08d" % rnd.randrange(100000000)
+
+
+def mac(device, interface):
+    return "0011.%04x.%04x" % (device & 0xffff, interface)
+
+
+# Neighbors of a device: (local interface, neighbor number, remote interface).
+# The neighbors are the devices before and after this one, on the last ports,
+# and they have this device as a neighbor too
+def neighbors_of(device, devices, interfaces, neighbors):
+    result = []
+    for n in range(min(neighbors, interfaces, devices - 1)):
+        distance = n // 2 + 1
+        neighbor = (device + distance if n % 2 == 0 else device - distance) % devices
+        remote = n ^ 1 if n ^ 1 < interfaces else n
+        result.append((interfaces - 1 - n, neighbor, interfaces - 1 - remote))
+    return result
+
+
+def show_version(out, rnd, name, model, image):
+    out.write(header("show version"))
+    out.write("Cisco IOS Software, C3750E Software (C3750E-UNIVERSALK9-M), Version 15.0(2)SE11, RELEASE SOFTWARE\n")
+    out.write("ROM: Bootstrap program is C3750E boot loader\n")
+    out.write("%s uptime is %d weeks, %d days, %d hours\n" % (name, rnd.randrange(200), rnd.randrange(7),
+                                                          rnd.randrange(24)))
+    out.write('System image file is "flash:%s.bin"\n' % image)
+    out.write("cisco %s (PowerPC405) processor (revision A0) with 262144K bytes of memory.\n" % model)
+    out.write("Processor board ID %s\n" % serial(rnd))
+    out.write("Motherboard serial number       : %s\n" % serial(rnd))
+    out.write("Model number                    : %s\n\n" % model)
+
+
+def show_running_config(out, rnd, number, name, interfaces, links):
+    out.write(header("show running-config"))
+    out.write("Building configuration...\n\nCurrent configuration : 12345 bytes\n!\n")
+    out.write("version 15.0\nservice timestamps debug datetime msec\n!\nhostname %s\n!\n" % name)
+
+    for interface in range(interfaces):
+        out.write("interface GigabitEthernet%s\n" % port(interface))
+        if interface in links:
+            out.write(" description Uplink to %s\n" % device_name(links[interface]))
+            out.write(" switchport mode trunk\n")
+        else:
+            out.write(" description User port %d\n" % (interface + 1))
+            out.write(" switchport access vlan %d\n" % (10 + interface % 4))
+            out.write(" switchport mode access\n")
+            if interface % 2 == 0:
+                out.write(" switchport voice vlan 100\n")
+            out.write(" spanning-tree portfast\n")
+        out.write("!\n")
+
+    out.write("interface Vlan1\n ip address 10.%d.%d.1 255.255.255.0\n!\n" % (number >> 8 & 0xff, number & 0xff))
+    out.write("ip default-gateway 10.%d.%d.254\n!\nline vty 0 4\n login\n!\nend\n\n" % (number >> 8 & 0xff,
+                                                                                       number & 0xff))
+
+
+def show_interfaces(out, rnd, number, interfaces, links, up_ports):
+    out.write(header("show interfaces"))
+
+    for interface in range(interfaces):
+        up = interface in up_ports
+        out.write("GigabitEthernet%s is %s, line protocol is %s (%s)\n" % (
+            port(interface), "up" if up else "down", "up" if up else "down", "connected" if up else "notconnect"))
+        out.write("  Hardware is Gigabit Ethernet, address is %s (bia %s)\n" % (mac(number, interface),
+                                                                                mac(number, interface)))
+        if interface in links:
+            out.write("  Description: Uplink to %s\n" % device_name(links[interface]))
+        else:
+            out.write("  Description: User port %d\n" % (interface + 1))
+        out.write("  MTU 1500 bytes, BW 1000000 Kbit/sec, DLY 10 usec,\n")
+        out.write("     reliability 255/255, txload 1/255, rxload 1/255\n")
+        out.write("  Encapsulation ARPA, loopback not set\n")
+        out.write("  Keepalive set (10 sec)\n")
+        if up:
+            out.write("  Full-duplex, 1000Mb/s, media type is 10/100/1000BaseTX\n")
+        else:
+            out.write("  Auto-duplex, Auto-speed, media type is 10/100/1000BaseTX\n")
+        out.write("  input flow-control is off, output flow-control is unsupported\n")
+        out.write("  Last input never, output 00:00:01, output hang never\n")
+        out.write("  Queueing strategy: fifo\n")
+        out.write("  5 minute input rate %d bits/sec, %d packets/sec\n" % (rnd.randrange(10 ** 6),
+                                                                         rnd.randrange(1000)))
+        out.write("     %d packets input, %d bytes, 0 no buffer\n" % (rnd.randrange(10 ** 9), rnd.randrange(10 ** 12)))
+        errors = rnd.randrange(100) if rnd.random() < 0.1 else 0
+        out.write("     %d input errors, %d CRC, %d frame, 0 overrun, 0 ignored\n" % (errors, errors // 2,
+                                                                                    errors // 4))
+        out.write("     0 watchdog, %d multicast, 0 pause input\n" % rnd.randrange(10 ** 6))
+        out.write("     %d packets output, %d bytes, 0 underruns\n" % (rnd.randrange(10 ** 9),
+                                                                       rnd.randrange(10 ** 12)))
+        out.write("     0 output errors, 0 collisions, %d interface resets\n" % rnd.randrange(5))
+        out.write("     0 lost carrier, 0 no carrier, 0 PAUSE output\n")
+    out.write("\n")
+
+
+def show_interfaces_status(out, rnd, interfaces, links, up_ports):
+    out.write(header("show interfaces status"))
+    out.write("Port      Name               Status       Vlan       Duplex  Speed Type\n")
+
+    for interface in range(interfaces):
+        if interface in links:
+            description, status, vlan = "Uplink %s" % device_name(links[interface]), "connected", "trunk"
+        else:
+            description, status, vlan = "User port %d" % (interface + 1), "connected", str(10 + interface % 4)
+        if interface not in up_ports:
+            status = "notconnect"
+        duplex, speed = ("a-full", "a-1000") if status == "connected" else ("auto", "auto")
+        out.write("%-9s %-18s %-12s %-10s %6s %6s 10/100/1000BaseTX\n" % (
+            "Gi" + port(interface), description[:18], status, vlan, duplex, speed))
+    out.write("\n")
+
+
+def show_cdp_neighbors(out, rnd, number, neighbors):
+    out.write(header("show cdp neighbors"))
+    out.write("Capability Codes: R - Router, T - Trans Bridge, B - Source Route Bridge\n")
+    out.write("                  S - Switch, H - Host, I - IGMP, r - Repeater, P - Phone\n\n")
+    out.write("Device ID        Local Intrfce     Holdtme    Capability  Platform  Port ID\n")
+
+    for local, neighbor, remote in neighbors:
+        device_id = device_name(neighbor) + ".example.com"
+        out.write("%s\n                 Gig %-13s %-16d S I   WS-C3750X Gig %s\n" % (
+            device_id, port(local), 120 + rnd.randrange(60), port(remote)))
+    out.write("\n")
+
+    out.write(header("show cdp neighbors detail"))
+    for local, neighbor, remote in neighbors:
+        out.write("-------------------------\n")
+        out.write("Device ID: %s.example.com\n" % device_name(neighbor))
+        out.write("Entry address(es): \n  IP address: 10.%d.%d.1\n" % (neighbor >> 8 & 0xff, neighbor & 0xff))
+        out.write("Platform: cisco WS-C3750X-48P,  Capabilities: Switch IGMP \n")
+        out.write("Interface: GigabitEthernet%s,  Port ID (outgoing port): GigabitEthernet%s\n" % (port(local),
+                                                                                                port(remote)))
+        out.write("Holdtime : %d sec\n\nVersion :\nCisco IOS Software, Version 15.0(2)SE11\n\n" % (
+            120 + rnd.randrange(60)))
+    out.write("\n")
+
+
+def show_inventory(out, rnd, model):
+    out.write(header("show inventory"))
+    out.write('NAME: "1", DESCR: "%s"\nPID: %s  , VID: V05  , SN: %s\n\n' % (model, model, serial(rnd)))
+    out.write('NAME: "Switch 1 - Power Supply 0", DESCR: "FRU Power Supply"\n'
+              'PID: C3KX-PWR-715WAC    , VID: V01  , SN: %s\n\n' % serial(rnd))
+    out.write('NAME: "GigabitEthernet1/1/1", DESCR: "1000BaseSX SFP"\n'
+              'PID: GLC-SX-MMD         , VID: V01  , SN: %s\n\n' % serial(rnd))
+
+
+def show_diag(out, rnd, model):
+    out.write(header("show diag"))
+    out.write("Slot 0:\n\t%s Mother board\n\tProduct (FRU) Number     : %s\n" % (model, model))
+    out.write("\tPCB Serial Number        : %s\n\n" % serial(rnd))
+    out.write("\tWIC Slot 1:\n\tNetwork module C3KX-NM-1G\n\tFRU Part Number     C3KX-NM-1G\n")
+    out.write("\tSerial number          %s\n\n" % serial(rnd))
+
+
+# A section that tech2xl does not read, of about the given number of lines
+def show_skipped(out, rnd, lines):
+    out.write(header("show processes cpu"))
+    out.write("CPU utilization for five seconds: %d%%/0%%; one minute: 5%%; five minutes: 5%%\n" % rnd.randrange(30))
+    out.write(" PID Runtime(ms)     Invoked      uSecs   5Sec   1Min   5Min TTY Process \n")
+    for pid in range(1, lines):
+        out.write("%4d %11d %11d %10d  0.00%%  0.00%%  0.00%%   0 Process %d\n" % (
+            pid, rnd.randrange(10 ** 6), rnd.randrange(10 ** 6), rnd.randrange(1000), pid))
+    out.write("\n")
+
+
+# Writes the show tech of one device, number of devices
+def write_device(out, number, devices=1, interfaces=48, neighbors=2, skipped=200, seed=0):
+    rnd = random.Random(seed * 1000003 + number)
+    name = device_name(number)
+    model, image = models[number % len(models)]
+    neighbor_list = neighbors_of(number, devices, interfaces, neighbors)
+    links = dict((local, neighbor) for local, neighbor, remote in neighbor_list)
+    up_ports = set(interface for interface in range(interfaces) if interface in links or rnd.random() < 0.7)
+
+    out.write("%s#show tech-support\n" % name)
+    show_version(out, rnd, name, model, image)
+    show_running_config(out, rnd, number, name, interfaces, links)
+    show_skipped(out, rnd, skipped)
+    show_interfaces(out, rnd, number, interfaces, links, up_ports)
+    show_interfaces_status(out, rnd, interfaces, links, up_ports)
+    show_cdp_neighbors(out, rnd, number, neighbor_list)
+    show_inventory(out, rnd, model)
+    show_diag(out, rnd, model)
+    out.write("%s#\n" % name)
+
+
+def write_devices(out, devices=1, interfaces=48, neighbors=2, skipped=200, seed=0):
+    for number in range(devices):
+        write_device(out, number, devices, interfaces, neighbors, skipped, seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="generate")
+    parser.add_argument("output", help="file to write (- for the standard output)")
+    parser.add_argument("--devices", type=int, default=1, help="number of devices")
+    parser.add_argument("--interfaces", type=int, default=48, help="interfaces per device")
+    parser.add_argument("--neighbors", type=int, default=2, help="CDP neighbors per device")
+    parser.add_argument("--skipped", type=int, default=200, help="lines per device of sections that are not read")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.output == '-':
+        write_devices(sys.stdout, args.devices, args.interfaces, args.neighbors, args.skipped, args.seed)
+    else:
+        with open(args.output, "w") as outfile:
+            write_devices(outfile, args.devices, args.interfaces, args.neighbors, args.skipped, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# Counter history benchmark
+#
+# Builds a CounterHistory (see --history) with nightly snapshots of made up
+# interface counters, where a few interfaces have errors and some counters
+# are cleared now and then, and times the Error trends query over the last
+# days: with NumPy if it is installed, and without it with --no-numpy. The
+# query reads only the snapshots of the window, so its time depends on the
+# days asked and not on how long the history is.
+#
+# usage: python benchmarks/history.py [--interfaces 50000] [--snapshots 365] [--days 30] [--top 100]
+#                                     [--no-numpy] [--dir DIR]
+
+import os
+import sys
+import time
+import array
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import tech2xl
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="history")
+    parser.add_argument("--interfaces", type=int, default=50000, help="interfaces in each snapshot")
+    parser.add_argument("--snapshots", type=int, default=365, help="nightly snapshots in the history")
+    parser.add_argument("--days", type=float, default=30, help="days of the query")
+    parser.add_argument("--top", type=int, default=100, help="interfaces returned by the query")
+    parser.add_argument("--no-numpy", action="store_true", help="compute the trends without NumPy")
+    parser.add_argument("--dir", help="directory of the history (kept between runs, if it has the snapshots)")
+    args = parser.parse_args()
+
+    if args.no_numpy:
+        sys.modules['numpy'] = None
+
+    directory = args.dir or tempfile.mkdtemp(prefix="tech2xl-history-")
+    history = tech2xl.CounterHistory(directory)
+    now = time.time()
+    first = int(now) - (args.snapshots - 1) * 86400
+
+    if len(history.entries()) < args.snapshots:
+        keys = [("switch%05d" % (i // 48), "GigabitEthernet1/0/%d" % (i % 48 + 1)) for i in range(args.interfaces)]
+        rnd = random.Random(0)
+        # one interface in a hundred gets errors, the others stay at 0
+        bad = sorted(rnd.sample(range(args.interfaces), args.interfaces // 100))
+        counters = [array.array('q', [0]) * args.interfaces for counter in tech2xl.history_counters]
+
+        start = time.time()
+        for snapshot in range(len(history.entries()), args.snapshots):
+            for i in bad:
+                for column in counters[:2]:
+                    column[i] += rnd.randrange(100)
+                if rnd.random() < 0.01:
+                    for column in counters:
+                        column[i] = 0
+            history.append(keys, counters, first + snapshot * 86400)
+        seconds = time.time() - start
+        print("%d snapshots of %d interfaces appended in %.1f seconds (%.3f seconds per snapshot)" % (
+            args.snapshots, args.interfaces, seconds, seconds / args.snapshots))
+
+    size = sum(entry.stat().st_size for entry in os.scandir(directory))
+    print("History in %s: %.1f MB" % (directory, size / (1024 * 1024)))
+
+    for run in range(3):
+        start = time.time()
+        trends = list(history.trends(args.days, args.top, now))
+        print("Error trends of %g days, %s: %d interfaces in %.3f seconds" % (
+            args.days, "without NumPy" if args.no_numpy else "with NumPy", len(trends), time.time() - start))
+
+    for trend in trends[:5]:
+        print("  %s %s: %d errors, %s per day, %d resets" % (trend['Name'], trend['Interface'], trend['Errors'],
+                                                            trend['Errors per day'], trend['Counter resets']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# Memory used by the records of a report
+#
+# Parses the given files (or makes up a number of interface rows, with
+# --rows) and measures with tracemalloc the memory taken by the records of
+# the report, and by the same rows stored as one OrderedDict per row, as
+# earlier versions of tech2xl did.
+#
+# usage: python benchmarks/memory.py [--rows N] [<inputfile>...]
+
+import os
+import sys
+import argparse
+import collections
+import gc
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import tech2xl
+
+
+# Interface rows with a value in the usual fields
+def made_up_records(rows):
+    for i in range(rows):
+        record = tech2xl.Interface(("switch%d" % (i // 48), "GigabitEthernet1/0/%d" % (i % 48 + 1)))
+        record['Name'] = "switch%d" % (i // 48)
+        record['Interface'] = "GigabitEthernet1/0/%d" % (i % 48 + 1)
+        record['Type'] = "GigabitEthernet"
+        record['Number'] = "1/0/%d" % (i % 48 + 1)
+        record['Status'] = "up"
+        record['Line protocol'] = "up"
+        record['Hardware'] = "Gigabit Ethernet"
+        record['Mac address'] = "0011.2233.%04x" % (i % 65536)
+        record['Encapsulation'] = "ARPA"
+        record['Input errors'] = str(i % 7)
+        record['Output errors'] = "0"
+        record['Duplex'] = "a-full"
+        record['Speed'] = "a-1000"
+        yield record
+
+
+# Memory allocated by build(), which must return what it builds
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000, help="number of made up rows, without input files")
+    parser.add_argument("inputs", nargs="*")
+    args = parser.parse_args()
+
+    # the text of the values is the same in both cases, so it is created before measuring
+    if args.inputs:
+        records = list(tech2xl.parse_files(args.inputs))
+    else:
+        records = list(made_up_records(args.rows))
+    rows = [(type(record), record.key, list(record.values)) for record in records]
+    del records
+
+    def build_records():
+        built = []
+        for cls, key, values in rows:
+            record = cls(key)
+            record.values[:] = values
+            built.append(record)
+        return built
+
+    def build_dicts():
+        return [collections.OrderedDict(zip(cls.fields, values)) for cls, key, values in rows]
+
+    count = len(rows)
+    built, records_size = measure(build_records)
+    del built
+    built, dicts_size = measure(build_dicts)
+    del built
+
+    print("%d records" % count)
+    print("%-30s %12s %12s" % ("", "bytes", "bytes/row"))
+    print("%-30s %12d %12.0f" % ("records", records_size, records_size / max(count, 1)))
+    print("%-30s %12d %12.0f" % ("OrderedDict per row", dicts_size, dicts_size / max(count, 1)))
+    print("%-30s %12.1f" % ("OrderedDict / records", dicts_size / max(records_size, 1)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# Test producer for tech2xl --listen
+#
+# Opens a number of connections at the same time to a tech2xl listening on
+# a TCP or Unix socket, and sends through each one the show tech of made up
+# devices (see generate.py), line by line, like a terminal capture would.
+#
+# usage: python benchmarks/producer.py [--connections N] [--devices N] <host:port | unix:path>
+
+import os
+import io
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generate
+
+
+async def produce(address, first, devices, total, interfaces, neighbors):
+    if address.startswith("unix:"):
+        reader, writer = await asyncio.open_unix_connection(address[5:])
+    else:
+        host, port = address.rsplit(":", 1)
+        reader, writer = await asyncio.open_connection(host, int(port))
+
+    for number in range(first, first + devices):
+        text = io.StringIO()
+        generate.write_device(text, number, total, interfaces, neighbors)
+        for line in text.getvalue().splitlines(True):
+            writer.write(line.encode())
+        await writer.drain()
+
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="producer")
+    parser.add_argument("address", help="host:port or unix:path where tech2xl is listening")
+    parser.add_argument("--connections", type=int, default=100, help="connections open at the same time")
+    parser.add_argument("--devices", type=int, default=1, help="devices sent through each connection")
+    parser.add_argument("--interfaces", type=int, default=48, help="interfaces per device")
+    parser.add_argument("--neighbors", type=int, default=2, help="CDP neighbors per device")
+    args = parser.parse_args()
+
+    total = args.connections * args.devices
+    start = time.time()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(asyncio.gather(*[
+        produce(args.address, connection * args.devices, args.devices, total, args.interfaces, args.neighbors)
+        for connection in range(args.connections)]))
+    loop.close()
+    print("%d devices sent through %d connections in %.3f seconds" % (total, args.connections, time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# Tables benchmark
+#
+# Times the parser on the big tables of a core switch: a show mac
+# address-table and a show ip arp of made up rows, in the formats of IOS and
+# of NX-OS, and checks that every row is read. The time of the same number of
+# lines in a command without rules is also printed, which is what reading the
+# lines costs before any row is parsed.
+#
+# usage: python benchmarks/tables.py [--rows 300000]
+
+import io
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import tech2xl
+
+
+def mac(i):
+    return "%04x.%04x.%04x" % (i >> 32 & 0xffff, i >> 16 & 0xffff, i & 0xffff)
+
+
+def ios_macs(rows):
+    yield "core1#show mac address-table\n"
+    yield "          Mac Address Table\n"
+    yield "-------------------------------------------\n\n"
+    yield "Vlan    Mac Address       Type        Ports\n"
+    yield "----    -----------       --------    -----\n"
+    for i in range(rows):
+        yield "%4d    %s    DYNAMIC     Gi%d/0/%d\n" % (i % 4000 + 1, mac(i), i % 8 + 1, i % 48 + 1)
+    yield "Total Mac Addresses for this criterion: %d\n" % rows
+
+
+def nxos_macs(rows):
+    yield "core2# show mac address-table\n"
+    yield "Legend:\n"
+    yield "        * - primary entry, G - Gateway MAC, (R) - Routed MAC, O - Overlay MAC\n"
+    yield "   VLAN     MAC Address      Type      age     Secure NTFY Ports\n"
+    yield "---------+-----------------+--------+---------+------+----+------------------\n"
+    for i in range(rows):
+        yield "*  %4d     %s   dynamic  %-9d F      F    Eth%d/%d\n" % (i % 4000 + 1, mac(i), i % 600, i % 8 + 1,
+                                                                      i % 48 + 1)
+
+
+def arps(rows):
+    yield "core3#show ip arp\n"
+    yield "Protocol  Address          Age (min)  Hardware Addr   Type   Interface\n"
+    for i in range(rows):
+        yield "Internet  10.%d.%d.%-10d %5d   %s  ARPA   Vlan%d\n" % (i >> 16 & 0xff, i >> 8 & 0xff, i & 0xff,
+                                                                   i % 240, mac(i), i % 4000 + 1)
+
+
+# Seconds to parse a text, and number of records of each type
+def parse(text):
+    counts = {}
+    start = time.perf_counter()
+    for record in tech2xl.parse_stream(io.BytesIO(text)):
+        counts[type(record).__name__] = counts.get(type(record).__name__, 0) + 1
+    return time.perf_counter() - start, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="tables")
+    parser.add_argument("--rows", type=int, default=300000, help="rows of each table")
+    args = parser.parse_args()
+
+    failed = False
+    print("%-20s %8s %10s %12s %14s" % ("Table", "Rows", "Seconds", "Rows/second", "Without rules"))
+    for name, lines, kind in (("IOS mac addresses", ios_macs, 'MacAddress'),
+                              ("NX-OS mac addresses", nxos_macs, 'MacAddress'),
+                              ("IOS arp", arps, 'ArpEntry')):
+        text = "".join(lines(args.rows)).encode("ascii")
+        seconds, counts = parse(text)
+        # the same lines in a command that is not parsed
+        plain = parse(text.replace(b"show", b"show clock", 1))[0]
+        print("%-20s %8d %10.3f %12d %14.3f" % (name, args.rows, seconds, args.rows / seconds, plain))
+        if counts.get(kind, 0) != args.rows:
+            print("  %d rows read instead of %d" % (counts.get(kind, 0), args.rows))
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
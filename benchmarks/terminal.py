@@ -0,0 +1,110 @@
+# Terminal artifacts benchmark
+#
+# Times tech2xl.clean_terminal() on made up lines of growing length with
+# what terminal servers leave in a capture: long runs of backspaces, bells,
+# escape sequences and pager prompts erased with backspaces or with a
+# carriage return. The same lines are also cleaned with the loop that
+# earlier versions of tech2xl used on prompts, which removes one level of
+# backspaces per pass and so takes a time that grows with the square of the
+# number of backspaces (it is skipped once it takes longer than --limit
+# seconds). It also times the parser on a capture without any artifact, and
+# on the same capture with artifacts, to show what the check costs on clean
+# lines.
+#
+# usage: python benchmarks/terminal.py [--lengths 1000,10000,100000] [--limit SECONDS] [--devices N]
+
+import io
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import tech2xl
+import generate
+
+
+# Adversarial lines of about length characters, and what they must become
+def adversarial(length):
+    half = length // 2
+    return [("typed and erased", "x" * half + "\b" * half + "show version\n", "show version\n"),
+            ("char and backspace", "a\b" * half + "ok\n", "ok\n"),
+            ("bells", "\a" * length + "ok\n", "ok\n"),
+            ("escape sequences", "\x1b[K\x1b[0;1m" * (length // 10) + "ok\n", "ok\n"),
+            ("pagers", (" --More-- " + "\b" * 10 + " " * 10 + "\b" * 10) * (length // 30) + "ok\n", "ok\n"),
+            ("pagers with cr", " --More-- \r          \r" * (length // 21) + "ok\n", "ok\n")]
+
+
+# The cleaning of earlier versions
+def old_clean(cli):
+    while "\b" in cli or "\a" in cli:
+        cli = re.sub("[^\b]\b|\a", "", cli)
+        cli = re.sub("^\b", "", cli)
+    return cli
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+# Seconds to parse a text
+def parse_seconds(text):
+    start = time.perf_counter()
+    for record in tech2xl.parse_stream(io.BytesIO(text.encode("ascii"))):
+        pass
+    return time.perf_counter() - start
+
+
+# The same capture as a terminal server may leave it
+def dirty(text):
+    lines = text.split("\n")
+    for i in range(len(lines)):
+        if i % 20 == 5:
+            lines[i] = " --More-- " + "\b" * 10 + " " * 10 + "\b" * 10 + lines[i]
+        if i % 17 == 3:
+            lines[i] = "\x1b[K" + lines[i]
+    return "\r\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="terminal")
+    parser.add_argument("--lengths", default="1000,10000,100000", help="comma separated lengths of the lines")
+    parser.add_argument("--limit", type=float, default=10, help="seconds after which the old loop is skipped")
+    parser.add_argument("--devices", type=int, default=20, help="devices of the capture parsed")
+    args = parser.parse_args()
+
+    failed = False
+    skipped = set()
+    print("%-20s %8s %12s %12s" % ("Line", "Length", "Seconds", "Old seconds"))
+    for length in [int(length) for length in args.lengths.split(",")]:
+        for name, line, expected in adversarial(length):
+            result, seconds = timed(tech2xl.clean_terminal, line)
+            if result != [expected]:
+                print("  %s: %r instead of %r" % (name, result, [expected]))
+                failed = True
+
+            old = "-"
+            # the old loop only knew backspaces and bells
+            if name not in skipped and "\x1b" not in line and "\r" not in line:
+                old_seconds = timed(old_clean, line)[1]
+                old = "%.4f" % old_seconds
+                if old_seconds > args.limit:
+                    skipped.add(name)
+            print("%-20s %8d %12.4f %12s" % (name, len(line), seconds, old))
+
+    out = io.StringIO()
+    generate.write_devices(out, args.devices)
+    text = out.getvalue()
+    clean = parse_seconds(text)
+    artifacts = parse_seconds(dirty(text))
+    print("\nParsing %d devices: %.3f seconds clean, %.3f seconds with artifacts" % (args.devices, clean, artifacts))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
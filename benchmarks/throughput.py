@@ -0,0 +1,157 @@
+# Throughput benchmark
+#
+# Generates show tech files of a growing number of devices (see generate.py)
+# and runs tech2xl over each one in several ways. For each size and way it
+# prints the MB and lines parsed per second, the peak memory (RSS) and the
+# seconds taken to write each sheet. Each run is done in a new process, so
+# the peak memory of one run does not hide the next one.
+#
+# The contents of the sheets of every run are compared: all the ways must
+# give the same rows for the same input. With --golden, they are also
+# compared with the ones saved in that file by an earlier run (the file is
+# written if it does not exist), to check that a faster version of tech2xl
+# still gives the same output.
+#
+# usage: python benchmarks/throughput.py [--devices 1,10,100,1000,10000] [--ways sequential,jobs,index]
+#                                        [--golden FILE] [--dir DIR]
+
+import os
+import sys
+import json
+import time
+import argparse
+import hashlib
+import resource
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import tech2xl
+import generate
+
+
+# Arguments of parse_files for each way of running tech2xl
+ways = {'sequential': {},
+        'jobs': {'jobs': os.cpu_count() or 1, 'part_size': 4 * 1024 * 1024},
+        'index': {'index': True}}
+
+
+# SHA-256 of the rows of each sheet of a report
+def sheet_digests(report):
+    digests = {}
+    for title, fields, records in tech2xl.report_sheets(report):
+        digest = hashlib.sha256()
+        for record in records:
+            digest.update(json.dumps([record[field] for field in fields]).encode("utf-8"))
+        digests[title] = digest.hexdigest()
+    return digests
+
+
+# Parses a file in one of the ways and writes the report, in this process.
+# Returns the measures of the run
+def run(filename, way, output):
+    start = time.time()
+    report = tech2xl.Report()
+    report.update(tech2xl.parse_files([filename], **ways[way]))
+    parse_seconds = time.time() - start
+
+    writer = tech2xl.writers[os.path.splitext(output)[1]](output)
+    sheets = {}
+    for title, fields, records in tech2xl.report_sheets(report):
+        start = time.time()
+        writer.write_sheet(title, fields, records)
+        sheets[title] = time.time() - start
+    start = time.time()
+    writer.close()
+    sheets['(close)'] = time.time() - start
+
+    # ru_maxrss is in KB on Linux, and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak if sys.platform == 'darwin' else peak * 1024
+
+    return {'parse_seconds': parse_seconds,
+            'peak_rss': peak,
+            'write_seconds': sheets,
+            'digests': sheet_digests(report)}
+
+
+def count_lines(filename):
+    lines = 0
+    with open(filename, "rb") as infile:
+        for block in iter(lambda: infile.read(1024 * 1024), b''):
+            lines = lines + block.count(b"\n")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="throughput")
+    parser.add_argument("--devices", default="1,10,100,1000,10000",
+                        help="comma separated numbers of devices of the generated files")
+    parser.add_argument("--interfaces", type=int, default=48, help="interfaces per device")
+    parser.add_argument("--neighbors", type=int, default=2, help="CDP neighbors per device")
+    parser.add_argument("--ways", default="sequential,jobs,index",
+                        help="comma separated ways of running tech2xl (%s)" % ", ".join(sorted(ways)))
+    parser.add_argument("--output", default=".xlsx", choices=sorted(tech2xl.writers),
+                        help="output format, by its extension")
+    parser.add_argument("--golden", help="file with the digests of the sheets of an earlier run")
+    parser.add_argument("--dir", help="directory for the generated files (kept between runs)")
+    parser.add_argument("--run", nargs=3, metavar=("FILE", "WAY", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # a single run, in the process started below
+    if args.run:
+        json.dump(run(*args.run), sys.stdout)
+        return 0
+
+    directory = args.dir or tempfile.mkdtemp(prefix="tech2xl-")
+    os.makedirs(directory, exist_ok=True)
+
+    golden = {}
+    if args.golden and os.path.exists(args.golden):
+        with open(args.golden) as infile:
+            golden = json.load(infile)
+    failed = False
+
+    print("%8s %10s %-11s %9s %9s %11s %9s  %s" % ("Devices", "MB", "Way", "Seconds", "MB/s", "Lines/s",
+                                                   "Peak MB", "Write seconds per sheet"))
+    for devices in [int(count) for count in args.devices.split(",")]:
+        filename = os.path.join(directory, "devices%d-%d-%d.txt" % (devices, args.interfaces, args.neighbors))
+        if not os.path.exists(filename):
+            with open(filename, "w") as outfile:
+                generate.write_devices(outfile, devices, args.interfaces, args.neighbors)
+        size = os.path.getsize(filename) / (1024 * 1024)
+        lines = count_lines(filename)
+
+        digests = None
+        for way in args.ways.split(","):
+            output = os.path.join(directory, "output" + args.output)
+            result = json.loads(subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                                         "--run", filename, way, output]).decode())
+
+            seconds = result['parse_seconds']
+            print("%8d %10.1f %-11s %9.3f %9.2f %11.0f %9.1f  %s" % (
+                devices, size, way, seconds, size / seconds, lines / seconds, result['peak_rss'] / (1024 * 1024),
+                " ".join("%s %.3f" % (title, taken) for title, taken in result['write_seconds'].items())))
+
+            if digests is None:
+                digests = result['digests']
+            elif result['digests'] != digests:
+                print("  different output than %s" % args.ways.split(",")[0])
+                failed = True
+
+        key = os.path.basename(filename)
+        if key in golden and golden[key] != digests:
+            print("  different output than in %s" % args.golden)
+            failed = True
+        golden.setdefault(key, digests)
+
+    if args.golden and not os.path.exists(args.golden):
+        with open(args.golden, "w") as outfile:
+            json.dump(golden, outfile, indent=1, sort_keys=True)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,62 +5,119 @@
 # You can put show tech of as many Cisco devices as you want in one file
 # or you can have multiple files and use wildcards
 #
-# Requires xlwt library. For Python 3, use xlwt-future (https://pypi.python.org/pypi/xlwt-future)
+# Requires xlwt library to write .xls files. For Python 3, use xlwt-future (https://pypi.python.org/pypi/xlwt-future)
+# .xlsx files are written without any library
 #
-# usage: python tech2xl <Excel output file> <inputfile>...
+# usage: python tech2xl [options] <output file> <inputfile>...
+#
+# It can also be imported from other Python programs:
+#
+#   import tech2xl
+#   report = tech2xl.Report()
+#   report.update(tech2xl.parse_file("show_tech.txt"))
+#   for record in report.interfaces():
+#       print(record['Name'], record['Interface'], record['Status'])
 #
 # Author: Andres Gonzelez, dec 2015
 
 
 import re
+import io
+import os
+import mmap
+import shutil
+import tempfile
+import array
+import bisect
+import codecs
+import json
+import hashlib
+import pickle
+import locale
+import argparse
 import glob
 import sys
 import csv
 import collections
-import xlwt
+import concurrent.futures
+import asyncio
+import signal
+import struct
+import threading
 import time
+import zipfile
+import tarfile
+import gzip
+import bz2
+import lzma
+import sqlite3
+from xml.sax.saxutils import escape as xml_escape
+
+__version__ = "1.5"
+
+
+# Abbreviations of the items of each list: {lower case prefix: item}, by id
+# of the list. When a prefix is the start of several items, it stands for the
+# first one in the list
+_prefixes = {}
+
+
+def _prefix_table(list):
+    entry = _prefixes.get(id(list))
+    if entry is None or entry[0] is not list:
+        table = {}
+        for item in list:
+            for end in range(len(item) + 1):
+                table.setdefault(item.lower()[:end], item)
+        # the list is kept in the entry, so its id is not reused by another one
+        entry = _prefixes[id(list)] = (list, table)
+    return entry[1]
 
 
 def expand(s, list):
-    for item in list:
-        if len(s) <= len(item):
-            if s.lower() == item.lower()[:len(s)]:
-                return item
-    return None
+    return _prefix_table(list).get(s.lower())
+
+
+# Strings already expanded: {(id of list, string): (list, expanded string or None)}.
+# As in _prefixes, the list is kept in the entry, and an entry of another
+# list that had the same id is not used
+_expanded = {}
+_expanded_size = 10000
 
 
 def expand_string(s, list):
+    key = (id(list), s)
+    entry = _expanded.get(key)
+    if entry is not None and entry[0] is list:
+        return entry[1]
+
     result = ''
     for pos, word in enumerate(s.split()):
-        expanded_word = expand(word, list[pos])
+        expanded_word = expand(word, list[pos]) if pos < len(list) else None
         if expanded_word is not None:
             result = result + ' ' + expanded_word
         else:
-            return None
-    return result[1:]
+            result = None
+            break
+    else:
+        result = result[1:]
 
-start_time = time.time()
-print("tech2xl v1.5")
+    if len(_expanded) >= _expanded_size:
+        _expanded.clear()
+    _expanded[key] = (list, result)
+    return result
 
-if len(sys.argv) < 3:
-    print("Usage: tech2xl <outputfile.XLS> <input files>...")
-    sys.exit(2)
 
 commands = [["show", "sh"],
-            ["version", "ver", "cdp", "technical-support", "running-config", "interfaces", "diag", "inventory", "inv"],
-            ["neighbors", "neig","status"],
-            ["detail"]]
+            ["version", "ver", "cdp", "technical-support", "running-config", "interfaces", "diag", "inventory", "inv",
+             "mac", "mac-address-table", "ip", "arp"],
+            ["neighbors", "neig","status", "address-table", "arp"],
+            ["detail", "dynamic"]]
 
 
 int_types = ["Ethernet", "FastEthernet", "FDDI", "GigabitEthernet", "Gigabit", "TenGigabit", "Serial", "ATM", "Port-channel",
              "Tunnel", "Loopback","TwentyFiveGigE", "HundredGigE", "AppGigabitEthernet", "FortyGigabitEthernet" ]
 
-# Initialized the collections.OrderedDictionary that will store all the info
-systeminfo = collections.OrderedDict()
-intinfo = collections.OrderedDict()
-cdpinfo = collections.OrderedDict()
-diaginfo = collections.OrderedDict()
-
 # These are the fields to be extracted
 systemfields = ["Name", "Model", "System ID", "Mother ID", "Image"]
 
@@ -92,690 +149,3443 @@ intfields = ["Name",
             "DLCI",
             "Duplex",
             "Speed",
-            "Media type"]   
+            "Media type"]
 
 cdpfields = ["Name", "Local interface", "Remote device name", "Remote device domain", "Remote interface",
              "Remote device IP"]
 
 diagfields = ["Name", "Slot", "Subslot", "Description", "Serial number", "Part number"]
 
-masks = ["128.0.0.0","192.0.0.0","224.0.0.0","240.0.0.0","248.0.0.0","252.0.0.0","254.0.0.0","255.0.0.0",
-         "255.128.0.0","255.192.0.0","255.224.0.0","255.240.0.0","255.248.0.0","255.252.0.0","255.254.0.0",
-         "255.255.0.0","255.255.128.0","255.255.192.0","255.255.224.0","255.255.240.0","255.255.248.0",
-         "255.255.252.0","255.255.254.0","255.255.255.0","255.255.255.128","255.255.255.192","255.255.255.224",
-         "255.255.255.240","255.255.255.248","255.255.255.252","255.255.255.254","255.255.255.255"]
+macfields = ["Name", "Vlan", "Mac address", "Type", "Port"]
 
+arpfields = ["Name", "IP address", "Age", "Mac address", "Type", "Interface"]
 
-# takes all arguments starting from 2nd
-for arg in sys.argv[2:]:
-    # uses glob to consider wildcards
-    for file in glob.glob(arg):
+linkfields = ["Name", "Interface", "Remote name", "Remote interface", "CDP", "Mismatch",
+              "Status", "Remote status", "Speed", "Remote speed", "Duplex", "Remote duplex",
+              "Switchport mode", "Remote switchport mode", "Access vlan", "Remote access vlan",
+              "Input errors", "Remote input errors", "CRC", "Remote CRC", "Output errors", "Remote output errors"]
 
-        infile = open(file, "r")
-        
-        # This is the name of the router
-        name = ''
+# Fields of the Links sheet taken from the Interfaces sheet: (field, field of
+# the local end, field of the remote end)
+link_interface_fields = [(field, field, remote) for field, remote in zip(linkfields[6::2], linkfields[7::2])]
 
-        # Identifies the section of the file that is currently being read
-        command = ''
-        section = ''
-        item = ''
-        cdp_neighbor = ''
+trendfields = ["Name", "Interface", "Snapshots", "From", "To", "Errors", "Errors per day", "Peak errors per day",
+               "Counter resets", "Input errors increase", "CRC increase", "Frame errors increase", "Overrun increase",
+               "Ignored increase", "Output errors increase", "Collisions increase", "Interface resets increase"]
 
-        take_next_line = 0
+subnetfields = ["Network", "Mask bits", "Name", "Interface", "IP address", "Interfaces", "Devices", "Inside",
+                "Contains", "Duplicate IP"]
 
-        for line in infile:
+masks = ["128.0.0.0","192.0.0.0","224.0.0.0","240.0.0.0","248.0.0.0","252.0.0.0","254.0.0.0","255.0.0.0",
+         "255.128.0.0","255.192.0.0","255.224.0.0","255.240.0.0","255.248.0.0","255.252.0.0","255.254.0.0",
+         "255.255.0.0","255.255.128.0","255.255.192.0","255.255.224.0","255.255.240.0","255.255.248.0",
+         "255.255.252.0","255.255.254.0","255.255.255.0","255.255.255.128","255.255.255.192","255.255.255.224",
+         "255.255.255.240","255.255.255.248","255.255.255.252","255.255.255.254","255.255.255.255"]
 
-            # checks for device name in prompt
-            m = re.search(r"^([a-zA-Z0-9][a-zA-Z0-9_\-]*)[#>]\s*([\w\-\s\b\a]*)", line)
-            # avoids a false positive in the "show switch detail" or "show flash: all" section of show tech
-            if m and not (command == "show switch detail" or command == "show flash: all"):
+# Mask bits of each mask in A.B.C.D format, and mask of each number of bits as
+# an integer
+mask_bits = dict((mask, bits) for bits, mask in enumerate(masks, 1))
+mask_ints = [0] + [(0xffffffff << (32 - bits)) & 0xffffffff for bits in range(1, 33)]
 
-                if name == '':
-                    infile.seek(0)
-                else:
-                    # removes all deleted chars with backspace (\b) and bell chars (\a)
-                    cli = m.group(2)
 
-                    while re.search("\b|\a", cli):
-                        cli = re.sub("[^\b]\b|\a", "", cli)
-                        cli = re.sub("^\b", "", cli)
-                    command = expand_string(cli, commands)
+# A record is one row of a sheet, with all the fields of the sheet,
+# initialized to ''. The fields are read and written by name, like in a
+# dictionary, but the values are kept in a list, in the order of the fields
+# of the sheet, and the records have no __dict__: a row takes a fraction of
+# the memory of a dictionary. The key identifies the row, so the same device
+# found again (in the same or in another file) updates the same row. The
+# source is the input file (or member of an archive) where the row was found
+class Record(object):
+    __slots__ = ('key', 'values', 'source')
 
-                name = m.group(1)
-                section = ''
-                item = ''
+    fields = []
 
-                if name not in systeminfo.keys():
-                    systeminfo[name] = collections.OrderedDict(zip(systemfields, [''] * len(systemfields)))
-                    systeminfo[name]['Name'] = name
+    # position of each field in values
+    positions = {}
 
-                if name not in intinfo.keys():
-                    intinfo[name] = collections.OrderedDict()
+    def __init__(self, key=None, source=''):
+        self.key = key
+        self.values = [''] * len(self.fields)
+        self.source = source
 
-                if name not in cdpinfo.keys():
-                    cdpinfo[name] = collections.OrderedDict()
+    def __getitem__(self, field):
+        return self.values[self.positions[field]]
 
-                continue
+    def __setitem__(self, field, value):
+        self.values[self.positions[field]] = value
 
-            # detects section within show tech
-            m = re.search("^------------------ (.*) ------------------$", line)
-            if m:
-                command = m.group(1)
-                section = ''
-                item = ''
-                continue
+    def __contains__(self, field):
+        return field in self.positions
 
-            # processes "show running-config" command or section of sh tech
-            if command == 'show running-config':
-                # extracts information as per patterns
+    def __iter__(self):
+        return iter(self.fields)
 
-                m = re.match(r"hostname ([a-zA-Z0-9][a-zA-Z0-9_\-]*)", line)
-                if m:
-                    if name == '':
-                        name = m.group(1)
-                        infile.seek(0)
+    def __len__(self):
+        return len(self.fields)
 
-                        section = ''
-                        item = ''
+    def __eq__(self, other):
+        return type(self) is type(other) and self.key == other.key and self.values == other.values
 
-                        if name not in systeminfo.keys():
-                            systeminfo[name] = collections.OrderedDict(zip(systemfields, [''] * len(systemfields)))
-                            systeminfo[name]['Name'] = name
+    def __repr__(self):
+        return "%s(%r, %r)" % (type(self).__name__, self.key, list(self.items()))
 
-                        if name not in intinfo.keys():
-                            intinfo[name] = collections.OrderedDict()
+    def get(self, field, default=None):
+        position = self.positions.get(field)
+        return default if position is None else self.values[position]
 
-                        if name not in cdpinfo.keys():
-                            cdpinfo[name] = collections.OrderedDict()
+    def keys(self):
+        return list(self.fields)
 
-                    continue
+    def items(self):
+        return zip(self.fields, self.values)
 
-                m = re.match(r"interface (\S*)", line)
-                if m:
-                    section = 'interface'
-                    item = m.group(1)
-
-                    if item not in intinfo[name].keys():
-                        intinfo[name][item] = collections.OrderedDict(zip(intfields, [''] * len(intfields)))
-                        intinfo[name][item]['Name'] = name
-                        intinfo[name][item]['Interface'] = item
-                        
-                        intinfo[name][item]['Type'] = re.split(r'\d', item)[0]
-                        intinfo[name][item]['Number'] = re.split(r'\D+', item, maxsplit=1)[1]
-                    continue
 
-                if section == 'interface':
-
-                    if line == '!':
-                        section = ''
-                        continue
-
-                    m = re.match(r" description (.*)", line)
-                    if m:
-                        intinfo[name][item]['Description'] = m.group(1)
-                        continue
-
-                    m = re.match(r" switchport mode (\w*)", line)
-                    if m:
-                        intinfo[name][item]['Switchport mode'] = m.group(1)
-                        continue
-
-                    m = re.search(r" switchport access vlan (\d+)", line)
-                    if m:
-                        intinfo[name][item]["Access vlan"] = m.group(1)
-                        continue
-
-                    m = re.search(r" switchport voice vlan (\d+)", line)
-                    if m:
-                        intinfo[name][item]["Voice vlan"] = m.group(1)
-                        continue
-
-                    m = re.search(r" frame-relay interface-dlci (\d+)", line)
-                    if m:
-                        intinfo[name][item]["DLCI"] = int(m.group(1))
-                        continue
-
-                    m = re.search(r"^ ip address ([\d|]+) ([\d|]+)", line)
-                    if m:
-                        intinfo[name][item]['IP address'] = m.group(1)
-                        intinfo[name][item]['Mask'] = m.group(2)
-                        intinfo[name][item]['Mask bits'] = masks.index(m.group(2)) + 1
-
-                        m = re.search(r"(\d+)\.(\d+)\.(\d+)\.(\d+)", intinfo[name][item]['IP address'])
-                        
-                        a = int(m.group(1))
-                        b = int(m.group(2))
-                        c = int(m.group(3))
-                        d = int(m.group(4))
-
-                        m = re.search(r"(\d+)\.(\d+)\.(\d+)\.(\d+)", intinfo[name][item]['Mask'])
-                        
-                        intinfo[name][item]['Network'] = str(a & int(m.group(1))) + '.' + \
-                                                         str(b & int(m.group(2))) + '.' + \
-                                                         str(c & int(m.group(3))) + '.' + \
-                                                         str(d & int(m.group(4)))
-                        continue
-
-            # processes "show version" command or section of sh tech
-            if command == 'show version' and name != '':
-                # extracts information as per patterns
-                m = re.search(r"Processor board ID (.*)", line)
-                if m:
-                    systeminfo[name]['System ID'] = m.group(1)
-                    continue
+def field_positions(fields):
+    return dict((field, position) for position, field in enumerate(fields))
 
-                m = re.search(r"Model number\s*: (.*)", line)
-                if m:
-                    systeminfo[name]['Model'] = m.group(1)
-                    continue
 
-                m = re.search(r"^cisco (.*) processor", line)
-                if m:
-                    systeminfo[name]['Model'] = m.group(1)
-                    continue
+# Row of the System sheet, keyed by hostname
+class System(Record):
+    __slots__ = ()
+    fields = systemfields
+    positions = field_positions(systemfields)
 
-                m = re.search(r"^Cisco (.*) \(revision", line)
-                if m:
-                    systeminfo[name]['Model'] = m.group(1)
-                    continue
 
-                m = re.search(r"Motherboard serial number\s*: (.*)", line)
-                if m:
-                    systeminfo[name]['Mother ID'] = m.group(1)
-                    continue
+# Row of the Interfaces sheet, keyed by (hostname, interface)
+class Interface(Record):
+    __slots__ = ()
+    fields = intfields
+    positions = field_positions(intfields)
 
-                m = re.search(r'System image file is \"flash:?(.*)\.bin\"', line)
-                if m:
-                    systeminfo[name]['Image'] = m.group(1)
-                    continue
 
-                m = re.search(r'System image file is \"flash:.*(.*)\.bin\"', line)
-                if m:
-                    systeminfo[name]['Image'] = m.group(1)
-                    continue
+# Row of the CDP neighbors sheet, keyed by (hostname + local int + remote int, neighbor)
+class CDPNeighbor(Record):
+    __slots__ = ()
+    fields = cdpfields
+    positions = field_positions(cdpfields)
+
+
+# Row of the Modules sheet, keyed by hostname + slot
+class Module(Record):
+    __slots__ = ()
+    fields = diagfields
+    positions = field_positions(diagfields)
 
-                m = re.search(r'System image file is \"bootflash:(.*)\.bin\"', line)
-                if m:
-                    systeminfo[name]['Image'] = m.group(1)
-                    continue
-
-                m = re.search(r'System image file is \"sup-bootflash:(.*)\.bin\"', line)
-                if m:
-                    systeminfo[name]['Image'] = m.group(1)
-                    continue
 
-            # processes "show interfaces" command or section of sh tech
-            if command == 'show interfaces' and name != '':
-                # extracts information as per patterns
+# Row of the MAC addresses sheet, keyed by (hostname, vlan, mac address)
+class MacAddress(Record):
+    __slots__ = ()
+    fields = macfields
+    positions = field_positions(macfields)
+
+
+# Row of the ARP sheet, keyed by (hostname, ip address)
+class ArpEntry(Record):
+    __slots__ = ()
+    fields = arpfields
+    positions = field_positions(arpfields)
+
+
+# Row of the Links sheet, keyed by ((hostname, interface), (remote hostname,
+# remote interface)). The rows are made from the CDP neighbors and the
+# interfaces by Report.links(), they are not parsed
+class Link(Record):
+    __slots__ = ()
+    fields = linkfields
+    positions = field_positions(linkfields)
+
+
+# Row of the Error trends sheet, keyed by (hostname, interface). The rows are
+# made by CounterHistory.trends(), they are not parsed
+class Trend(Record):
+    __slots__ = ()
+    fields = trendfields
+    positions = field_positions(trendfields)
+
+
+# Row of the Subnets sheet, keyed by (hostname, interface). The rows are made
+# from the interfaces by Report.subnets(), they are not parsed
+class Subnet(Record):
+    __slots__ = ()
+    fields = subnetfields
+    positions = field_positions(subnetfields)
+
+
+# Collects the records of all the parsed files. When a record with the same key
+# was already collected, the fields that have a value in the new record
+# overwrite the old ones, in the same way as if both outputs were in one file
+class Report(object):
+
+    def __init__(self):
+        self.systeminfo = collections.OrderedDict()
+        self.intinfo = collections.OrderedDict()
+        self.cdpinfo = collections.OrderedDict()
+        self.diaginfo = collections.OrderedDict()
+        self.macinfo = collections.OrderedDict()
+        self.arpinfo = collections.OrderedDict()
+
+    def add(self, record):
+        if isinstance(record, System):
+            if record.key not in self.systeminfo:
+                self.systeminfo[record.key] = record
+                self.intinfo[record.key] = collections.OrderedDict()
+            else:
+                self._merge(self.systeminfo[record.key], record)
+
+        elif isinstance(record, Interface):
+            name, item = record.key
+            if name not in self.intinfo:
+                self.intinfo[name] = collections.OrderedDict()
+            if item not in self.intinfo[name]:
+                self.intinfo[name][item] = record
+            else:
+                self._merge(self.intinfo[name][item], record)
+
+        elif isinstance(record, CDPNeighbor):
+            key, neighbor = record.key
+            if key not in self.cdpinfo:
+                self.cdpinfo[key] = collections.OrderedDict()
+            if neighbor not in self.cdpinfo[key]:
+                self.cdpinfo[key][neighbor] = record
+            else:
+                self._merge(self.cdpinfo[key][neighbor], record)
+
+        elif isinstance(record, Module):
+            if record.key not in self.diaginfo:
+                self.diaginfo[record.key] = record
+            else:
+                self._merge(self.diaginfo[record.key], record)
+
+        elif isinstance(record, MacAddress):
+            if record.key not in self.macinfo:
+                self.macinfo[record.key] = record
+            else:
+                self._merge(self.macinfo[record.key], record)
+
+        elif isinstance(record, ArpEntry):
+            if record.key not in self.arpinfo:
+                self.arpinfo[record.key] = record
+            else:
+                self._merge(self.arpinfo[record.key], record)
+
+    def update(self, records):
+        for record in records:
+            self.add(record)
+
+    @staticmethod
+    def _merge(old, new):
+        values = old.values
+        for position, value in enumerate(new.values):
+            if value != '':
+                values[position] = value
+
+    def systems(self):
+        return iter(self.systeminfo.values())
+
+    def interfaces(self):
+        for name in self.intinfo.keys():
+            for item in self.intinfo[name].keys():
+                yield self.intinfo[name][item]
+
+    def neighbors(self):
+        for key in self.cdpinfo.keys():
+            for neighbor in self.cdpinfo[key].keys():
+                yield self.cdpinfo[key][neighbor]
+
+    def modules(self):
+        return iter(self.diaginfo.values())
+
+    def macs(self):
+        return iter(self.macinfo.values())
+
+    def arps(self):
+        return iter(self.arpinfo.values())
+
+    # the record of an interface, or None
+    def interface(self, name, item):
+        interfaces = self.intinfo.get(name)
+        return interfaces.get(item) if interfaces is not None else None
+
+    # number of devices, interfaces, neighbors, modules, mac addresses and arp entries
+    def counts(self):
+        return collections.OrderedDict([('devices', len(self.systeminfo)),
+                                        ('interfaces', sum(len(interfaces) for interfaces in self.intinfo.values())),
+                                        ('neighbors', sum(len(neighbors) for neighbors in self.cdpinfo.values())),
+                                        ('modules', len(self.diaginfo)),
+                                        ('mac addresses', len(self.macinfo)),
+                                        ('arp entries', len(self.arpinfo))])
+
+    # One row per link between two interfaces found by CDP, with the fields of
+    # the interfaces of both ends. A link seen from both ends (and in both
+    # show cdp neighbors and show cdp neighbors detail) gives one row, in the
+    # order of the first neighbor seen. The ends are looked up by (hostname,
+    # interface) in the report, so all the neighbors are joined in one pass
+    def links(self):
+        links = collections.OrderedDict()
+        for neighbor in self.neighbors():
+            local = (neighbor['Name'], neighbor['Local interface'].replace(' ', ''))
+            remote = (neighbor['Remote device name'], neighbor['Remote interface'].replace(' ', ''))
+            if (remote, local) in links:
+                links[remote, local] = True
+            elif (local, remote) not in links:
+                links[local, remote] = False
+
+        for (local, remote), both in links.items():
+            link = Link((local, remote))
+            link['Name'], link['Interface'] = local
+            link['Remote name'], link['Remote interface'] = remote
+            link['CDP'] = "both ends" if both else "one end"
+
+            ends = (self.interface(*local), self.interface(*remote))
+            for field, local_field, remote_field in link_interface_fields:
+                if ends[0] is not None:
+                    link[local_field] = ends[0][field]
+                if ends[1] is not None:
+                    link[remote_field] = ends[1][field]
+
+            mismatches = []
+            if None not in ends:
+                for field in ("Speed", "Duplex"):
+                    if _link_mismatch(ends[0][field], ends[1][field]):
+                        mismatches.append(field.lower())
+                modes = (ends[0]['Switchport mode'], ends[1]['Switchport mode'])
+                if '' not in modes and modes[0] != modes[1]:
+                    mismatches.append("switchport mode")
+                elif 'trunk' not in modes and _link_mismatch(ends[0]['Access vlan'], ends[1]['Access vlan']):
+                    mismatches.append("vlan")
+            link['Mismatch'] = ", ".join(mismatches)
+            yield link
+
+    # One row per interface with an IP address, in the order of the networks.
+    # The networks are sorted by address and mask bits, so the networks that
+    # contain a network come before it, and the ones that still contain the
+    # current network are kept in a stack (two networks are either disjoint
+    # or one is inside the other): each network is checked only against the
+    # networks that contain it, not against all the others
+    def subnets(self):
+        entries = []
+        addresses = collections.Counter()
+        for order, record in enumerate(self.interfaces()):
+            bits = record['Mask bits']
+            start = ip_int(record['Network']) if bits != '' else None
+            if start is None:
+                continue
+            entries.append((start, bits, order, record))
+            addresses[record['IP address']] += 1
+        entries.sort(key=lambda entry: entry[:3])
+
+        # [start, bits, end, records, inside, contains] of each network
+        networks = []
+        for start, bits, order, record in entries:
+            if not networks or networks[-1][0] != start or networks[-1][1] != bits:
+                networks.append([start, bits, start | (~mask_ints[bits] & 0xffffffff), [], '', 0])
+            networks[-1][3].append(record)
+
+        stack = []
+        for subnet in networks:
+            while stack and stack[-1][2] < subnet[0]:
+                stack.pop()
+            if stack:
+                subnet[4] = "%s/%d" % (int_ip(stack[-1][0]), stack[-1][1])
+            for outer in stack:
+                outer[5] += 1
+            stack.append(subnet)
+
+        for start, bits, end, records, inside, contains in networks:
+            devices = len(set(record['Name'] for record in records))
+            for record in records:
+                subnet = Subnet(record.key, record.source)
+                subnet['Network'] = int_ip(start)
+                subnet['Mask bits'] = bits
+                subnet['Name'] = record['Name']
+                subnet['Interface'] = record['Interface']
+                subnet['IP address'] = record['IP address']
+                subnet['Interfaces'] = len(records)
+                subnet['Devices'] = devices
+                subnet['Inside'] = inside
+                subnet['Contains'] = contains
+                subnet['Duplicate IP'] = "yes" if addresses[record['IP address']] > 1 else ''
+                yield subnet
+
+
+# Report that keeps the records in a SQLite database on disk instead of in
+# memory (see --spill). The records of the device being added are collected
+# in a Report, and are written to the database when the records of another
+# device start: by then the device is usually complete, and its rows are
+# inserted at once. A device found again later is merged with its rows in the
+# database, in the same way as Report does. The rows are read back in the
+# same order as Report returns them, so the memory taken is the one of the
+# largest device instead of the one of all of them. The database is a
+# private temporary one (in TMPDIR), removed when it is closed
+class SpillReport(Report):
+
+    # table of each kind of record, the columns of its key, and the column
+    # that sorts it before the order of insertion
+    tables = collections.OrderedDict([(System, ("systems", ("name",), None)),
+                                      (Interface, ("interfaces", ("name", "item"), "device")),
+                                      (CDPNeighbor, ("neighbors", ("key", "neighbor"), "key_order")),
+                                      (Module, ("modules", ("key",), None)),
+                                      (MacAddress, ("macs", ("name", "vlan", "mac"), None)),
+                                      (ArpEntry, ("arps", ("name", "ip"), None))])
+
+    def __init__(self):
+        self.pending = Report()
+        self.device = None
+        # order of the interfaces of each device, by the first record of the device
+        self.devices = {}
+        self.key_orders = 0
+
+        # the rows are never rolled back nor committed: the database is only read by this connection
+        self.db = sqlite3.connect("")
+        self.db.execute("PRAGMA journal_mode = OFF")
+        self.db.execute("PRAGMA synchronous = OFF")
+        # statements of each table: insert, select and update by key
+        self.statements = {}
+        for cls, (table, key, order) in self.tables.items():
+            columns = key + ((order,) if order else ())
+            self.db.execute("CREATE TABLE %s (%s, source TEXT, data BLOB, UNIQUE (%s))"
+                            % (table, ", ".join(columns), ", ".join(key)))
+            if order:
+                self.db.execute("CREATE INDEX %s_order ON %s (%s)" % (table, table, order))
+            where = " AND ".join("%s = ?" % column for column in key)
+            self.statements[cls] = ("INSERT OR IGNORE INTO %s (%s, source, data) VALUES (%s)"
+                                    % (table, ", ".join(columns), ", ".join("?" * (len(columns) + 2))),
+                                    "SELECT data FROM %s WHERE %s" % (table, where),
+                                    "UPDATE %s SET data = ? WHERE %s" % (table, where))
+
+    def close(self):
+        self.db.close()
+
+    # the first field of every record is the name of its device
+    def add(self, record):
+        if record.values[0] != self.device:
+            self._spill()
+            self.device = record.values[0]
+        self.pending.add(record)
+
+    # writes the records of the pending device to the database
+    def _spill(self):
+        pending = self.pending
+        if not (pending.systeminfo or pending.intinfo or pending.cdpinfo or pending.diaginfo or pending.macinfo
+                or pending.arpinfo):
+            return
+        self.pending = Report()
+
+        for name in list(pending.systeminfo) + list(pending.intinfo):
+            if name not in self.devices:
+                self.devices[name] = len(self.devices)
+        self._store(System, [((record.key,), record) for record in pending.systems()])
+        self._store(Interface, [(record.key + (self.devices[record.key[0]],), record)
+                                for record in pending.interfaces()])
+        self._store(CDPNeighbor, [(record.key + (None,), record) for record in pending.neighbors()])
+        self._store(Module, [((record.key,), record) for record in pending.modules()])
+        self._store(MacAddress, [(record.key, record) for record in pending.macs()])
+        self._store(ArpEntry, [(record.key, record) for record in pending.arps()])
+
+    # Inserts the rows of a table: (key columns and order column, record) of
+    # each record, all at once. If some keys were already in the table, each
+    # record is then merged with its row (which changes nothing in the rows
+    # just inserted)
+    def _store(self, cls, rows):
+        if not rows:
+            return
+        key = len(self.tables[cls][1])
+        insert, select, update = self.statements[cls]
+        if cls is CDPNeighbor:
+            rows = self._key_orders(rows)
+        changes = self.db.total_changes
+        self.db.executemany(insert, [values + (record.source, pickle.dumps(record.values, pickle.HIGHEST_PROTOCOL))
+                                     for values, record in rows])
+        if self.db.total_changes - changes == len(rows):
+            return
+
+        for values, record in rows:
+            old = cls(record.key)
+            old.values = pickle.loads(self.db.execute(select, values[:key]).fetchone()[0])
+            merged = list(old.values)
+            self._merge(old, record)
+            if old.values != merged:
+                self.db.execute(update, (pickle.dumps(old.values, pickle.HIGHEST_PROTOCOL),) + values[:key])
+
+    # Sets the order of the neighbors by their key: the one of the key in the
+    # database, or else a new one in the order of the rows
+    def _key_orders(self, rows):
+        orders = {}
+        result = []
+        for values, record in rows:
+            key = values[0]
+            if key not in orders:
+                found = self.db.execute("SELECT key_order FROM neighbors WHERE key = ? LIMIT 1", (key,)).fetchone()
+                if found is not None:
+                    orders[key] = found[0]
+                else:
+                    orders[key] = self.key_orders
+                    self.key_orders += 1
+            result.append((values[:-1] + (orders[key],), record))
+        return result
+
+    # records of a table, in the order of Report
+    def _records(self, cls):
+        table, key, order = self.tables[cls]
+        self._spill()
+        query = "SELECT %s, source, data FROM %s ORDER BY %srowid" % (", ".join(key), table,
+                                                                     order + ", " if order else "")
+        for row in self.db.execute(query):
+            record = cls(row[0] if len(key) == 1 else row[:len(key)], row[-2])
+            record.values = pickle.loads(row[-1])
+            yield record
+
+    def systems(self):
+        return self._records(System)
+
+    def interfaces(self):
+        return self._records(Interface)
+
+    def neighbors(self):
+        return self._records(CDPNeighbor)
+
+    def modules(self):
+        return self._records(Module)
+
+    def macs(self):
+        return self._records(MacAddress)
+
+    def arps(self):
+        return self._records(ArpEntry)
+
+    def interface(self, name, item):
+        self._spill()
+        found = self.db.execute("SELECT source, data FROM interfaces WHERE name = ? AND item = ?",
+                                (name, item)).fetchone()
+        if found is None:
+            return None
+        record = Interface((name, item), found[0])
+        record.values = pickle.loads(found[1])
+        return record
+
+    def counts(self):
+        self._spill()
+        return collections.OrderedDict((name, self.db.execute("SELECT COUNT(*) FROM %s" % table).fetchone()[0])
+                                       for name, (table, key, order) in zip(["devices", "interfaces", "neighbors",
+                                                                             "modules", "mac addresses",
+                                                                             "arp entries"], self.tables.values()))
+
+
+# Lines with something that a terminal erases or does not show: backspace,
+# bell, escape sequences, a lone carriage return (once "\r\n" is made "\n")
+# and the prompt of the pager
+terminal_re = re.compile(r"[\x07\x08\x1b\r]|--More--")
+
+# What clean_terminal() removes or acts on: escape sequences (CSI, OSC and
+# two character ones), runs of bells and of backspaces, and carriage return
+terminal_token_re = re.compile(r"\x1b(?:\[[0-9;?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)?|[ -~])?|\x07+|\x08+|\r")
+
+# Makes the bell, backspace and escape of terminal_re a "\r" (see Parser.feed_bytes)
+terminal_bytes = bytes.maketrans(b"\x07\x08\x1b", b"\r\r\r")
+
+# Prompt of the pager left in the output
+more_re = re.compile(r" ?--More-- ?")
+
+
+# Returns the lines that a terminal would show for a line of a capture, in
+# one pass. The characters are pushed to a stack, and each backspace pops
+# the last one (so "abc\b \b" is "ab", and a pager prompt erased with
+# backspaces leaves nothing). Escape sequences and bells are dropped. A lone
+# carriage return ends a line, as in the files with "\r" line ends, but the
+# lines it ends that are left blank (once the pager prompt is removed) are
+# dropped: they are what the pager wrote to erase its prompt
+def clean_terminal(line):
+    end = ""
+    if line.endswith("\n"):
+        line, end = line[:-1], "\n"
+
+    lines = []
+    chars = []
+    position = 0
+    for m in terminal_token_re.finditer(line):
+        chars.extend(line[position:m.start()])
+        position = m.end()
+
+        token = m.group()
+        if token[0] == "\x08":
+            del chars[max(len(chars) - len(token), 0):]
+        elif token == "\r":
+            text = more_re.sub("", "".join(chars))
+            if text.strip():
+                lines.append(text + "\n")
+            chars = []
+    chars.extend(line[position:])
+
+    text = more_re.sub("", "".join(chars))
+    if text or end:
+        lines.append(text + end)
+    return lines
+
+
+# Detects the device name and the command in a prompt line
+prompt_re = re.compile(r"([a-zA-Z0-9][a-zA-Z0-9_\-]*)[#>]\s*([\w\-\s\b\a]*)")
+
+# Detects a section within show tech
+section_re = re.compile(r"------------------ (.*) ------------------$")
+section_prefix = "------------------ "
+
+hostname_re = re.compile(r"hostname ([a-zA-Z0-9][a-zA-Z0-9_\-]*)")
+
+
+# State machine that extracts the records from the lines of the input.
+# Lines are passed one by one to feed(). The records of a device are
+# appended to done when the input moves to another device, and when close()
+# is called at the end of the input.
+#
+# The lines of each command are processed by the rules of its section (see
+# sections below). The parser also counts the lines and the time spent in
+# each command, in stats: {command: [lines, seconds]}. With profile, it also
+# counts them for each device, in devices: {name: [lines, seconds]}, and
+# counts how many times each rule matched or was tried without matching, in
+# rules: {command: {rule name: [hits, misses]}}. The lines of a section where
+# no rule matched are counted with the rule name None. The records are
+# created with the given source (see Record). Lines of bytes are passed to
+# feed_bytes(), and decoded with encoding (the one of the locale by default)
+# and the errors handler of str.decode
+class Parser(object):
+
+    def __init__(self, name='', command='', profile=False, source='', encoding=None, errors='replace'):
+        # This is the name of the router
+        self.name = ''
+        self.source = source
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.errors = errors
 
-                m = re.search(r"^(\S+) is ([\w|\s]+), line protocol is (\w+)", line)
-                if m:
-                    item = m.group(1)
-                    if item not in intinfo[name].keys():
-                        intinfo[name][item] = collections.OrderedDict(zip(intfields, [''] * len(intfields)))
-                        intinfo[name][item]['Name'] = name
-                        intinfo[name][item]['Interface'] = item
-
-                    intinfo[name][item]['Status'] = m.group(2)
-                    intinfo[name][item]['Line protocol'] = m.group(3)
-                    continue
+        # Identifies the section of the file that is currently being read
+        self.command = command
+        self._reset_section()
+
+        self.done = []
+        self._clear()
+
+        # lines read before the name of the device is known
+        self.pending = []
+
+        self.lines = 0
+        self.stats = {}
+        self.devices = {} if profile else None
+        self.rules = {} if profile else None
+        self._lines_mark = 0
+        self._time_mark = time.perf_counter()
+
+        # starts in the middle of the output of a device
+        if name != '':
+            self._set_device(name)
+
+    # every new command or section starts without the state of the previous one
+    def _reset_section(self):
+        self.section = ''
+        self.item = ''
+        self.cdp_neighbor = ''
+        self.cdp_ip = ''
+        self.slot = ''
+        self.subslot = ''
+        # columns of the table of the command, once its header is read (see Table)
+        self.table = None
+
+        self.take_next_line = 0
+
+    def _clear(self):
+        self.system = None
+        self.intinfo = collections.OrderedDict()
+        self.cdpinfo = collections.OrderedDict()
+        self.diaginfo = collections.OrderedDict()
+        self.macinfo = collections.OrderedDict()
+        self.arpinfo = collections.OrderedDict()
+
+    # moves the records of the current device to done
+    def _flush(self):
+        self.done.extend(self.records())
+        self._clear()
+
+    # records of the current device, found so far
+    def records(self):
+        records = [] if self.system is None else [self.system]
+        records.extend(self.intinfo.values())
+        for neighbors in self.cdpinfo.values():
+            records.extend(neighbors.values())
+        records.extend(self.diaginfo.values())
+        records.extend(self.macinfo.values())
+        records.extend(self.arpinfo.values())
+        return records
+
+    def _set_device(self, name):
+        if name != self.name:
+            self._flush()
+            self.name = name
+
+        if self.system is None:
+            self.system = System(name, self.source)
+            self.system['Name'] = name
+
+        self._reset_section()
+
+    # accounts the lines and time of the current command before changing it
+    def _set_command(self, command):
+        now = time.perf_counter()
+
+        stats = self.stats.get(self.command or '')
+        if stats is None:
+            stats = self.stats[self.command or ''] = [0, 0.0]
+        stats[0] += self.lines - self._lines_mark
+        stats[1] += now - self._time_mark
+
+        if self.devices is not None:
+            stats = self.devices.get(self.name)
+            if stats is None:
+                stats = self.devices[self.name] = [0, 0.0]
+            stats[0] += self.lines - self._lines_mark
+            stats[1] += now - self._time_mark
+
+        self._lines_mark = self.lines
+        self._time_mark = now
+
+        self.command = command
+        self._reset_section()
+
+    def close(self):
+        self._set_command(self.command)
+        self._flush()
+
+    def _interface(self, item):
+        if item not in self.intinfo:
+            self.intinfo[item] = Interface((self.name, item), self.source)
+            self.intinfo[item]['Name'] = self.name
+            self.intinfo[item]['Interface'] = item
+        return self.intinfo[item]
+
+    # type and number are taken from the name of the interface, if still unknown
+    def _interface_type(self, interface):
+        if interface['Type'] == '':
+            item = interface['Interface']
+            interface['Type'] = re.split(r'\d', item)[0]
+            interface['Number'] = re.split(r'\D+', item, maxsplit=1)[1]
+
+    def _neighbor(self, local_int, remote_int, cdp_neighbor):
+        key = self.name + local_int + remote_int
+        if key not in self.cdpinfo:
+            self.cdpinfo[key] = collections.OrderedDict()
+
+        if cdp_neighbor not in self.cdpinfo[key]:
+            self.cdpinfo[key][cdp_neighbor] = CDPNeighbor((key, cdp_neighbor), self.source)
+
+        neighbor = self.cdpinfo[key][cdp_neighbor]
+        neighbor['Name'] = self.name
+
+        # splits name and domain, if any
+        neighbor['Remote device name'] = cdp_neighbor.split('.', 1)[0]
+        if len(cdp_neighbor.split('.')) > 1:
+            neighbor['Remote device domain'] = cdp_neighbor.split('.', 1)[1]
+        neighbor['Local interface'] = local_int
+        neighbor['Remote interface'] = remote_int
+        return neighbor
+
+    def _module(self, item):
+        if (self.name + item) not in self.diaginfo:
+            self.diaginfo[self.name + item] = Module(self.name + item, self.source)
+
+        module = self.diaginfo[self.name + item]
+        module['Name'] = self.name
+        module['Slot'] = self.slot
+        module['Subslot'] = self.subslot
+        return module
+
+    # Processes one line of the input. What a terminal would have erased or
+    # not shown is removed first (see clean_terminal): the few lines that may
+    # have any of it are found with "in", which is much faster than a regular
+    # expression. The lines before the name of the device is known are kept,
+    # and processed again when it is found, because they belong to that
+    # device. A capture without prompts can be long, so only the lines of the
+    # sections with rules, and the headers of the sections, are kept
+    def feed(self, line):
+        if "\r" in line or "\x1b" in line or "\x08" in line or "\x07" in line or "--More--" in line:
+            if line.endswith("\r\n"):
+                line = line[:-2] + "\n"
+            if terminal_re.search(line) is not None:
+                for line in clean_terminal(line):
+                    self.feed(line)
+                return
+
+        self.lines += 1
+
+        if self.name != '':
+            self._feed(line)
+            return
+
+        command = self.command
+        if self._feed(line):
+            pending = self.pending
+            pending.append(line)
+            self.pending = []
+            for line in pending:
+                self._feed(line)
+        # only the lines that may change something then are kept: the ones of
+        # a section with rules, and the section headers
+        elif self.command in sections or self.command != command:
+            self.pending.append(line)
+
+    # Processes one line of bytes. Only the lines that may change something
+    # are decoded: once the device is known, the lines of a command without
+    # rules are just counted, unless they may start another command or device
+    # (see marker_start_re), or have a lone "\r" that may start a new line, or
+    # a backspace, escape or bell, whose removal may leave a prompt at the
+    # start. These are made "\r" first, so a single find() looks for all
+    def feed_bytes(self, line):
+        if self.name != '' and self.command not in sections and marker_start_re.match(line) is None \
+                and line.translate(terminal_bytes).find(b"\r", 0, -2) < 0:
+            self.lines += 1
+            return
+
+        self.feed(line.decode(self.encoding, self.errors))
+
+    # Processes one line. Returns True when the name of the device has just
+    # been found
+    def _feed(self, line):
+        # checks for device name in prompt
+        if '#' in line or '>' in line:
+            m = prompt_re.match(line)
+            # avoids a false positive in the "show switch detail" or "show flash: all" section of show tech
+            if m and not (self.command == "show switch detail" or self.command == "show flash: all"):
 
-                m = re.search(r"Hardware is (.+), address is ([\w|]+)", line)
-                if m:
-                    intinfo[name][item]['Hardware'] = m.group(1)
-                    intinfo[name][item]['Mac address'] = m.group(2)
-                    continue
+                rewind = self.name == ''
+                if not rewind:
+                    self._set_command(expand_string(m.group(2), commands))
 
-                m = re.search(r"Hardware is ([\w\s-]+)$", line)
-                if m:
-                    intinfo[name][item]['Hardware'] = m.group(1)
-                    continue
+                self._set_device(m.group(1))
+                return rewind
 
-                m = re.search(r"^  Encapsulation ([\d|\w|\s|-]+),", line)
-                if m:
-                    intinfo[name][item]['Encapsulation'] = m.group(1)
-                    continue
+        # detects section within show tech
+        if line.startswith(section_prefix):
+            m = section_re.match(line)
+            if m:
+                self._set_command(m.group(1))
+                return False
 
-                m = re.search(r"^  Description: (.*)", line)
-                if m:
-                    intinfo[name][item]['Description'] = m.group(1)
-                    continue
+        rules = sections.get(self.command)
+        if rules is None:
+            return False
 
-                m = re.search(r"^  Internet address is ([\d|]+)(\d+)", line)
+        if self.name == '':
+            # only the hostname is looked for until the name of the device is known
+            if self.command == 'show running-config':
+                m = hostname_re.match(line)
                 if m:
-                    intinfo[name][item]['IP address'] = m.group(1)
-                    intinfo[name][item]['Mask bits'] = int(m.group(2))
-                    intinfo[name][item]['Mask'] = masks[int(m.group(2)) - 1]
-
-                    m = re.search(r"(\d+)\.(\d+)\.(\d+)\.(\d+)", intinfo[name][item]['IP address'])
-                    
-                    a = int(m.group(1))
-                    b = int(m.group(2))
-                    c = int(m.group(3))
-                    d = int(m.group(4))
-
-                    m = re.search(r"(\d+)\.(\d+)\.(\d+)\.(\d+)", intinfo[name][item]['Mask'])
-                    
-                    intinfo[name][item]['Network'] = str(a & int(m.group(1))) + '.' + \
-                                                     str(b & int(m.group(2))) + '.' + \
-                                                     str(c & int(m.group(3))) + '.' + \
-                                                     str(d & int(m.group(4)))
-                    continue
+                    self._set_device(m.group(1))
+                    return True
+            return False
 
-                m = re.search(r"(\d+) input errors", line)
-                if m:
-                    intinfo[name][item]['Input errors'] = int(m.group(1))
+        if self.rules is not None:
+            self._feed_counting(rules, line)
+            return False
 
-                    m = re.search(r"(\d+) CRC", line)
-                    if m:
-                        intinfo[name][item]['CRC'] = int(m.group(1))
+        for rule in rules:
+            if rule.literal is not None and rule.literal not in line:
+                continue
+            if rule.when is not None and not getattr(self, rule.when):
+                continue
+            m = rule.find(line)
+            if m is not None:
+                rule.action(self, m)
+                break
 
-                    m = re.search(r"(\d+) frame", line)
-                    if m:
-                        intinfo[name][item]['Frame errors'] = int(m.group(1))
+        return False
 
-                    m = re.search(r"(\d+) overrun", line)
-                    if m:
-                        intinfo[name][item]['Overrun'] = int(m.group(1))
+    # same as the loop of _feed, counting the hits and misses of each rule
+    def _feed_counting(self, rules, line):
+        counts = self.rules.get(self.command)
+        if counts is None:
+            counts = self.rules[self.command] = {}
 
-                    m = re.search(r"(\d+) ignored", line)
-                    if m:
-                        intinfo[name][item]['Ignored'] = int(m.group(1))
+        for rule in rules:
+            if rule.literal is not None and rule.literal not in line:
+                continue
+            if rule.when is not None and not getattr(self, rule.when):
+                continue
+            count = counts.get(rule.name)
+            if count is None:
+                count = counts[rule.name] = [0, 0]
+            m = rule.find(line)
+            if m is not None:
+                count[0] += 1
+                rule.action(self, m)
+                return
+            count[1] += 1
+
+        count = counts.get(None)
+        if count is None:
+            count = counts[None] = [0, 0]
+        count[1] += 1
+
+    # running-config: "interface X" starts an interface section
+    def _config_interface(self, m):
+        self.section = 'interface'
+        self.item = m.group(1)
+        self._interface_type(self._interface(self.item))
+
+    def _config_end(self, m):
+        self.section = ''
+
+    def _config_ip_address(self, m):
+        interface = self.intinfo[self.item]
+        interface['IP address'] = m.group(1)
+        interface['Mask'] = m.group(2)
+        interface['Mask bits'] = mask_bits.get(m.group(2), '')
+        interface['Network'] = network(m.group(1), m.group(2))
+
+    # show interfaces: first line of each interface
+    def _interface_status(self, m):
+        self.item = m.group(1)
+        interface = self._interface(self.item)
+        interface['Status'] = m.group(2)
+        interface['Line protocol'] = m.group(3)
+
+    def _interface_ip_address(self, m):
+        interface = self.intinfo.get(self.item)
+        if interface is not None:
+            interface['IP address'] = m.group(1)
+            bits = int(m.group(2))
+            interface['Mask bits'] = bits
+            interface['Mask'] = masks[bits - 1]
+            interface['Network'] = network_bits(m.group(1), bits)
+
+    # takes all the "<number> <counter>" of a line of counters
+    def _interface_counters(self, m):
+        interface = self.intinfo.get(self.item)
+        if interface is not None:
+            found = set()
+            for counter in counter_re.finditer(m.string):
+                field = counter_fields[counter.group(2)]
+                if field not in found:
+                    found.add(field)
+                    interface[field] = int(counter.group(1))
+
+    def _interface_auto_duplex(self, m):
+        interface = self.intinfo.get(self.item)
+        if interface is not None:
+            interface['Duplex'] = m.group(3) + "-" + m.group(1)
+            interface['Speed'] = m.group(3) + "-" + m.group(2)
+            interface['Media type'] = m.group(4)
+
+    # show interfaces status: a row of the table. The description, status
+    # and vlan only fill the fields still empty, since the description is cut
+    # in the table and show interfaces tells the status of the line
+    def _status_row(self, m):
+        port, description, status, vlan, duplex, speed, media = status_table.cells(m.string,
+                                                                                   self.table or status_table.default)
+        self.item = table_interface(port)
+        if self.item is None:
+            return
+        interface = self._interface(self.item)
+        self._interface_type(interface)
+        if status == '':
+            return
+
+        if interface['Description'] == '':
+            interface['Description'] = description
+        if interface['Status'] == '':
+            interface['Status'] = status
+        if vlan == 'trunk' or vlan == 'routed':
+            interface['Switchport mode'] = vlan
+        elif interface['Access vlan'] == '':
+            interface['Access vlan'] = vlan
+        if duplex != '':
+            interface['Duplex'] = duplex
+        if speed != '':
+            interface['Speed'] = speed
+        if media != '':
+            interface['Media type'] = media
+
+    # show cdp neighbors: a row of the table. A device with a long name takes
+    # a line by itself, and the rest of its row is in the next line. The rows
+    # have the hold time, the legend and the other lines do not
+    def _cdp_row(self, m):
+        device, local_int, holdtime, remote_int = cdp_table.cells(m.string, self.table or cdp_table.default)
+        if not holdtime.isdigit():
+            if local_int == '' and device != '' and ' ' not in device:
+                self.cdp_neighbor = device
+            return
+
+        if device != '':
+            self.cdp_neighbor = device
+        if self.cdp_neighbor == '':
+            return
+        self._neighbor(table_interface(local_int) or local_int, table_interface(remote_int) or remote_int,
+                       self.cdp_neighbor)
+        self.cdp_neighbor = ''
+
+    def _cdp_device_id(self, m):
+        self.cdp_neighbor = m.group(1)
+
+    def _cdp_ip(self, m):
+        self.cdp_ip = m.group(1)
+
+    def _cdp_interface(self, m):
+        neighbor = self._neighbor(m.group(1), m.group(2), self.cdp_neighbor)
+        neighbor['Remote device IP'] = self.cdp_ip
+
+        self.cdp_neighbor = ''
+        self.cdp_ip = ''
+
+    # show mac address-table: a row of the table. Only the rows with a mac
+    # address in the format of Cisco (0011.2233.4455) are taken, which skips
+    # the title, the lines under the header and the total. The vlan may have
+    # the flags of some versions before it ("* 10"). These tables can have
+    # hundreds of thousands of rows, so the record is filled at once
+    def _mac_row(self, m):
+        vlan, mac, kind, port = mac_table.cells(m.string, self.table or mac_table.default)
+        if len(mac) != 14 or mac[4] != '.' or mac[9] != '.':
+            return
+        record = MacAddress((self.name, vlan.rpartition(' ')[2], mac), self.source)
+        record.values = [self.name, record.key[1], mac, kind, table_interface(port) or port]
+        self.macinfo[record.key] = record
+
+    # show ip arp: a row of the table
+    def _arp_row(self, m):
+        protocol, address, age, mac, kind, interface = arp_table.cells(m.string, self.table or arp_table.default)
+        if protocol != "Internet" or ip_int(address) is None:
+            return
+        record = ArpEntry((self.name, address), self.source)
+        record.values = [self.name, address, int(age) if age.isdigit() else age, mac, kind, interface]
+        self.arpinfo[record.key] = record
+
+    # show inventory: NAME/DESCR line of each module
+    def _inventory_name(self, m):
+        self.slot = m.group(1)
+        self.subslot = ''
+        self.item = self.slot
+        module = self._module(self.item)
+        module['Description'] = m.group(2)
+
+    def _inventory_pid(self, m):
+        if self.item != '':
+            module = self._module(self.item)
+            module['Part number'] = m.group(1)
+            module['Serial number'] = m.group(2)
+
+    # show diag: "<slot> EEPROM:" and "Slot N:" start a module
+    def _diag_eeprom(self, m):
+        self.slot = m.group(1)
+        self.subslot = ''
+        self.item = self.slot
+        self._module(self.item)
+
+    def _diag_slot(self, m):
+        self.slot = m.group(1)
+        self.subslot = ''
+        self.item = self.slot
+        self._module(self.item)
+        self.take_next_line = 1
+
+    # submodules are showed indented from base modules
+    def _diag_subslot(self, m):
+        self.subslot = m.group(1)
+        self.item = self.slot + '-' + self.subslot
+        self._module(self.item)
+        self.take_next_line = 1
+
+    # the line after "Slot N:" is the description of the module
+    def _diag_description(self, m):
+        module = self.diaginfo.get(self.name + self.item)
+        if module is not None:
+            module['Description'] = m.string.strip()
+        self.take_next_line = 0
+
+
+# Whether the values of a field at both ends of a link differ. Detected or
+# forced values ("a-full", "a-1000") are compared with the configured ones,
+# and auto or unknown values do not differ from any other
+def _link_mismatch(local, remote):
+    local = str(local).lower().rsplit('-', 1)[-1]
+    remote = str(remote).lower().rsplit('-', 1)[-1]
+    return local not in ('', 'auto') and remote not in ('', 'auto') and local != remote
+
+
+# An IP address in A.B.C.D format
+ip_re = re.compile(r"([0-9]{1,3})\.([0-9]{1,3})\.([0-9]{1,3})\.([0-9]{1,3})")
+
+
+# The addresses are handled as 32 bit integers. ip_int returns None if the
+# address is not in A.B.C.D format, or an octet is over 255
+def ip_int(ip):
+    m = ip_re.fullmatch(ip)
+    if m is None:
+        return None
+    a, b, c, d = [int(octet) for octet in m.groups()]
+    if a > 255 or b > 255 or c > 255 or d > 255:
+        return None
+    return (a << 24) | (b << 16) | (c << 8) | d
+
+
+def int_ip(n):
+    return "%d.%d.%d.%d" % (n >> 24, (n >> 16) & 255, (n >> 8) & 255, n & 255)
+
+
+# Network address of an IP address and a mask, both in A.B.C.D format
+def network(ip, mask):
+    address, mask = ip_int(ip), ip_int(mask)
+    return '' if address is None or mask is None else int_ip(address & mask)
+
+
+# Network address of an IP address in A.B.C.D format and a number of mask bits
+def network_bits(ip, bits):
+    address = ip_int(ip)
+    return '' if address is None or not 0 <= bits <= 32 else int_ip(address & mask_ints[bits])
+
+
+# Extraction rule of a section. The rule is tried when the line contains the
+# literal (if any) and the parser attribute named by when (if any) is set.
+# If the pattern matches, the action is called with the parser and the match
+# (the line is in match.string)
+class Rule(object):
+    __slots__ = ('name', 'literal', 'when', 'find', 'action')
+
+    def __init__(self, name, pattern, action, literal=None, when=None, match=False):
+        self.name = name
+        self.literal = literal
+        self.when = when
+        pattern = re.compile(pattern)
+        self.find = pattern.match if match else pattern.search
+        self.action = action
+
+
+# action that stores a group of the match in a field of the device
+def _system_field(field, group=1):
+    def action(parser, m):
+        parser.system[field] = m.group(group)
+    return action
+
+
+# action that stores the groups of the match in fields of the current interface,
+# the first group in the first field and so on
+def _interface_field(*fields, convert=None):
+    def action(parser, m):
+        interface = parser.intinfo.get(parser.item)
+        if interface is not None:
+            for group, field in enumerate(fields, 1):
+                value = m.group(group)
+                interface[field] = value if convert is None else convert(value)
+    return action
+
+
+# action that stores a group of the match in a field of the current module
+def _module_field(field, group=1):
+    def action(parser, m):
+        module = parser.diaginfo.get(parser.name + parser.item)
+        if module is not None:
+            module[field] = m.group(group)
+    return action
+
+
+# Fixed width table of a show command, as "show interfaces status" or "show
+# mac address-table". The columns are found once in the header line of the
+# table, by their titles, and then each row is sliced at them, without
+# regular expressions. A column starts at its title and ends where the next
+# one starts (the last one, at the end of the line). Some values are right
+# aligned, and start before their title when they are longer: a word across
+# two columns goes to the one that has most of it.
+#
+# columns is [(field, titles)], in the order of the values returned by
+# cells(). titles are the ones that the column has in different versions,
+# the longest first (a title can be inside another one), and field is None
+# for the columns that are not returned: they are found if they are in the
+# header, to know where the previous one ends. header is the usual header of
+# the table, whose layout is used until the one of the table is read
+class Table(object):
+
+    def __init__(self, columns, header):
+        self.columns = columns
+        self.default = self.layout(header)
+
+    # Layout of the columns in a header line: (starts of the columns but the
+    # first one, index of the column of each field), or None if the title of
+    # some field is not in the line
+    def layout(self, line):
+        found = []
+        for number, (field, titles) in enumerate(self.columns):
+            for title in titles:
+                start = line.find(title)
+                if start >= 0:
+                    found.append((start, number))
+                    break
+            else:
+                if field is not None:
+                    return None
+        found.sort()
+        columns = dict((number, index) for index, (start, number) in enumerate(found))
+        return (tuple(start for start, number in found[1:]),
+                tuple(columns[number] for number, (field, titles) in enumerate(self.columns) if field is not None))
+
+    # Layout with the columns of the line of dashes under the header, where
+    # the values do not start under the titles (as the age of NX-OS, left of
+    # its title). The dashes of a column are separated by spaces or by "+".
+    # Returns layout as is if the line does not have a column for each title
+    def rule(self, line, layout):
+        starts = [index for index in range(len(line))
+                  if line[index] == '-' and (index == 0 or line[index - 1] in ' +')]
+        if len(starts) != len(layout[0]) + 1:
+            return layout
+        return tuple(starts[1:]), layout[1]
+
+    # values of the fields in a row, stripped, with a layout
+    def cells(self, line, layout):
+        starts, indexes = layout
+        end = len(line)
+        if end > 0 and line[end - 1] == "\n":
+            end -= 1
+
+        bounds = [0]
+        for start in starts:
+            if start >= end:
+                start = end
+            elif line[start] != ' ' and line[start - 1] != ' ':
+                left = line.rfind(' ', 0, start) + 1
+                right = line.find(' ', start, end)
+                if right < 0:
+                    right = end
+                start = left if right - start > start - left else right
+            bounds.append(start)
+        bounds.append(end)
+        return [line[bounds[index]:bounds[index + 1]].strip() for index in indexes]
+
+
+# Full name of an interface as the tables show it, "Gi1/0/1" or "Gig 1/0/1":
+# a type of up to three letters is expanded (see int_types). Returns None for
+# other words, that are names in full already or not an interface (as the
+# "Port 1" of a phone). The same ports come back in every row of the mac
+# address table, so the names already expanded are kept as in expand_string
+_table_interfaces = {}
+
+
+def table_interface(cell):
+    if cell in _table_interfaces:
+        return _table_interfaces[cell]
+
+    letters = 0
+    while letters < len(cell) and letters < 4 and cell[letters].isalpha():
+        letters += 1
+    kind = expand(cell[:letters], int_types) if 0 < letters <= 3 else None
+    result = kind + cell[letters:].lstrip() if kind is not None else None
+
+    if len(_table_interfaces) >= _expanded_size:
+        _table_interfaces.clear()
+    _table_interfaces[cell] = result
+    return result
+
+
+# action that reads the columns of a table from its header line
+def _table_header(table):
+    def action(parser, m):
+        layout = table.layout(m.string)
+        if layout is not None:
+            parser.table = layout
+    return action
+
+
+# action that reads the columns of a table from the dashes under its header
+def _table_rule(table):
+    def action(parser, m):
+        if parser.table is not None:
+            parser.table = table.rule(m.string, parser.table)
+    return action
+
+
+status_table = Table([("Port", ("Port",)), ("Name", ("Name",)), ("Status", ("Status",)), ("Vlan", ("Vlan",)),
+                      ("Duplex", ("Duplex",)), ("Speed", ("Speed",)), ("Type", ("Type",))],
+                     "Port      Name               Status       Vlan       Duplex  Speed Type")
+
+cdp_table = Table([("Device ID", ("Device ID", "Device-ID")), ("Local Intrfce", ("Local Intrfce",)),
+                   ("Holdtme", ("Holdtme", "Hldtme")), (None, ("Capability",)), (None, ("Platform",)),
+                   ("Port ID", ("Port ID",))],
+                  "Device ID        Local Intrfce     Holdtme    Capability  Platform  Port ID")
+
+mac_table = Table([("Vlan", ("Vlan", "VLAN", "vlan")),
+                   ("Mac Address", ("Destination Address", "Mac Address", "MAC Address", "mac address")),
+                   ("Type", ("Address Type", "Type", "type")), (None, ("learn",)), (None, ("age",)),
+                   (None, ("Secure",)), (None, ("NTFY",)), ("Ports", ("Destination Port", "Ports", "ports"))],
+                  "Vlan    Mac Address       Type        Ports")
+
+arp_table = Table([("Protocol", ("Protocol",)), ("Address", ("Address",)), ("Age", ("Age (min)", "Age")),
+                   ("Hardware Addr", ("Hardware Addr",)), ("Type", ("Type",)), ("Interface", ("Interface",))],
+                  "Protocol  Address          Age (min)  Hardware Addr   Type   Interface")
+
+
+counter_re = re.compile(r"(\d+) (input errors|CRC|frame|overrun|ignored|output errors|collisions|interface resets)")
+counter_fields = {"input errors": "Input errors",
+                  "CRC": "CRC",
+                  "frame": "Frame errors",
+                  "overrun": "Overrun",
+                  "ignored": "Ignored",
+                  "output errors": "Output errors",
+                  "collisions": "Collisions",
+                  "interface resets": "Interface resets"}
+
+# The header of the mac address table has "Address" in some case, and the
+# rows do not
+mac_rules = [
+    Rule("header", r"", _table_header(mac_table), literal="ddress", match=True),
+    Rule("rule", r"\s*-[-+ ]*$", _table_rule(mac_table), literal="--", match=True),
+    Rule("row", r"", Parser._mac_row, match=True),
+]
+
+arp_rules = [
+    Rule("header", r"Protocol\s+Address", _table_header(arp_table), literal="Protocol", match=True),
+    Rule("row", r"", Parser._arp_row, match=True),
+]
+
+# Extraction rules of each supported command or section of sh tech, in the
+# order they are tried. The first rule that matches a line consumes it
+sections = {
+    "show running-config": [
+        Rule("interface", r"interface (\S*)", Parser._config_interface, match=True),
+        Rule("end of interface", r"!$", Parser._config_end, when="section", match=True),
+        Rule("description", r" description (.*)", _interface_field("Description"), when="section", match=True),
+        Rule("switchport mode", r" switchport mode (\w*)", _interface_field("Switchport mode"),
+             when="section", match=True),
+        Rule("access vlan", r" switchport access vlan (\d+)", _interface_field("Access vlan"),
+             literal="switchport access vlan", when="section"),
+        Rule("voice vlan", r" switchport voice vlan (\d+)", _interface_field("Voice vlan"),
+             literal="switchport voice vlan", when="section"),
+        Rule("dlci", r" frame-relay interface-dlci (\d+)", _interface_field("DLCI", convert=int),
+             literal="frame-relay interface-dlci", when="section"),
+        Rule("ip address", r" ip address ([\d.]+) ([\d.]+)", Parser._config_ip_address,
+             when="section", match=True),
+    ],
+
+    "show version": [
+        Rule("processor board", r"Processor board ID (.*)", _system_field("System ID"),
+             literal="Processor board ID"),
+        Rule("model number", r"Model number\s*: (.*)", _system_field("Model"), literal="Model number"),
+        Rule("cisco processor", r"cisco (.*) processor", _system_field("Model"), match=True),
+        Rule("cisco revision", r"Cisco (.*) \(revision", _system_field("Model"), match=True),
+        Rule("motherboard", r"Motherboard serial number\s*: (.*)", _system_field("Mother ID"),
+             literal="Motherboard serial number"),
+        Rule("image", r'System image file is "(?:flash:?|bootflash:|sup-bootflash:)(.*)\.bin"',
+             _system_field("Image"), literal="System image file is"),
+    ],
+
+    "show interfaces": [
+        Rule("status", r"(\S+) is ([\w|\s]+), line protocol is (\w+)", Parser._interface_status,
+             literal=", line protocol is ", match=True),
+        Rule("hardware and address", r"Hardware is (.+), address is ([\w.]+)",
+             _interface_field("Hardware", "Mac address"), literal="Hardware is"),
+        Rule("hardware", r"Hardware is ([\w\s-]+)$", _interface_field("Hardware"), literal="Hardware is"),
+        Rule("encapsulation", r"  Encapsulation ([\d|\w|\s|-]+),", _interface_field("Encapsulation"),
+             match=True),
+        Rule("description", r"  Description: (.*)", _interface_field("Description"), match=True),
+        Rule("internet address", r"  Internet address is ([\d.]+)/(\d+)", Parser._interface_ip_address,
+             match=True),
+        Rule("input errors", r"(\d+) input errors", Parser._interface_counters, literal="input errors"),
+        Rule("output errors", r"(\d+) output errors", Parser._interface_counters, literal="output errors"),
+        Rule("auto duplex", r"(\w+) Duplex, (\d+)Mbps, link type is (\w+), media type is (.*)",
+             Parser._interface_auto_duplex, literal="link type is"),
+        Rule("duplex", r"(\w+)-duplex, (\d+)Mb/s, media type is (.*)",
+             _interface_field("Duplex", "Speed", "Media type"), literal="-duplex, "),
+    ],
+
+    "show interfaces status": [
+        Rule("header", r"Port\s+Name\s+Status", _table_header(status_table), literal="Status", match=True),
+        Rule("row", r"", Parser._status_row, match=True),
+    ],
+
+    "show cdp neighbors": [
+        Rule("header", r"Device.ID\s+Local Intrfce", _table_header(cdp_table), literal="Local Intrfce", match=True),
+        Rule("row", r"", Parser._cdp_row, match=True),
+    ],
+
+    "show cdp neighbors detail": [
+        Rule("device id", r"Device ID: ([a-zA-Z0-9][a-zA-Z0-9_\-]*)", Parser._cdp_device_id, match=True),
+        Rule("ip address", r"\s*IP address: (.*)", Parser._cdp_ip, match=True),
+        Rule("interface", r"Interface: ([^,]+),  Port ID \(outgoing port\): (.*)", Parser._cdp_interface,
+             literal="Port ID (outgoing port)"),
+    ],
+
+    "show mac address-table": mac_rules,
+    "show mac address-table dynamic": mac_rules,
+    "show mac-address-table": mac_rules,
+    "show mac-address-table dynamic": mac_rules,
+
+    "show ip arp": arp_rules,
+    "show arp": arp_rules,
+
+    "show inventory": [
+        Rule("name", r'NAME: ?"(.+)", DESCR: "(.+)"', Parser._inventory_name, literal="NAME:"),
+        Rule("pid", r"PID:\s*(\S+)\s*,\s*VID:\s*\S+\s*,\s*SN:\s*(\S+)", Parser._inventory_pid, literal="PID:"),
+    ],
+
+    "show diag": [
+        Rule("eeprom", r"(.*) EEPROM:$", Parser._diag_eeprom, literal=" EEPROM:", match=True),
+        Rule("slot", r"Slot (\d+):$", Parser._diag_slot, match=True),
+        Rule("subslot", r"\s.*Slot (\d+):$", Parser._diag_subslot, literal="Slot ", match=True),
+        Rule("description", r"", Parser._diag_description, when="take_next_line", match=True),
+        Rule("part number", r"\s+Product \(FRU\) Number\s+: (.+)", _module_field("Part number"),
+             literal="Product (FRU) Number"),
+        Rule("fru part number", r"\s+FRU Part Number\s+(.+)", _module_field("Part number"),
+             literal="FRU Part Number"),
+        Rule("pcb serial number", r"\s+PCB Serial Number\s+: (.+)", _module_field("Serial number"),
+             literal="PCB Serial Number"),
+        Rule("serial number", r"\s+Serial number\s+(\S+)", _module_field("Serial number"),
+             literal="Serial number"),
+    ],
+}
+
+
+# Parses the lines of a text stream and yields the records found, device by
+# device. The stream can be a file, a pipe or any iterable of lines, and it
+# is read only once. A binary stream is decoded with encoding and errors, as
+# the parser needs it (see Parser.feed_bytes). If a stats dictionary is
+# given, the lines and seconds spent in each command are added to it. name
+# and command are the device and command at the start of the stream, when it
+# is a part of a bigger output. With profile (see new_profile), the counters
+# of the parser are added to it. source is given to the records (see Record)
+def parse_stream(stream, stats=None, name='', command='', profile=None, source='', encoding=None, errors='replace'):
+    parser = Parser(name, command, profile is not None, source, encoding, errors)
+    feed = parser.feed_bytes if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)) else parser.feed
+
+    for line in stream:
+        feed(line)
+
+        if parser.done:
+            for record in parser.done:
+                yield record
+            del parser.done[:]
+
+    parser.close()
+    for record in parser.done:
+        yield record
+
+    if stats is not None:
+        add_stats(stats, parser.stats)
+    if profile is not None:
+        add_profile(profile, parser_profile(parser))
+
+
+# Parses a text file and yields the records found. "-" is the standard input.
+# Compressed files and archives are read without extracting them to disk, one
+# member after the other (see archive_type). With index, only the supported
+# sections of the file are read (see parse_indexed). The files are read as
+# bytes, and the lines are decoded with encoding and errors (see Parser)
+def parse_file(filename, stats=None, index=False, sidecar=False, profile=None, encoding=None, errors='replace'):
+    if filename == '-':
+        for record in parse_stream(sys.stdin.buffer, stats, profile=profile, source=filename, encoding=encoding,
+                                   errors=errors):
+            yield record
+        return
+
+    kind = archive_type(filename) if os.path.isfile(filename) else None
+    if kind is not None:
+        for name, member in archive_members(filename, kind):
+            with member:
+                for record in parse_stream(member, stats, profile=profile, source=member_source(filename, name),
+                                           encoding=encoding, errors=errors):
+                    yield record
+        return
+
+    if index and os.path.isfile(filename) and os.path.getsize(filename) > 0:
+        for record in parse_indexed(filename, stats, sidecar=sidecar, profile=profile, encoding=encoding,
+                                    errors=errors):
+            yield record
+        return
+
+    with open(filename, "rb") as infile:
+        for record in parse_stream(infile, stats, profile=profile, source=filename, encoding=encoding,
+                                   errors=errors):
+            yield record
+
+
+# Compressed files, by their first bytes, and the function that opens them
+compressions = [(b"\x1f\x8b", gzip.open),
+                (b"BZh", bz2.open),
+                (b"\xfd7zXZ\x00", lzma.open)]
+
+
+# Tells whether a file is compressed (with gzip, bzip2 or xz) or is a tar or
+# zip archive, from its first bytes. Returns (open, container): open is the
+# function that opens the decompressed content, or None if it is not
+# compressed, and container is 'tar', 'zip' or None. Returns None for any
+# other file
+def archive_type(filename):
+    with open(filename, "rb") as infile:
+        head = infile.read(512)
+
+    if head.startswith(b"PK\x03\x04") or head.startswith(b"PK\x05\x06"):
+        return None, 'zip'
+
+    function = None
+    for magic, opener in compressions:
+        if head.startswith(magic):
+            function = opener
+            with opener(filename, "rb") as infile:
+                head = infile.read(512)
+            break
+
+    if head[257:262] == b"ustar":
+        return function, 'tar'
+    if function is not None:
+        return function, None
+    return None
 
-                    continue
 
-                m = re.search(r"(\d+) output errors", line)
-                if m:
-                    intinfo[name][item]['Output errors'] = int(m.group(1))
+# Yields (name, binary file) for each file in a tar or zip archive, and
+# (None, binary file) with the decompressed content of a compressed file.
+# kind is what archive_type returned. The members of a tar archive are read
+# in order, so a compressed archive is decompressed only once
+def archive_members(filename, kind):
+    function, container = kind
+
+    if container == 'zip':
+        with zipfile.ZipFile(filename) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    yield info.filename, zf.open(info)
+
+    elif container == 'tar':
+        with tarfile.open(filename, "r:*") as tar:
+            for info in tar:
+                if info.isfile():
+                    yield info.name, tar.extractfile(info)
+
+    else:
+        yield None, function(filename, "rb")
+
+
+# Source of the records of a member of an archive (see Record)
+def member_source(filename, name):
+    return filename if name is None else "%s:%s" % (filename, name)
+
+
+# Default size of the parts of a big file parsed in parallel
+chunk_size = 32 * 1024 * 1024
+
+# Parts or archive members submitted to each worker process ahead of the
+# ones whose records are being used (see parse_files)
+jobs_ahead = 2
+
+# Lines where the parser may change the device or the command: prompts,
+# section headers of sh tech and the hostname of a running-config, maybe
+# after what clean_terminal() removes. They are searched after a newline (or
+# a lone carriage return), which is much faster than ^ with re.M
+marker_start_re = re.compile(rb"(?:\x1b\[[0-9;?]*[ -/]*[@-~]|[\x07\x08 ]|--More--)*"
+                             rb"(?:[a-zA-Z0-9][a-zA-Z0-9_\-]*[#>]|------------------ |hostname )")
+marker_re = re.compile(rb"[\n\r]" + marker_start_re.pattern)
+line_end_re = re.compile(rb"\r\n?|\n")
+
+# The bytes that clean_terminal() acts on but "\r", and the start of a marker
+# line once cleaned (see build_index)
+terminal_marks = [b"\x07", b"\x08", b"\x1b"]
+clean_marker_re = re.compile(r" *(?:[a-zA-Z0-9][a-zA-Z0-9_\-]*[#>]|------------------ |hostname )")
+
+# The index of a file is kept in a file with this suffix next to it
+index_suffix = ".t2xi"
+index_version = 2
+
+
+# Offsets of the marker lines of a memory mapped file, between start and end.
+# start must be the start of a line. A line with a bell, backspace or escape
+# may start with a prompt only once a terminal shows it ("x\b\bR1#..."), so
+# these lines are cleaned (see clean_terminal) and added if they are markers
+# then. They are few, and found with a search for those bytes
+def build_index(mm, start=0, end=None):
+    if end is None:
+        end = len(mm)
+
+    offsets = array.array('q')
+    if marker_start_re.match(mm, start, end):
+        offsets.append(start)
+    offsets.extend(m.start() + 1 for m in marker_re.finditer(mm, start, end))
+
+    # next offset of each of the bytes, end if there are no more
+    found = {}
+    for byte in terminal_marks:
+        found[byte] = mm.find(byte, start, end) % (end + 1)
+
+    dirty = []
+    position = min(found.values())
+    while position < end:
+        line_start = max(mm.rfind(b"\n", start, position), mm.rfind(b"\r", start, position), start - 1) + 1
+        line_end = mm.find(b"\n", position, end)
+        line_end = end if line_end < 0 else line_end + 1
+        # the markers are ASCII, in any encoding that the parser reads
+        line = mm[line_start:line_end].decode("latin-1")
+        if any(clean_marker_re.match(text) for text in clean_terminal(line)):
+            dirty.append(line_start)
+
+        for byte, offset in found.items():
+            if offset < line_end:
+                found[byte] = mm.find(byte, line_end, end) % (end + 1)
+        position = min(found.values())
+
+    if dirty:
+        offsets = array.array('q', sorted(set(offsets).union(dirty)))
+    return offsets
+
+
+# Returns the index of a file. With sidecar, the index is read from the
+# index file if it was made for the current size and modification time of
+# the file, or it is built and saved there for the next runs
+def load_index(filename, sidecar=False):
+    info = os.stat(filename)
+    header = {"version": index_version, "size": info.st_size, "mtime": info.st_mtime_ns}
+
+    if sidecar:
+        try:
+            with open(filename + index_suffix, "rb") as indexfile:
+                if json.loads(indexfile.readline().decode("ascii")) == header:
+                    offsets = array.array('q')
+                    offsets.frombytes(indexfile.read())
+                    return offsets
+        except (IOError, ValueError):
+            pass
+
+    with open(filename, "rb") as infile, mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        offsets = build_index(mm)
+
+    if sidecar:
+        try:
+            with open(filename + index_suffix, "wb") as indexfile:
+                indexfile.write(json.dumps(header).encode("ascii") + b"\n")
+                indexfile.write(offsets.tobytes())
+        except IOError:
+            pass
+
+    return offsets
+
+
+# Lines of a byte range of a memory mapped file, decoded. The lines end only
+# at "\n", as in feed_bytes, the parser takes care of "\r"
+def _read_lines(mm, start, end, encoding, errors):
+    return io.TextIOWrapper(io.BytesIO(mm[start:end]), encoding, errors, newline="\n")
+
+
+# Parses the byte range from start to end of a file and yields the records
+# found, like parse_stream. Only the marker lines of the index and the lines
+# of the sections that have rules are passed to the parser: the rest of the
+# lines would not change anything
+def parse_indexed(filename, stats=None, start=0, end=None, name='', command='', sidecar=False, profile=None,
+                  encoding=None, errors='replace'):
+    parser = Parser(name, command, profile is not None, filename, encoding, errors)
+
+    with open(filename, "rb") as infile, mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if end is None:
+            end = len(mm)
+
+        if sidecar:
+            offsets = load_index(filename, sidecar)
+            offsets = offsets[bisect.bisect_left(offsets, start):bisect.bisect_left(offsets, end)]
+        else:
+            offsets = build_index(mm, start, end)
 
-                    m = re.search(r"(\d+) collisions", line)
-                    if m:
-                        intinfo[name][item]['Collisions'] = int(m.group(1))
+        points = [start] + [offset for offset in offsets if offset != start] + [end]
+        is_marker = len(offsets) > 0 and offsets[0] == start
 
-                    m = re.search(r"(\d+) interface resets", line)
-                    if m:
-                        intinfo[name][item]['Interface resets'] = int(m.group(1))
-                    continue
+        for i in range(len(points) - 1):
+            region_start, region_end = points[i], points[i + 1]
 
-                m = re.search(r"(\w+) Duplex, (\d+)Mbps, link type is (\w+), media type is (.*)", line)
-                if m:
-                    intinfo[name][item]['Duplex'] = m.group(3) + "-" + m.group(1)
-                    intinfo[name][item]['Speed'] = m.group(3) + "-" + m.group(2)
-                    intinfo[name][item]['Media type'] = m.group(4)
-                    continue
+            if is_marker or i > 0:
+                line_end = mm.find(b"\n", region_start, region_end)
+                line_end = region_end if line_end < 0 else line_end + 1
+                for line in _read_lines(mm, region_start, line_end, parser.encoding, errors):
+                    parser.feed(line)
+                region_start = line_end
 
-                m = re.search(r"(\w+)-duplex, (\d+)Mb/s, media type is (.*)", line)
-                if m:
-                    intinfo[name][item]['Duplex'] = m.group(1)
-                    intinfo[name][item]['Speed'] = m.group(2)
-                    intinfo[name][item]['Media type'] = m.group(3)
-                    continue
+            if region_start < region_end and parser.command in sections:
+                for line in _read_lines(mm, region_start, region_end, parser.encoding, errors):
+                    parser.feed(line)
 
+            if parser.done:
+                for record in parser.done:
+                    yield record
+                del parser.done[:]
 
+    parser.close()
+    for record in parser.done:
+        yield record
 
-            # processes "show interfaces status" command or section of sh tech
-            if command == 'show interfaces status' and name != '':
-                if line[:4] != "Port":
-                    item = expand(line[:2], int_types)
-
-                    if item is not None:
-                        item = item + line[2:8].rstrip()
-
-                        if item not in intinfo[name].keys():
-                            intinfo[name][item] = collections.OrderedDict(zip(intfields, [''] * len(intfields)))
-                            intinfo[name][item]['Name'] = name
-                            intinfo[name][item]['Interface'] = item
-                            intinfo[name][item]['Type'] = re.split(r'\d', item)[0]
-                            intinfo[name][item]['Number'] = re.split(r'\D+', item, maxsplit=1)[1]
-
-                    m = re.search(r"(.+) (connected|notconnect|disabled)\s+(\S+)\s+(\S+)\s+(\S+)\s+(.*)", line[8:])
-                    if m:
-                        if not intinfo[name][item].get('Description') == '':
-                            intinfo[name][item]['Description'] = m.group(1)
-                        if not intinfo[name][item].get('Status') == '':
-                            intinfo[name][item]['Status'] = m.group(2)
-                        if not intinfo[name][item].get('Access vlan') == '':
-                            if m.group(3) == 'trunk':
-                                intinfo[name][item]['Switchport mode'] = 'trunk'
-                            elif m.group(3) == 'routed':
-                                intinfo[name][item]['Switchport mode'] = 'routed'
-                            else:
-                                intinfo[name][item]['Access vlan'] = m.group(3)
-                        intinfo[name][item]['Duplex'] = m.group(4)
-                        intinfo[name][item]['Speed'] = m.group(5)
-                        intinfo[name][item]['Media type'] = m.group(6)
-
-                        
-
-            # processes "show CDP neighbors" command or section of sh tech
-            if command == 'show cdp neighbors' and name != '':
-                # extracts information as per patterns
-
-                m = re.search(r"^([a-zA-Z0-9][a-zA-Z0-9_\-.]*)$", line)
-                if m:
-                    if m.group(1) != "Capability" and m.group(1) != "Device":
-                        cdp_neighbor = m.group(1)
-                    continue
+    if stats is not None:
+        add_stats(stats, parser.stats)
+    if profile is not None:
+        add_profile(profile, parser_profile(parser))
 
-                m = re.search(r"^                 (...) (\S+)", line)
-                if m and cdp_neighbor != '':
-
-                    local_int = expand(m.group(1), int_types) + m.group(2)
-                    remote_int_draft = line[68:-1]
-
-                    tmp = expand(remote_int_draft[:2], int_types)
-
-                    if tmp is not None:
-                        remote_int = tmp + remote_int_draft[3:].strip()
-                    else:
-                        remote_int = remote_int_draft
-                        
-                    if (name + local_int + remote_int) not in cdpinfo.keys():
-                        cdpinfo[name + local_int + remote_int] = collections.OrderedDict()
-                    
-                    if cdp_neighbor not in cdpinfo[name + local_int + remote_int].keys():
-                        cdpinfo[name + local_int + remote_int][cdp_neighbor] = collections.OrderedDict(
-                            zip(cdpfields, [''] * len(cdpfields)))
-                    
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Name'] = name
-
-                    # splits name and domain, if any
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Remote device name'] = \
-                    cdp_neighbor.split('.',1)[0]
-                    if len(cdp_neighbor.split('.')) > 1:
-                        cdpinfo[name + local_int + remote_int][cdp_neighbor]['Remote device domain'] = \
-                        cdp_neighbor.split('.',1)[1]
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Local interface'] = local_int
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Remote interface'] = remote_int
-
-                    cdp_neighbor = ''
-                    continue
 
-                m = re.search(r"^([a-zA-Z0-9][a-zA-Z0-9_\-.]*)\s+(...) ([\d/]+)\s+\d+\s+", line)
-                if m:
-                    cdp_neighbor = m.group(1)
-                    local_int = expand(m.group(2), int_types) + m.group(3)
-                    remote_int_draft = line[68:-1]
-
-                    tmp = expand(remote_int_draft[:2], int_types)
-
-                    if tmp is not None:
-                        remote_int = tmp + remote_int_draft[3:]
-                    else:
-                        remote_int = remote_int_draft
-                        
-                    if (name + local_int) not in cdpinfo.keys():
-                        cdpinfo[name + local_int + remote_int] = collections.OrderedDict()
-                    
-                    if cdp_neighbor not in cdpinfo[name + local_int + remote_int].keys():
-                        cdpinfo[name + local_int + remote_int][cdp_neighbor] = collections.OrderedDict(
-                            zip(cdpfields, [''] * len(cdpfields)))
-                    
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Name'] = name
-                    # splits name and domain, if any
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Remote device name'] = \
-                    cdp_neighbor.split('.',1)[0]
-                    if len(cdp_neighbor.split('.')) > 1:
-                        cdpinfo[name + local_int + remote_int][cdp_neighbor]['Remote device domain'] = \
-                        cdp_neighbor.split('.',1)[1]
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Local interface'] = local_int
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Remote interface'] = remote_int
-
-                    cdp_neighbor = ''
-
-
-            # processes "show inventory" command
-            if command == 'show inventory' and name != '':
-
-                # extracts information as per patterns
-                # m = re.search('NAME: .* on Slot (\d+) SubSlot (\d+)\", DESCR: \"(.+)\"', line)
-                m = re.search('NAME:\"(.+)\", DESCR: \"(.+)\"', line)
-                if m:
-                    slot = m.group(1)
-                    subslot = m.group(2)
-                    item = slot + '-' + subslot
-                    if (name + item) not in diaginfo.keys():
-                        diaginfo[name + item] = collections.OrderedDict(zip(diagfields, [''] * len(diagfields)))
-                    diaginfo[name + item]['Name'] = name
-                    diaginfo[name + item]['Slot'] = slot
-                    diaginfo[name + item]['Subslot'] = subslot
-                    diaginfo[name + item]['Description'] = m.group(3)
-                    continue
-                    
-                # extracts information as per patterns
-                m = re.search('NAME: \"(.+)\", DESCR: \"(.+)\"', line)
-                if m:
-                    slot = m.group(1)
-                    subslot = ''
-                    item = slot
-                    if (name + item) not in diaginfo.keys():
-                        diaginfo[name + item] = collections.OrderedDict(zip(diagfields, [''] * len(diagfields)))
-                    diaginfo[name + item]['Name'] = name
-                    diaginfo[name + item]['Slot'] = slot
-                #    diaginfo[name + item]['Subslot'] = subslot
-                    diaginfo[name + item]['Description'] = m.group(2)
+# Splits a file in parts of about size bytes that can be parsed separately.
+# Returns a list of (filename, start, end, name, command): the byte range of
+# each part and the device and command at its start.
+#
+# The file is split only at prompts and section headers, once the name of
+# the first device is known. The output of "show interfaces status" depends
+# on what was found before for the same device, so a device is not split
+# before its last "show interfaces status".
+def split_file(filename, size=chunk_size, sidecar=False, encoding=None, errors='replace'):
+    filesize = os.path.getsize(filename)
+    if filesize <= size:
+        return [(filename, 0, None, '', '')]
+
+    offsets = load_index(filename, sidecar)
+
+    # runs the marker lines through a parser, to know the device and
+    # command before each one. A marker line that is not valid in the
+    # encoding is in a part, whose worker reports it
+    parser = Parser(encoding=encoding, errors="replace" if errors == "strict" else errors)
+    markers = []
+    with open(filename, "rb") as infile, mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start in offsets:
+            m = line_end_re.search(mm, start)
+            line = mm[start:m.end() if m else filesize].decode(parser.encoding, errors)
+
+            name, command = parser.name, parser.command
+            parser.feed(line)
+            del parser.done[:]
+
+            if name != '':
+                markers.append((start, name, command, parser.name, parser.command))
+
+    # a split point inside a device must be after its last "show interfaces status"
+    allowed = [False] * len(markers)
+    status_later = False
+    for i in range(len(markers) - 1, -1, -1):
+        start, name, command, new_name, new_command = markers[i]
+        if new_command == 'show interfaces status':
+            status_later = True
+        allowed[i] = new_name != name or not status_later
+        if new_name != name:
+            status_later = False
+
+    parts = []
+    part_start, part_name, part_command = 0, '', ''
+    for i, (start, name, command, new_name, new_command) in enumerate(markers):
+        if allowed[i] and start - part_start >= size:
+            parts.append((filename, part_start, start, part_name, part_command))
+            part_start, part_name, part_command = start, name, command
+    parts.append((filename, part_start, None, part_name, part_command))
+
+    return parts
+
+
+# Parses a part of a file in a worker process. Returns the list of records,
+# the counters of each command and, with profile, the profile of the part
+def _parse_part(part, index=False, sidecar=False, profile=False, encoding=None, errors='replace'):
+    filename, start, end, name, command = part
+    stats = {}
+    profile = new_profile() if profile else None
+
+    if index:
+        records = list(parse_indexed(filename, stats, start, end, name, command, sidecar, profile, encoding, errors))
+        return records, stats, profile
+
+    with open(filename, "rb") as infile:
+        infile.seek(start)
+        data = infile.read() if end is None else infile.read(end - start)
+
+    records = list(parse_stream(io.BytesIO(data), stats, name, command, profile, filename, encoding, errors))
+    return records, stats, profile
+
+
+# Binary file with the size bytes of a file that start at offset, as a member
+# of an uncompressed tar archive, read without reading the rest of the file
+class FileRange(io.RawIOBase):
+
+    def __init__(self, filename, offset, size):
+        self.infile = open(filename, "rb")
+        self.infile.seek(offset)
+        self.left = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.infile.readinto(memoryview(buffer)[:min(len(buffer), self.left)])
+        self.left -= count
+        return count
+
+    def close(self):
+        self.infile.close()
+        super(FileRange, self).close()
+
+
+# Parses a member of an archive in a worker process, like _parse_part. where
+# tells where the member is (see _archive_jobs): None to read it from the
+# archive, (offset, size) of the member in an uncompressed tar, or the path
+# of a temporary file with its content, which is removed once parsed
+def _parse_member(filename, kind, name, where, profile=False, encoding=None, errors='replace'):
+    stats = {}
+    profile = new_profile() if profile else None
+
+    def parse(member):
+        return list(parse_stream(member, stats, profile=profile, source=member_source(filename, name),
+                                 encoding=encoding, errors=errors))
 
+    try:
+        if isinstance(where, str):
+            with open(where, "rb") as member:
+                records = parse(member)
+        elif where is not None:
+            with io.BufferedReader(FileRange(filename, *where), 1024 * 1024) as member:
+                records = parse(member)
+        elif kind[1] == 'zip':
+            with zipfile.ZipFile(filename) as zf, zf.open(name) as member:
+                records = parse(member)
+        else:
+            with kind[0](filename, "rb") as member:
+                records = parse(member)
+    finally:
+        if isinstance(where, str):
+            os.remove(where)
+    return records, stats, profile
+
+
+# Members of an archive to be parsed in worker processes: (name, where), see
+# _parse_member. Zip members and compressed files are read by the workers.
+# The members of an uncompressed tar are read by the workers at their
+# offset. A compressed tar is decompressed here only once, and each member
+# is copied, block by block, to a temporary file in directory when it is
+# asked for, so that neither the archive is decompressed again for each
+# member nor the members are kept in memory
+def _archive_jobs(filename, kind, directory):
+    function, container = kind
+
+    if container == 'zip':
+        with zipfile.ZipFile(filename) as zf:
+            names = [info.filename for info in zf.infolist() if not info.is_dir()]
+        for name in names:
+            yield name, None
+
+    elif container == 'tar':
+        with tarfile.open(filename, "r:*") as tar:
+            for info in tar:
+                if not info.isfile():
                     continue
-                # original give trailing blanks for PID
-                #m = re.search(r'PID: (.*) \s*,\s* VID: .*, SN: (\S+)', line)
-                m = re.search(r'PID:\s*(\S+)\s*,\s*VID:\s*\S+\s*,\s*SN:\s*(\S+)', line)
-
-                if m and item != '':
-                    diaginfo[name + item]['Name'] = name
-                    diaginfo[name + item]['Slot'] = slot
-                    diaginfo[name + item]['Subslot'] = subslot
-                    diaginfo[name + item]['Part number'] = m.group(1)
-                    diaginfo[name + item]['Serial number'] = m.group(2)
-
+                if function is None:
+                    yield info.name, (info.offset_data, info.size)
                     continue
 
+                fd, path = tempfile.mkstemp(".member", dir=directory)
+                with tar.extractfile(info) as member, os.fdopen(fd, "wb") as outfile:
+                    shutil.copyfileobj(member, outfile, 1024 * 1024)
+                yield info.name, path
 
-            # processes "show diag" command
-            if command == 'show diag' and name != '':
-                # extracts information as per patterns
-                m = re.search(r"^(.*) EEPROM:$", line)
-                if m:
-                    slot = m.group(1)
-                    subslot = ''
-                    item = slot
-                    if (name + item) not in diaginfo.keys():
-                        diaginfo[name + item] = collections.OrderedDict(zip(diagfields, [''] * len(diagfields)))
-                    diaginfo[name + item]['Name'] = name
-                    diaginfo[name + item]['Slot'] = slot
-                    diaginfo[name + item]['Subslot'] = subslot
-                    
-                    continue
+    else:
+        yield None, None
 
-                m = re.search(r"^Slot (\d+):$", line)
-                if m:
-                    slot = m.group(1)
-                    subslot = ''
-                    item = slot
-                    if (name + item) not in diaginfo.keys():
-                        diaginfo[name + item] = collections.OrderedDict(zip(diagfields, [''] * len(diagfields)))
-                    diaginfo[name + item]['Name'] = name
-                    diaginfo[name + item]['Slot'] = slot
-                    diaginfo[name + item]['Subslot'] = subslot
-                    take_next_line = 1
-                    
-                    continue
 
-                # submodules are showed indented from base modules                    
-                m = re.search(r"^\s.*Slot (\d+):$", line)
-                if m:
-                    subslot = m.group(1)
-                    item = slot + '-' + subslot
-                    if (name + item) not in cdpinfo.keys():
-                        diaginfo[name + item] = collections.OrderedDict(zip(diagfields, [''] * len(diagfields)))
-                    diaginfo[name + item]['Name'] = name
-                    diaginfo[name + item]['Slot'] = slot
-                    diaginfo[name + item]['Subslot'] = subslot
-                    take_next_line = 1
+# Default maximum size of the parse cache
+cache_size = 1024 * 1024 * 1024
 
-                    continue
-                    
-                if take_next_line == 1:
-                    diaginfo[name + item]['Description'] = line.strip()
-                    take_next_line = 0
-                    continue
-                    
-                m = re.search(r"\s+Product \(FRU\) Number\s+: (.+)", line)
-                if m:
-                    diaginfo[name + item]['Part number'] = m.group(1)
-                    continue
+cache_suffix = ".t2xc"
 
-                m = re.search(r"\s+FRU Part Number\s+(.+)", line)
-                if m:
-                    diaginfo[name + item]['Part number'] = m.group(1)
-                    continue
+# Records in each pickle of a cache entry
+cache_batch = 1000
 
-                m = re.search(r"\s+PCB Serial Number\s+: (.+)", line)
-                if m:
-                    diaginfo[name + item]['Serial number'] = m.group(1)
-                    continue
 
-                m = re.search(r"\s+Serial number\s+(\S+)", line)
-                if m:
-                    diaginfo[name + item]['Serial number'] = m.group(1)
-                    continue
+# Files changed less than this number of seconds ago are always hashed
+cache_fresh = 2
 
-            # processes "show CDP neighbors detail" command or section of sh tech
-            if command == 'show cdp neighbors detail' and name != '':
-                # extracts information as per patterns
+# Database in the cache directory with the hash of the content of each file,
+# by its path and stat
+cache_files = "files.db"
 
-                m = re.search(r"^Device ID: ([a-zA-Z0-9][a-zA-Z0-9_\-]*)", line)
-                if m:
-                    cdp_neighbor = m.group(1)
-                    continue
 
-                m = re.search(r"^IP address: (.*)", line)
-                if m:
-                    cdp_ip = m.group(1)
-                    continue
+# Persistent cache of the records of each parsed file, kept in a directory
+# with one file per input. The entries are keyed by the SHA-256 of the
+# content of the input and of the source of this script, so a file is
+# parsed again when it changes or when the parser changes, and a copied,
+# moved or touched file is not. The hash of each file is kept in
+# cache_files with its path, size and modification and change times, and
+# the files whose stat did not change are not read again to hash them.
+# When the directory grows over max_size, the least recently used entries
+# are removed. Its size is taken once, and then counted as entries are
+# written
+class Cache(object):
 
-                m = re.search(r"Interface: (\w+),  Port ID \(outgoing port\): (.*)", line)
-                if m:
-                    local_int = m.group(1)
-                    remote_int = m.group(2)
-                    if (name + local_int + remote_int) not in cdpinfo.keys():
-                        cdpinfo[name + local_int + remote_int] = collections.OrderedDict()
-                    
-                    if cdp_neighbor not in cdpinfo[name + local_int + remote_int].keys():
-                        cdpinfo[name + local_int + remote_int][cdp_neighbor] = collections.OrderedDict(
-                            zip(cdpfields, [''] * len(cdpfields)))
-                    
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Name'] = name
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Remote device'] = cdp_neighbor
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Remote device name'] = \
-                    cdp_neighbor.split('.',1)[0]
-                    if len(cdp_neighbor.split('.')) > 1:
-                        cdpinfo[name + local_int + remote_int][cdp_neighbor]['Remote device domain'] = \
-                        cdp_neighbor.split('.',1)[1]
-
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Local interface'] = local_int
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Remote interface'] = remote_int
-                    cdpinfo[name + local_int + remote_int][cdp_neighbor]['Remote device IP'] = cdp_ip
-
-                    cdp_neighbor = ''
-                    cdp_ip = ''
-                    continue
+    def __init__(self, directory, max_size=cache_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(size for mtime, size, path in self._entries())
 
+        with open(__file__, "rb") as source:
+            self.version = hashlib.sha256(__version__.encode() + source.read()).digest()
 
-# Writes all the information collected
+        # without it, every file is hashed
+        try:
+            self.files = sqlite3.connect(os.path.join(directory, cache_files), isolation_level=None)
+            # losing the last hashes only means hashing those files again
+            self.files.execute("PRAGMA synchronous = OFF")
+            self.files.execute("CREATE TABLE IF NOT EXISTS files (stat TEXT PRIMARY KEY, content TEXT, used REAL)")
+        except sqlite3.Error:
+            self.files = None
 
-style_header = xlwt.easyxf('font: bold 1')
+    # Key of the content of a file, and of the options that change how it is
+    # parsed, or None if it is not a regular file
+    def key(self, filename, options=()):
+        if filename == '-' or not os.path.isfile(filename):
+            return None
 
-# Writes system information
-cont = len(systeminfo.keys())
-print(cont, " devices")
+        digest = hashlib.sha256(self.version)
+        digest.update(repr(options).encode("utf-8"))
+        digest.update(self._content(filename).encode("ascii"))
+        return digest.hexdigest()
+
+    # SHA-256 of the content of a file, from cache_files if its stat did not
+    # change. The change time of a file is set by every write, but a write
+    # just after the one that was hashed could leave it as it was within the
+    # resolution of the clock, so the files changed in the last cache_fresh
+    # seconds are always hashed
+    def _content(self, filename):
+        info = os.stat(filename)
+        stat = repr((os.path.realpath(filename), info.st_dev, info.st_ino, info.st_size, info.st_mtime_ns,
+                     info.st_ctime_ns))
+        known = self.files is not None and time.time() - max(info.st_mtime, info.st_ctime) >= cache_fresh
+
+        if known:
+            try:
+                row = self.files.execute("SELECT content FROM files WHERE stat = ?", (stat,)).fetchone()
+                if row is not None:
+                    self.files.execute("UPDATE files SET used = ? WHERE stat = ?", (time.time(), stat))
+                    return row[0]
+            except sqlite3.Error:
+                pass
+
+        digest = hashlib.sha256()
+        with open(filename, "rb") as infile:
+            for block in iter(lambda: infile.read(1024 * 1024), b''):
+                digest.update(block)
+
+        if known:
+            try:
+                self.files.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+                                   (stat, digest.hexdigest(), time.time()))
+            except sqlite3.Error:
+                pass
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + cache_suffix)
+
+    def __contains__(self, key):
+        return os.path.isfile(self._path(key))
+
+    # Returns an iterator over the records stored with the key, or None if
+    # there are none. They are read a batch at a time (see CacheEntry). The
+    # entry may be of a file with the same content at another path: the
+    # sources of its records are then made those of filename
+    def get(self, key, filename):
+        try:
+            entry = open(self._path(key), "rb")
+        except OSError:
+            return None
+        try:
+            batch = pickle.load(entry)
+            # the entries of older versions have no file name
+            written = filename
+            if isinstance(batch, str):
+                written, batch = batch, pickle.load(entry)
+        except Exception:
+            entry.close()
+            return None
 
-if cont > 0:
-    wb = xlwt.Workbook()
-    ws_system = wb.add_sheet('System')
+        # the modification time of the entries tells which were used last
+        os.utime(self._path(key))
+        self.hits = self.hits + 1
+        return self._records(entry, batch, written, filename)
+
+    def _records(self, entry, batch, written, filename):
+        with entry:
+            while True:
+                for record in batch:
+                    if written != filename and record.source.startswith(written):
+                        record.source = filename + record.source[len(written):]
+                    yield record
+                try:
+                    batch = pickle.load(entry)
+                except EOFError:
+                    return
+
+    # Starts the entry of the key for filename, whose records are added as
+    # they are parsed
+    def put(self, key, filename):
+        return CacheEntry(self, key, filename)
+
+    # (modification time, size, path) of each entry
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(cache_suffix):
+                try:
+                    info = entry.stat()
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, entry.path))
+        return entries
+
+    # Counts an entry of size bytes that replaced one of replaced bytes, and
+    # removes the least recently used entries if the cache is bigger than
+    # max_size. Other runs may share the directory, so its size is taken
+    # again before removing any
+    def added(self, size, replaced=0):
+        self.size = self.size + size - replaced
+        if self.size <= self.max_size:
+            return
+
+        entries = sorted(self._entries())
+        self.size = sum(size for mtime, size, path in entries)
+        while entries and self.size > self.max_size:
+            mtime, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.size = self.size - size
+
+        # the hashes of the files not used since the oldest entry left
+        if self.files is not None and entries:
+            try:
+                self.files.execute("DELETE FROM files WHERE used < ?", (entries[0][0],))
+            except sqlite3.Error:
+                pass
+
+
+# Entry of the cache being written. The records are pickled in batches of
+# cache_batch as they are added, instead of kept until the whole file is
+# parsed, and the entry replaces the old one on close. A cache that cannot
+# be written is not an error, the file is parsed again next time
+class CacheEntry(object):
+
+    def __init__(self, cache, key, filename):
+        self.cache = cache
+        self.path = cache._path(key)
+        self.temp = "%s.%d" % (self.path, os.getpid())
+        self.batch = []
+        self.batches = 0
+        self.entry = None
+        try:
+            self.entry = open(self.temp, "wb")
+            pickle.dump(filename, self.entry, pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            self.abort()
+
+    def append(self, record):
+        self.batch.append(record)
+        if len(self.batch) >= cache_batch:
+            self._dump()
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def _dump(self):
+        if self.entry is not None:
+            try:
+                pickle.dump(self.batch, self.entry, pickle.HIGHEST_PROTOCOL)
+            except OSError:
+                self.abort()
+        self.batch = []
+        self.batches = self.batches + 1
+
+    def close(self):
+        # a file without records has an entry with an empty batch
+        if self.batch or not self.batches:
+            self._dump()
+        if self.entry is None:
+            return
+        try:
+            self.entry.close()
+            size = os.path.getsize(self.temp)
+            replaced = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            os.replace(self.temp, self.path)
+        except OSError:
+            self.abort()
+            return
+        self.entry = None
+        self.cache.added(size, replaced)
+
+    # Drops the entry, when it cannot be written or the file was not parsed to its end
+    def abort(self):
+        self.batch = []
+        if self.entry is not None:
+            self.entry.close()
+            self.entry = None
+        if os.path.exists(self.temp):
+            os.remove(self.temp)
+
+
+# Default directory of the parse cache
+def cache_dir():
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                        "tech2xl")
+
+
+# Parses several files and yields their records, file by file in the given
+# order. With jobs > 1 the files, and the parts of the files bigger than
+# part_size, are parsed in that number of processes. The records are yielded
+# in the same order as if the files were parsed one by one. Pipes and the
+# standard input are always parsed in this process. index and sidecar are
+# passed to parse_file. With a cache, the files found in it are not parsed,
+# and the records of the other ones are stored in it. With profile, a list,
+# the profile of each file is appended to it (see new_profile), with the name
+# of the file in "file" and whether it was read from the cache in "cached".
+# encoding and errors are used to decode the files (see Parser). With failed,
+# a list, the files that cannot be decoded (with errors 'strict') are
+# appended to it as (filename, error), and the rest of each is left out,
+# instead of raising the error
+#
+# The parts and archive members are submitted to the workers in the same
+# order, at most jobs_ahead times jobs of them before the one whose records
+# are being yielded, so the records that the workers return, and the members
+# of compressed archives waiting on disk, do not grow with the input
+def parse_files(filenames, jobs=1, stats=None, part_size=chunk_size, index=False, sidecar=False, cache=None,
+                profile=None, encoding=None, errors='replace', failed=None):
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    # members of compressed tar archives, for the workers (see _archive_jobs)
+    directories = []
+
+    # (function, arguments) of each part or member parsed in the workers, and
+    # None after the last one of each file
+    def worker_jobs(files):
+        for filename, key, parallel in files:
+            if not parallel:
+                continue
+            kind = archive_type(filename)
+            if kind is None:
+                for part in split_file(filename, part_size, sidecar, encoding, errors):
+                    yield _parse_part, (part, index, sidecar, profile is not None, encoding, errors)
+            else:
+                if kind[0] is not None and kind[1] == 'tar' and not directories:
+                    directories.append(tempfile.mkdtemp(prefix="tech2xl-members-"))
+                for name, where in _archive_jobs(filename, kind, directories[0] if directories else None):
+                    yield _parse_member, (filename, kind, name, where, profile is not None, encoding, errors)
+            yield None
 
-    for i, value in enumerate(systemfields):
-        ws_system.write(0, i, value, style_header)
+    try:
+        files = []
+        for filename in filenames:
+            key = cache.key(filename, (encoding, errors)) if cache is not None else None
+            parallel = (key is None or key not in cache) and executor is not None and os.path.isfile(filename) \
+                and os.path.getsize(filename) > 0
+            files.append((filename, key, parallel))
+
+        jobs_left = worker_jobs(files)
+        submitted = collections.deque()
+
+        # submits the next jobs, and returns the future of the first one (None at the end of a file)
+        def next_future():
+            while len(submitted) < jobs * jobs_ahead:
+                job = next(jobs_left, False)
+                if job is False:
+                    break
+                submitted.append(None if job is None else executor.submit(job[0], *job[1]))
+            return submitted.popleft()
+
+        for filename, key, parallel in files:
+            file_profile = None
+            if profile is not None:
+                file_profile = new_profile()
+                file_profile['file'] = filename
+                profile.append(file_profile)
+
+            records = cache.get(key, filename) if key is not None and not parallel else None
+            if records is not None:
+                if file_profile is not None:
+                    file_profile['cached'] = True
+                for record in records:
+                    yield record
+                continue
 
-    row = 1
-    for name in systeminfo.keys():
+            parsed = cache.put(key, filename) if key is not None else None
+            try:
+                if not parallel:
+                    for record in parse_file(filename, stats, index, sidecar, file_profile, encoding, errors):
+                        if parsed is not None:
+                            parsed.append(record)
+                        yield record
+                else:
+                    # each part is dropped once its records are taken, instead of keeping all of them until the end
+                    future = next_future()
+                    while future is not None:
+                        records, part_stats, part_profile = future.result()
+                        if parsed is not None:
+                            parsed.extend(records)
+                        for record in records:
+                            yield record
+                        if stats is not None:
+                            add_stats(stats, part_stats)
+                        if file_profile is not None:
+                            add_profile(file_profile, part_profile)
+                        records = None
+                        future = next_future()
+            except UnicodeDecodeError as e:
+                if parsed is not None:
+                    parsed.abort()
+                if failed is None:
+                    raise
+                failed.append((filename, e))
+                # the parts of the file after the one that failed
+                while parallel and future is not None:
+                    future = next_future()
+                continue
+            except BaseException:
+                if parsed is not None:
+                    parsed.abort()
+                raise
 
-        for col in range(0,len(systemfields)):
+            if parsed is not None:
+                parsed.close()
 
-            ws_system.write(row, col, systeminfo[name][systemfields[col]])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        for directory in directories:
+            shutil.rmtree(directory, ignore_errors=True)
 
-        row = row + 1
 
-    # Writes interface information
-    cont = 0
-    for name in intinfo.keys():
-        cont = cont + len(intinfo[name])
-    print(cont, " interfaces")
+# Adds the per command counters of a parser to stats
+def add_stats(stats, more):
+    for command, (lines, seconds) in more.items():
+        total = stats.setdefault(command, [0, 0.0])
+        total[0] += lines
+        total[1] += seconds
 
-    if cont > 0:
-        ws_int = wb.add_sheet('Interfaces')
 
-        for i, value in enumerate(intfields):
-            ws_int.write(0, i, value, style_header)
+# Counters of the parsers of a file or part of a file (see Parser): lines and
+# seconds of each section and of each device, and hits and misses of each
+# rule of each section
+def new_profile():
+    return {'sections': {}, 'devices': {}, 'rules': {}, 'cached': False}
 
-        row = 1
-        for name in intinfo.keys():
-            for item in intinfo[name].keys():
 
-                for col in range(0,len(intfields)):
+def parser_profile(parser):
+    return {'sections': parser.stats, 'devices': parser.devices, 'rules': parser.rules}
 
-                    ws_int.write(row, col, intinfo[name][item][intfields[col]])
 
-                row = row + 1
+def add_profile(profile, more):
+    add_stats(profile['sections'], more['sections'])
+    add_stats(profile['devices'], more['devices'])
+    for command, counts in more['rules'].items():
+        total = profile['rules'].setdefault(command, {})
+        for rule, (hits, misses) in counts.items():
+            count = total.setdefault(rule, [0, 0])
+            count[0] += hits
+            count[1] += misses
 
-    # Writes CDP information
-    cont = 0
-    for name in cdpinfo.keys():
-        cont = cont + len(cdpinfo[name])
-    print(cont, " neighbors")
 
-    if cont > 0:
-        ws_cdp = wb.add_sheet('CDP neighbors')
+def print_stats(stats):
+    print("%-40s %12s %10s %12s" % ("Section", "Lines", "Seconds", "Lines/sec"))
+    for command, (lines, seconds) in sorted(stats.items(), key=lambda item: -item[1][1]):
+        rate = lines / seconds if seconds > 0 else 0
+        print("%-40s %12d %10.3f %12.0f" % (command or "(none)", lines, seconds, rate))
 
-        for i, value in enumerate(cdpfields):
-            ws_cdp.write(0, i, value, style_header)
 
-        row = 1
-        for name in cdpinfo.keys():
-            for item in cdpinfo[name].keys():
+# Sheets of the output: title, fields and records of each one
+def report_sheets(report):
+    return [('System', systemfields, report.systems()),
+            ('Interfaces', intfields, report.interfaces()),
+            ('CDP neighbors', cdpfields, report.neighbors()),
+            ('Modules', diagfields, report.modules()),
+            ('Links', linkfields, report.links()),
+            ('Subnets', subnetfields, report.subnets()),
+            ('MAC addresses', macfields, report.macs()),
+            ('ARP', arpfields, report.arps())]
 
-                for col in range(0,len(cdpfields)):
 
-                    ws_cdp.write(row, col, cdpinfo[name][item][cdpfields[col]])
+# Sheets of the parsed records, which are kept in snapshots
+snapshot_titles = ['System', 'Interfaces', 'CDP neighbors', 'Modules']
 
-                row = row + 1
+snapshot_version = 1
 
-    # Writes show diag information
-    cont = len(diaginfo.keys())
-    print(cont, " modules")
 
-    if cont > 0:
-        ws_diag = wb.add_sheet('Modules')
+# Saves the records of the report in a snapshot file, for a later run with
+# --diff-against: for each sheet, its fields and the key and values of each
+# record, pickled and compressed. The file is replaced at once, so it can be
+# the same snapshot that the run compares with
+def save_snapshot(report, filename):
+    sheets = collections.OrderedDict()
+    for title, fields, records in report_sheets(report):
+        if title in snapshot_titles:
+            sheets[title] = (fields, [(record.key, record.values) for record in records])
 
-        for i, value in enumerate(diagfields):
-            ws_diag.write(0, i, value, style_header)
+    temp = "%s.%d" % (filename, os.getpid())
+    with gzip.open(temp, "wb", compresslevel=1) as outfile:
+        pickle.dump({'version': snapshot_version, 'sheets': sheets}, outfile, pickle.HIGHEST_PROTOCOL)
+    os.replace(temp, filename)
 
-        row = 1
-        for item in diaginfo.keys():
 
-            for col in range(0,len(diagfields)):
-                ws_diag.write(row, col, diaginfo[item][diagfields[col]])
+# Returns the sheets of a snapshot: {title: (fields, [(key, values)...])}
+def load_snapshot(filename):
+    try:
+        with gzip.open(filename, "rb") as infile:
+            snapshot = pickle.load(infile)
+    except (OSError, EOFError, pickle.UnpicklingError) as e:
+        raise ValueError("%s is not a tech2xl snapshot (%s)" % (filename, e))
+
+    if not isinstance(snapshot, dict) or snapshot.get('version') != snapshot_version:
+        raise ValueError("%s is not a tech2xl snapshot of this version" % filename)
+    return snapshot['sheets']
+
+
+# Sheets with the rows of the report that are not in the snapshot (added),
+# that are different (changed) or that are only in the snapshot (removed).
+# Each row has the values of the report (or of the snapshot, if removed),
+# the fields that changed with their old and new values and, for the counters
+# of the interfaces, how much they grew since the snapshot
+def diff_sheets(report, snapshot):
+    sheets = []
+    for title, fields, records in report_sheets(report):
+        if title in snapshot_titles:
+            old_fields, old_rows = snapshot.get(title, (fields, []))
+            counters = [field for field in counter_fields.values() if field in fields]
+            diff_fields = ["Change", "Changes"] + fields + ["%s delta" % counter for counter in counters]
+            sheets.append((title, diff_fields, _diff_rows(diff_fields, fields, records, old_fields, old_rows,
+                                                          counters)))
+    return sheets
+
+
+# Rows of a sheet of diff_sheets. The rows of the snapshot are put in a
+# dictionary by their key, and each record of the report takes its row
+# out of it, so the comparison is linear and the rows left are the removed
+# ones
+def _diff_rows(diff_fields, fields, records, old_fields, old_rows, counters):
+    Row = type("Change", (Record,), {'__slots__': (), 'fields': diff_fields,
+                                     'positions': field_positions(diff_fields)})
+    old_positions = field_positions(old_fields)
+    positions = [old_positions.get(field) for field in fields]
+    same_fields = old_fields == fields
+    index = collections.OrderedDict(old_rows)
+
+    for record in records:
+        old = index.pop(record.key, None)
+        row = Row(record.key, record.source)
+        row.values[2:2 + len(fields)] = record.values
+
+        if old is None:
+            row['Change'] = "added"
+            yield row
+            continue
+
+        if same_fields and old == record.values:
+            continue
+        if not same_fields:
+            old = ['' if position is None else old[position] for position in positions]
+        changes = ["%s: %s -> %s" % (field, old_value, value)
+                   for field, old_value, value in zip(fields, old, record.values) if value != old_value]
+        if not changes:
+            continue
+
+        row['Change'] = "changed"
+        row['Changes'] = ", ".join(changes)
+        for counter in counters:
+            value, old_value = record[counter], old[fields.index(counter)]
+            if isinstance(value, int) and isinstance(old_value, int):
+                row["%s delta" % counter] = value - old_value
+        yield row
+
+    for key, old in index.items():
+        row = Row(key)
+        row['Change'] = "removed"
+        for field, position in zip(fields, positions):
+            if position is not None:
+                row[field] = old[position]
+        yield row
+
+
+# Counters of the interfaces kept in the history (see CounterHistory)
+history_counters = ["Input errors", "CRC", "Frame errors", "Overrun", "Ignored", "Output errors", "Collisions",
+                    "Interface resets"]
+
+# Counters added up in the Errors column of the Error trends sheet
+trend_errors = ["Input errors", "Output errors"]
+
+
+# Append-only history of the counters of the interfaces, one snapshot per
+# run, kept in a directory with one file per column:
+#
+#   keys.txt         "hostname<tab>interface" of each interface, its line number is its id
+#   interface.i4     id of the interface of each row (32 bit integers)
+#   <counter>.i8     value of the counter in each row, -1 if unknown (64 bit integers)
+#   snapshots.i8     time, first row and number of rows of each snapshot
+#
+# The rows of a snapshot are only taken into account once its entry is in
+# snapshots.i8, which is written last, so a run that is interrupted while
+# appending leaves the history as it was. As the snapshots are in time
+# order, the rows of a time window are contiguous at the end of the columns:
+# only those rows are read (memory mapped, with NumPy), however long the
+# history is. Without NumPy, the columns are read with array, and the
+# trends are computed row by row
+class CounterHistory(object):
+    columns = [("interface", 'i')] + [(counter.lower().replace(' ', '_'), 'q') for counter in history_counters]
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self.keys = []
+        try:
+            with open(self._path("keys.txt"), encoding="utf-8") as infile:
+                self.keys = [tuple(line.rstrip("\n").split("\t", 1)) for line in infile]
+        except IOError:
+            pass
+        self.ids = dict((key, id) for id, key in enumerate(self.keys))
+
+        self.snapshots = array.array('q')
+        try:
+            with open(self._path("snapshots.i8"), "rb") as infile:
+                data = infile.read()
+            self.snapshots.frombytes(data[:len(data) - len(data) % 24])
+        except IOError:
+            pass
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _column_path(self, name, typecode):
+        return self._path("%s.%s" % (name, "i4" if typecode == 'i' else "i8"))
+
+    # (time, first row, rows) of each snapshot
+    def entries(self):
+        return [tuple(self.snapshots[i:i + 3]) for i in range(0, len(self.snapshots), 3)]
+
+    # Appends a snapshot with the counters of the interfaces of the report
+    def add(self, report, when=None):
+        keys = []
+        values = [array.array('q') for counter in history_counters]
+        for record in report.interfaces():
+            counters = [record[counter] for counter in history_counters]
+            if any(isinstance(value, int) for value in counters):
+                keys.append(record.key)
+                for column, value in zip(values, counters):
+                    column.append(value if isinstance(value, int) else -1)
+        self.append(keys, values, when)
+
+    # Appends a snapshot of the given interfaces, (hostname, interface), with
+    # a column of values for each of the history_counters
+    def append(self, keys, values, when=None):
+        when = int(time.time() if when is None else when)
+        if len(self.snapshots) > 0 and when < self.snapshots[-3]:
+            raise ValueError("the history in %s has snapshots after this one" % self.directory)
+
+        new_keys = []
+        ids = array.array('i')
+        for key in keys:
+            id = self.ids.get(key)
+            if id is None:
+                id = self.ids[key] = len(self.keys)
+                self.keys.append(key)
+                new_keys.append(key)
+            ids.append(id)
+        if new_keys:
+            with open(self._path("keys.txt"), "a", encoding="utf-8") as outfile:
+                outfile.writelines("%s\t%s\n" % key for key in new_keys)
+
+        start = self.snapshots[-2] + self.snapshots[-1] if len(self.snapshots) > 0 else 0
+        for (name, typecode), column in zip(self.columns, [ids] + list(values)):
+            with open(self._column_path(name, typecode), "ab") as outfile:
+                # the rows of an interrupted append are overwritten
+                outfile.truncate(start * column.itemsize)
+                column.tofile(outfile)
+
+        entry = array.array('q', [when, start, len(ids)])
+        with open(self._path("snapshots.i8"), "ab") as outfile:
+            outfile.truncate(len(self.snapshots) * 8)
+            entry.tofile(outfile)
+        self.snapshots.extend(entry)
+
+    # Rows of the snapshots taken since start: (times, ids, columns), as NumPy
+    # arrays if np is given, else as arrays
+    def _read(self, start, np=None):
+        entries = [entry for entry in self.entries() if entry[0] >= start]
+        if not entries:
+            return None
+        first = entries[0][1]
+        rows = entries[-1][1] + entries[-1][2] - first
+
+        columns = []
+        for name, typecode in self.columns:
+            size = 4 if typecode == 'i' else 8
+            if np is not None:
+                columns.append(np.memmap(self._column_path(name, typecode), dtype="i%d" % size, mode="r",
+                                         offset=first * size, shape=(rows,)))
+            else:
+                column = array.array(typecode)
+                with open(self._column_path(name, typecode), "rb") as infile:
+                    infile.seek(first * size)
+                    column.fromfile(infile, rows)
+                columns.append(column)
+
+        if np is not None:
+            times = np.repeat(np.array([entry[0] for entry in entries], dtype=np.int64),
+                              [entry[2] for entry in entries])
+        else:
+            times = array.array('q')
+            for when, first_row, count in entries:
+                times.extend(array.array('q', [when]) * count)
+        return times, columns[0], columns[1:]
+
+    # Rows of the Error trends sheet: the top interfaces with most errors
+    # (see trend_errors) in the snapshots of the last days, or all of them
+    # with errors if top is 0. The increase of each counter is added up over
+    # the intervals between snapshots, and a counter that decreased was reset
+    # (cleared or the device restarted): then its increase is its new value.
+    # A counter missing from a snapshot is compared with its last known value
+    # at the next snapshot that has it
+    def trends(self, days=30, top=100, now=None):
+        start = (time.time() if now is None else now) - days * 86400
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+
+        rows = self._read(start, numpy)
+        if rows is None:
+            return
+        if numpy is not None:
+            ranked = _trends_numpy(numpy, len(self.keys), top, *rows)
+        else:
+            ranked = _trends_rows(top, *rows)
+
+        for id, snapshots, first, last, increases, resets, errors, peak in ranked:
+            trend = Trend(self.keys[id])
+            trend['Name'], trend['Interface'] = self.keys[id]
+            trend['Snapshots'] = snapshots
+            trend['From'] = time.strftime("%Y-%m-%d %H:%M", time.localtime(first))
+            trend['To'] = time.strftime("%Y-%m-%d %H:%M", time.localtime(last))
+            trend['Errors'] = errors
+            trend['Errors per day'] = round(errors * 86400.0 / (last - first), 1) if last > first else ''
+            trend['Peak errors per day'] = round(peak, 1) if last > first else ''
+            trend['Counter resets'] = resets
+            for counter, increase in zip(history_counters, increases):
+                trend["%s increase" % counter] = increase
+            yield trend
+
+
+# Increase of a counter in each interval, given by the position of its
+# first row in the rows sorted by interface (see _trends_numpy), whether it
+# was reset, and the seconds it took. A missing value (-1) has no increase,
+# and the next known value is compared with the last known one. The
+# intervals have all the rows of their interfaces, so the last known value
+# of each row is only looked for if one of them is missing
+def _increase_numpy(np, column, order, ids, times, pairs):
+    old, new = pairs, pairs + 1
+    old_values, new_values = column[order[old]], column[order[new]]
+    known = (old_values >= 0) & (new_values >= 0)
+    if not known.all():
+        last = np.where(np.asarray(column)[order] >= 0, np.arange(len(order)), -1)
+        # none known yet (-1) points to the first row, which is unknown then
+        old = np.maximum(np.maximum.accumulate(last)[pairs], 0)
+        old_values = column[order[old]]
+        known = (old_values >= 0) & (new_values >= 0) & (ids[old] == ids[new])
+    decreased = known & (new_values < old_values)
+    increase = np.where(decreased, new_values, new_values - old_values)
+    increase[~known] = 0
+    return increase, decreased, times[new] - times[old]
+
+
+# Totals of each interface in the rows of a CounterHistory, with NumPy: the
+# rows are sorted by interface (keeping the time order), and the intervals
+# are the pairs of consecutive rows of the same interface. The interfaces
+# are ranked with the error counters only, and the other totals are computed
+# for the intervals of the interfaces returned. Returns, for the top
+# interfaces with most errors (all of them with errors if top is 0), (id,
+# snapshots, first time, last time, increase of each counter, resets,
+# errors, peak errors per day)
+def _trends_numpy(np, keys, top, times, ids, columns):
+    order = np.argsort(ids, kind="stable")
+    ids = np.asarray(ids)[order]
+    times = times[order]
+    same = ids[1:] == ids[:-1]
+    pairs = np.flatnonzero(same)
+    pair_ids = ids[pairs + 1]
+
+    total_errors = np.zeros(keys, dtype=np.int64)
+    for counter, column in zip(history_counters, columns):
+        if counter in trend_errors:
+            increase = _increase_numpy(np, column, order, ids, times, pairs)[0]
+            total_errors += np.bincount(pair_ids, weights=increase, minlength=keys).astype(np.int64)
+
+    ranked = np.argsort(-total_errors, kind="stable")
+    ranked = ranked[total_errors[ranked] > 0][:top or None]
+    if len(ranked) == 0:
+        return []
+
+    # the intervals of the interfaces returned
+    wanted = np.zeros(keys, dtype=bool)
+    wanted[ranked] = True
+    pairs = pairs[wanted[pair_ids]]
+    pair_ids = ids[pairs + 1]
+
+    increases = []
+    reset = np.zeros(len(pairs), dtype=bool)
+    # errors per day in each interval, each counter over the seconds since its last known value
+    rates = np.zeros(len(pairs))
+    for counter, column in zip(history_counters, columns):
+        increase, decreased, seconds = _increase_numpy(np, column, order, ids, times, pairs)
+        reset |= decreased
+        if counter in trend_errors:
+            rates += np.where(seconds > 0, increase * 86400.0 / np.maximum(seconds, 1), 0)
+        increases.append(np.bincount(pair_ids, weights=increase, minlength=keys))
+    resets = np.bincount(pair_ids, weights=reset, minlength=keys)
+    peak = np.zeros(keys)
+    np.maximum.at(peak, pair_ids, rates)
+
+    first_rows = np.searchsorted(ids, ranked, side="left")
+    last_rows = np.searchsorted(ids, ranked, side="right") - 1
+    return [(int(id), int(last_row - first_row + 1), int(times[first_row]), int(times[last_row]),
+             [int(increase[id]) for increase in increases], int(resets[id]), int(total_errors[id]), float(peak[id]))
+            for id, first_row, last_row in zip(ranked, first_rows, last_rows)]
+
+
+# Same as _trends_numpy, one row at a time: the last known value of each
+# counter of each interface, and its time, are kept
+def _trends_rows(top, times, ids, columns):
+    totals = {}
+    previous = {}
+    for row, id in enumerate(ids):
+        values = [column[row] for column in columns]
+        total = totals.get(id)
+        if total is None:
+            totals[id] = [id, 1, times[row], times[row], [0] * len(columns), 0, 0, 0.0]
+            previous[id] = [(value, times[row]) if value >= 0 else None for value in values]
+            continue
+        last = previous[id]
+        reset = False
+        errors = 0
+        rate = 0.0
+        for i, (counter, value) in enumerate(zip(history_counters, values)):
+            if value < 0:
+                continue
+            if last[i] is not None:
+                old_value, old_time = last[i]
+                increase = value if value < old_value else value - old_value
+                reset = reset or value < old_value
+                total[4][i] += increase
+                if counter in trend_errors:
+                    errors += increase
+                    seconds = times[row] - old_time
+                    if seconds > 0:
+                        rate += increase * 86400.0 / seconds
+            last[i] = (value, times[row])
+        total[1] += 1
+        total[3] = times[row]
+        total[5] += reset
+        total[6] += errors
+        total[7] = max(total[7], rate)
+    ranked = sorted((total for total in totals.values() if total[6] > 0), key=lambda total: (-total[6], total[0]))
+    return [tuple(total) for total in ranked[:top or None]]
+
+
+# Writes an Excel 97 (.xls) file with xlwt. The workbook is kept in memory
+# until close(). A sheet with more rows than an .xls sheet can hold
+# continues in another sheet, named "<title> 2" and so on. The sheets without
+# rows are left out but, as a workbook must have a sheet, the first one is
+# written with only its header if no sheet has rows (as a diff with no change)
+class XlsWriter(object):
+    max_rows = 65536
+
+    def __init__(self, filename):
+        import xlwt
+
+        self.filename = filename
+        self.style_header = xlwt.easyxf('font: bold 1')
+        self.wb = xlwt.Workbook()
+        self.sheets = 0
+        self.first = None
+
+    def _add_sheet(self, title, fields):
+        ws = self.wb.add_sheet(title)
+        self.sheets = self.sheets + 1
+        for i, value in enumerate(fields):
+            ws.write(0, i, value, self.style_header)
+        return ws
+
+    def write_sheet(self, title, fields, records):
+        if self.first is None:
+            self.first = (title, fields)
+
+        ws = None
+        part = 1
+        for record in records:
+            if ws is None or row == self.max_rows:
+                ws = self._add_sheet(title if part == 1 else "%s %d" % (title, part), fields)
+                part = part + 1
+                row = 1
+
+            for col in range(0, len(fields)):
+                ws.write(row, col, record[fields[col]])
 
             row = row + 1
 
-    try:
-        wb.save(sys.argv[1])
-    except IOError as e:
-        print("Could not write " + sys.argv[1] + ". Check if file is not open in Excel. \nError: ", e)
-        sys.exit(1)
+    def close(self):
+        if self.sheets == 0 and self.first is not None:
+            self._add_sheet(*self.first)
+        self.wb.save(self.filename)
+
+
+# Writes an Excel 2007 (.xlsx) file. Each row is written to the zip file as
+# it is produced, so the memory used does not depend on the number of rows.
+# A sheet with more rows than an .xlsx sheet can hold continues in another
+# sheet, named "<title> 2" and so on. As in XlsWriter, the sheets without rows
+# are left out, but the first one is written if no sheet has rows
+class XlsxWriter(object):
+    max_rows = 1048576
+
+    # rows are compressed in batches of this size
+    batch_rows = 1000
+
+    ns = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    rel_ns = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+    content_types = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                     '<Default Extension="xml" ContentType="application/xml"/>'
+                     '<Override PartName="/xl/workbook.xml" '
+                     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                     '<Override PartName="/xl/styles.xml" '
+                     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+                     '%s</Types>')
+
+    sheet_type = ('<Override PartName="/xl/worksheets/sheet%d.xml" '
+                  'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>')
+
+    root_rels = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                 '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                 '<Relationship Id="rId1" Target="xl/workbook.xml" '
+                 'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+                 '</Relationships>')
+
+    # style 1 is the bold font of the headers
+    styles = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+              '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+              '<fonts count="2"><font><sz val="10"/><name val="Arial"/></font>'
+              '<font><b/><sz val="10"/><name val="Arial"/></font></fonts>'
+              '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+              '<fill><patternFill patternType="gray125"/></fill></fills>'
+              '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+              '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+              '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+              '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+              '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+              '</styleSheet>')
+
+    # characters that are not allowed in XML
+    invalid_xml_re = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.zf = zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
+        self.titles = []
+        self.first = None
+
+    @staticmethod
+    def _column(col):
+        letters = ''
+        col = col + 1
+        while col > 0:
+            col, rest = divmod(col - 1, 26)
+            letters = chr(ord('A') + rest) + letters
+        return letters
+
+    def _cell(self, ref, value, style=''):
+        if isinstance(value, int):
+            return '<c r="%s"%s><v>%d</v></c>' % (ref, style, value)
+        # repr() is the shortest text that reads back as the same float, and
+        # a cell cannot hold infinity nor NaN
+        if isinstance(value, float) and value - value == 0:
+            return '<c r="%s"%s><v>%r</v></c>' % (ref, style, value)
+
+        value = self.invalid_xml_re.sub('', str(value))
+        space = ' xml:space="preserve"' if value != value.strip() else ''
+        return '<c r="%s" t="inlineStr"%s><is><t%s>%s</t></is></c>' % (ref, style, space, xml_escape(value))
+
+    def _start_sheet(self, title, fields, columns):
+        self.titles.append(title)
+        out = self.zf.open("xl/worksheets/sheet%d.xml" % len(self.titles), "w", force_zip64=True)
+        header = ''.join(self._cell(columns[col] + '1', field, ' s="1"') for col, field in enumerate(fields))
+        out.write(('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                   '<worksheet xmlns="%s"><sheetData><row r="1">%s</row>' % (self.ns, header)).encode("utf-8"))
+        return out
+
+    @staticmethod
+    def _end_sheet(out, batch):
+        batch.append('</sheetData></worksheet>')
+        out.write(''.join(batch).encode("utf-8"))
+        out.close()
+
+    def write_sheet(self, title, fields, records):
+        if self.first is None:
+            self.first = (title, fields)
+        columns = [self._column(col) for col in range(len(fields))]
+
+        out = None
+        batch = []
+        part = 1
+        for record in records:
+            if out is None or row > self.max_rows:
+                if out is not None:
+                    self._end_sheet(out, batch)
+                    batch = []
+                out = self._start_sheet(title if part == 1 else "%s %d" % (title, part), fields, columns)
+                part = part + 1
+                row = 2
+
+            cells = []
+            for col, field in enumerate(fields):
+                value = record[field]
+                if value != '':
+                    cells.append(self._cell(columns[col] + str(row), value))
+            batch.append('<row r="%d">%s</row>' % (row, ''.join(cells)))
+            row = row + 1
 
-else:
-    print("No device found")
+            if len(batch) >= self.batch_rows:
+                out.write(''.join(batch).encode("utf-8"))
+                batch = []
+
+        if out is not None:
+            self._end_sheet(out, batch)
+
+    def close(self):
+        if not self.titles and self.first is not None:
+            title, fields = self.first
+            self._end_sheet(self._start_sheet(title, fields, [self._column(col) for col in range(len(fields))]), [])
+
+        sheets = ''.join('<sheet name="%s" sheetId="%d" r:id="rId%d"/>' % (xml_escape(title), i, i)
+                         for i, title in enumerate(self.titles, 1))
+        rels = ''.join('<Relationship Id="rId%d" Target="worksheets/sheet%d.xml" Type="%s/worksheet"/>'
+                       % (i, i, self.rel_ns) for i in range(1, len(self.titles) + 1))
+        rels = rels + '<Relationship Id="rId%d" Target="styles.xml" Type="%s/styles"/>' % (
+            len(self.titles) + 1, self.rel_ns)
+
+        self.zf.writestr("[Content_Types].xml", self.content_types % ''.join(
+            self.sheet_type % i for i in range(1, len(self.titles) + 1)))
+        self.zf.writestr("_rels/.rels", self.root_rels)
+        self.zf.writestr("xl/workbook.xml",
+                         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                         '<workbook xmlns="%s" xmlns:r="%s"><sheets>%s</sheets></workbook>'
+                         % (self.ns, self.rel_ns, sheets))
+        self.zf.writestr("xl/_rels/workbook.xml.rels",
+                         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                         '%s</Relationships>' % rels)
+        self.zf.writestr("xl/styles.xml", self.styles)
+        self.zf.close()
+
+
+# Writes each sheet to its own CSV file, named after the output file and the
+# sheet: report.csv gives report_System.csv, report_Interfaces.csv...
+class CsvWriter(object):
+
+    def __init__(self, filename):
+        self.base = os.path.splitext(filename)[0]
+
+    def write_sheet(self, title, fields, records):
+        with open("%s_%s.csv" % (self.base, title.replace(' ', '_')), "w", newline='', encoding="utf-8") as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(fields)
+            for record in records:
+                writer.writerow([record[field] for field in fields])
+
+    def close(self):
+        pass
+
+
+# Writes one JSON object per line and per row, with the title of its sheet
+# in "Sheet" and the fields of the sheet
+class JsonLinesWriter(object):
+
+    def __init__(self, filename):
+        self.outfile = open(filename, "w", encoding="utf-8")
+
+    def write_sheet(self, title, fields, records):
+        for record in records:
+            row = collections.OrderedDict([("Sheet", title)])
+            for field in fields:
+                row[field] = record[field]
+            self.outfile.write(json.dumps(row) + "\n")
+
+    def close(self):
+        self.outfile.close()
+
+
+# Writes each sheet to a table of an SQLite database, named after the sheet in
+# lower case (system, interfaces, cdp_neighbors, modules), with one text
+# column per field. The tables are created again if they already exist. All
+# the rows are inserted with executemany in one transaction
+class SqliteWriter(object):
+
+    def __init__(self, filename):
+        self.db = sqlite3.connect(filename)
+
+    @staticmethod
+    def _quote(name):
+        return '"%s"' % name.replace('"', '""')
+
+    def write_sheet(self, title, fields, records):
+        table = self._quote(title.lower().replace(' ', '_'))
+        self.db.execute("DROP TABLE IF EXISTS %s" % table)
+        # columns without a type keep the values as they are (integers, floats
+        # and text), where TEXT would store the numbers as text
+        self.db.execute("CREATE TABLE %s (%s)" % (table, ", ".join(self._quote(field) for field in fields)))
+        self.db.executemany("INSERT INTO %s VALUES (%s)" % (table, ", ".join("?" * len(fields))),
+                            ([record[field] for field in fields] for record in records))
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+# Output formats, by name (see --format) and by file extension
+formats = {'xls': XlsWriter,
+           'xlsx': XlsxWriter,
+           'csv': CsvWriter,
+           'jsonl': JsonLinesWriter,
+           'sqlite': SqliteWriter}
+
+writers = {'.xls': XlsWriter,
+           '.xlsx': XlsxWriter,
+           '.csv': CsvWriter,
+           '.jsonl': JsonLinesWriter,
+           '.ndjson': JsonLinesWriter,
+           '.db': SqliteWriter,
+           '.sqlite': SqliteWriter,
+           '.sqlite3': SqliteWriter}
+
+
+# Writes the records of the report to a file. The format is the given one, or
+# else it is taken from the extension of the file name (Excel 97 if it is
+# not known). The rows are passed to the writer one by one, as the report
+# yields them, and each writer outputs them without keeping them. With
+# timings, the seconds taken by each sheet, and by closing the file, are
+# stored in it. sheets are written instead of the ones of the report, if
+# given (see diff_sheets)
+def write_report(report, filename, format=None, timings=None, sheets=None):
+    if format is not None:
+        writer = formats[format](filename)
+    else:
+        writer = writers.get(os.path.splitext(filename)[1].lower(), XlsWriter)(filename)
+
+    for title, fields, records in (report_sheets(report) if sheets is None else sheets):
+        start = time.perf_counter()
+        writer.write_sheet(title, fields, records)
+        if timings is not None:
+            timings[title] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    writer.close()
+    if timings is not None:
+        timings['(close)'] = time.perf_counter() - start
+
+
+# Writes the profile of a run as JSON: the profile of each file (see
+# parse_files), and the seconds taken to parse all the files and to write
+# each sheet
+def write_profile(filename, files, parse_seconds, write_seconds, total_seconds):
+    def counters(stats):
+        return collections.OrderedDict((name or "(none)", {"lines": lines, "seconds": seconds})
+                                       for name, (lines, seconds) in sorted(stats.items(), key=lambda item: -item[1][1]))
+
+    result = []
+    for profile in files:
+        commands_seen = counters(profile['sections'])
+        for command, counts in profile['rules'].items():
+            section = commands_seen.setdefault(command, {"lines": 0, "seconds": 0.0})
+            section["unmatched lines"] = counts.get(None, [0, 0])[1]
+            section["rules"] = collections.OrderedDict((rule.name, {"hits": counts[rule.name][0],
+                                                                    "misses": counts[rule.name][1]})
+                                                       for rule in sections[command] if rule.name in counts)
+
+        result.append(collections.OrderedDict([
+            ("file", profile['file']),
+            ("cached", profile['cached']),
+            ("lines", sum(lines for lines, seconds in profile['sections'].values())),
+            ("seconds", sum(seconds for lines, seconds in profile['sections'].values())),
+            ("sections", commands_seen),
+            ("devices", counters(profile['devices']))]))
+
+    with open(filename, "w") as outfile:
+        json.dump(collections.OrderedDict([
+            ("version", __version__),
+            ("seconds", total_seconds),
+            ("parse seconds", parse_seconds),
+            ("write seconds", write_seconds),
+            ("files", result)]), outfile, indent=1)
+        outfile.write("\n")
+
+
+# Receives the output of the commands from many producers at the same time,
+# on TCP or Unix sockets, and adds the records to report. Each connection
+# (and the standard input) is fed to its own Parser line by line as it
+# arrives, so nothing is written to disk. The records of a device are added
+# when the input moves to another device, and when the connection is closed.
+#
+# flush() writes the report, with the devices still being received, to the
+# output file. serve() runs until SIGINT or SIGTERM, and flushes on SIGUSR1
+class Server(object):
+    block_size = 65536
+
+    def __init__(self, report, output, format=None, encoding=None, errors='replace'):
+        self.report = report
+        self.output = output
+        self.format = format
+        self.parsers = set()
+        self.encoding = encoding
+        self.errors = errors
+
+    # The input is read in blocks and split in lines at "\n", as the lines of a
+    # file (readline() of asyncio fails on lines longer than its limit, and a
+    # capture with only "\r" as line end is a single line). The blocks of an
+    # unfinished line are joined once its end arrives
+    async def _read(self, reader, source):
+        parser = Parser(source=source, encoding=self.encoding, errors=self.errors)
+        self.parsers.add(parser)
+        try:
+            pending = []
+            while True:
+                block = await reader.read(self.block_size)
+                if not block:
+                    break
+                end = block.rfind(b"\n")
+                if end < 0:
+                    pending.append(block)
+                    continue
 
-print("%s seconds" %(time.time() - start_time))
+                pending.append(block[:end + 1])
+                for line in io.BytesIO(b"".join(pending)):
+                    parser.feed_bytes(line)
+                pending = [block[end + 1:]]
+                if parser.done:
+                    self.report.update(parser.done)
+                    del parser.done[:]
+
+            if pending:
+                parser.feed_bytes(b"".join(pending))
+        except UnicodeDecodeError as e:
+            # with errors "strict", the rest of the input is left out
+            print("Could not parse " + source + ". \nError: ", e)
+        finally:
+            self.parsers.discard(parser)
+            parser.close()
+            self.report.update(parser.done)
+
+    async def _connection(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        try:
+            await self._read(reader, "%s:%s" % peer[:2] if isinstance(peer, tuple) else "unix:%s" % (peer or ''))
+        except ConnectionError:
+            # a producer that went away: what it sent until then was added by _read
+            pass
+        finally:
+            writer.close()
+
+    # reads the standard input in a thread, which works with files and pipes
+    # alike, and does not keep the program from exiting
+    async def _stdin(self):
+        loop = asyncio.get_event_loop()
+        reader = asyncio.StreamReader()
+
+        def pump():
+            for block in iter(lambda: sys.stdin.buffer.read1(self.block_size), b''):
+                loop.call_soon_threadsafe(reader.feed_data, block)
+            loop.call_soon_threadsafe(reader.feed_eof)
+
+        threading.Thread(target=pump, daemon=True).start()
+        await self._read(reader, '-')
+
+    def flush(self):
+        for parser in list(self.parsers):
+            self.report.update(parser.records())
+        try:
+            write_report(self.report, self.output, self.format)
+        except (IOError, sqlite3.Error) as e:
+            print("Could not write " + self.output + ". \nError: ", e)
+            return
+        print("%d devices written to %s" % (self.report.counts()['devices'], self.output))
+
+    # addresses are "host:port" for TCP and "unix:path" for Unix sockets
+    def serve(self, addresses, stdin=False):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        stop = loop.create_future()
+
+        servers = []
+        for address in addresses:
+            if address.startswith("unix:"):
+                servers.append(loop.run_until_complete(asyncio.start_unix_server(self._connection, address[5:])))
+            else:
+                host, port = address.rsplit(":", 1)
+                servers.append(loop.run_until_complete(asyncio.start_server(self._connection, host or None,
+                                                                            int(port))))
+            print("Listening on " + address)
+
+        tasks = [loop.create_task(self._stdin())] if stdin else []
+
+        loop.add_signal_handler(signal.SIGUSR1, self.flush)
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, lambda: stop.done() or stop.set_result(None))
+
+        try:
+            loop.run_until_complete(stop)
+        finally:
+            for server in servers:
+                server.close()
+                loop.run_until_complete(server.wait_closed())
+            for task in tasks:
+                task.cancel()
+            loop.close()
+
+
+# inotify events of the watched directory (see inotify(7)): a file written
+# and closed, moved in or out, or removed, and lost events
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+inotify_mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+inotify_event = struct.Struct("iIII")
+
+
+# Returns a non-blocking inotify descriptor that watches the files of
+# directory, or None where inotify is not available (not Linux, or no more
+# watches allowed)
+def inotify_watch(directory):
+    try:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (ImportError, OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), inotify_mask) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+# (mask, file name) of the events read from an inotify descriptor
+def inotify_events(data):
+    offset = 0
+    while offset < len(data):
+        wd, mask, cookie, length = inotify_event.unpack_from(data, offset)
+        offset += inotify_event.size
+        yield mask, os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+        offset += length
+
+
+# Watches a directory where new files keep arriving, and keeps the output
+# file up to date. Each file is parsed once, and again only when it changes
+# (by its size and modification time): its records replace the ones of its
+# previous version, and the ones of a removed file are dropped. The report
+# is then made again from the records of all the files, in the order of
+# their names, and written. The files are found with inotify, or else by
+# looking at the directory every interval seconds, and the output is written
+# once no file changed in the last debounce seconds, so that a burst of new
+# files is written once. Hidden files (as the temporary ones of many
+# copying tools) and the index and cache files of tech2xl are not parsed.
+#
+# parse(filename) returns the records of a file. The records of every file
+# are kept in memory between updates, so there is no --spill with --watch.
+# watch() runs until SIGINT or SIGTERM
+class Watcher(object):
+
+    def __init__(self, directory, output, format=None, parse=parse_file, interval=5.0, debounce=2.0):
+        self.directory = directory
+        self.output = output
+        self.format = format
+        self.parse = parse
+        self.interval = interval
+        self.debounce = debounce
+
+        # records of each file, and the size and time of the version parsed
+        self.files = {}
+        self.seen = {}
+        self.polled = None
+        self.loop = None
+        self.timer = None
+
+    # (size, modification time) of the files to parse
+    def _scan(self):
+        files = {}
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".") or entry.name.endswith((index_suffix, cache_suffix)):
+                continue
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                pass
+        return files
+
+    # parses the files added or changed since the last update, and writes the output
+    def update(self):
+        self.timer = None
+        files = self._scan()
+        changed = sorted(name for name in files if self.seen.get(name) != files[name])
+        removed = [name for name in self.seen if name not in files]
+        if not changed and not removed:
+            return
+
+        for name in removed:
+            del self.seen[name]
+            self.files.pop(name, None)
+        for name in changed:
+            try:
+                self.files[name] = list(self.parse(os.path.join(self.directory, name)))
+                self.seen[name] = files[name]
+            except (IOError, EOFError, ValueError, lzma.LZMAError, zipfile.BadZipFile, tarfile.TarError) as e:
+                # tried again in the next update
+                self.files.pop(name, None)
+                self.seen.pop(name, None)
+                print("Could not parse " + name + ". \nError: ", e)
+
+        report = Report()
+        for name in sorted(self.files):
+            report.update(self.files[name])
+        try:
+            write_report(report, self.output, self.format)
+        except (IOError, sqlite3.Error) as e:
+            print("Could not write " + self.output + ". \nError: ", e)
+            return
+        print("%s: %d files parsed, %d removed, %d devices written to %s"
+              % (time.strftime("%H:%M:%S"), len(changed), len(removed), report.counts()['devices'], self.output))
+
+    # writes the output debounce seconds after the last change
+    def _changed(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = self.loop.call_later(self.debounce, self.update)
+
+    def _read_events(self, fd):
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        for mask, name in inotify_events(data):
+            if mask & IN_Q_OVERFLOW or not name.startswith("."):
+                self._changed()
+                break
+
+    def _poll(self):
+        files = self._scan()
+        if files != self.polled:
+            self.polled = files
+            self._changed()
+        self.loop.call_later(self.interval, self._poll)
+
+    def watch(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        stop = self.loop.create_future()
+
+        self.update()
+
+        fd = inotify_watch(self.directory)
+        if fd is not None:
+            self.loop.add_reader(fd, self._read_events, fd)
+            print("Watching " + self.directory)
+        else:
+            self.polled = self._scan()
+            self.loop.call_later(self.interval, self._poll)
+            print("Watching " + self.directory + " every %g seconds" % self.interval)
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(signum, lambda: stop.done() or stop.set_result(None))
+
+        try:
+            self.loop.run_until_complete(stop)
+        finally:
+            if fd is not None:
+                self.loop.remove_reader(fd)
+                os.close(fd)
+            self.loop.close()
+
+
+def main(argv=None):
+    start_time = time.time()
+    print("tech2xl v" + __version__)
+
+    parser = argparse.ArgumentParser(prog="tech2xl", usage="tech2xl [options] <outputfile> <input files>...")
+    parser.add_argument("output", help="file to write (.xls, .xlsx, .csv, .jsonl or .db)")
+    parser.add_argument("inputs", nargs="*",
+                        help="text files with the output of the commands (wildcards accepted, - for standard input)")
+    parser.add_argument("--stats", action="store_true", help="print the lines per second of each section")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of files, or parts of big files, parsed in parallel (0: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=chunk_size // (1024 * 1024), metavar="MB",
+                        help="with --jobs, files bigger than this are split in parts of this size")
+    parser.add_argument("--index", action="store_true",
+                        help="index the sections of each file first, and read only the supported ones")
+    parser.add_argument("--sidecar", action="store_true",
+                        help="keep the index of each file in a " + index_suffix + " file, to reuse it in the next runs")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="parse all the files, without reading or updating the parse cache")
+    parser.add_argument("--cache-dir", default=cache_dir(), metavar="DIR",
+                        help="directory of the parse cache (default: %(default)s)")
+    parser.add_argument("--cache-size", type=int, default=cache_size // (1024 * 1024), metavar="MB",
+                        help="maximum size of the parse cache, the least recently used files are removed")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="write to FILE, as JSON, the lines and seconds of each file, section and device, "
+                             "the matches of each rule, and the seconds taken to write each sheet")
+    parser.add_argument("--format", choices=sorted(formats),
+                        help="format of the output file, instead of taking it from its extension")
+    parser.add_argument("--listen", action="append", metavar="ADDRESS",
+                        help="after parsing the input files, receive more output on a TCP (host:port) or Unix "
+                             "(unix:path) socket, until interrupted. SIGUSR1 writes the output file")
+    parser.add_argument("--watch", metavar="DIR",
+                        help="instead of input files, parse the files of DIR, and again each file that is added "
+                             "or changed, writing the output after each change until interrupted")
+    parser.add_argument("--interval", type=float, default=5, metavar="SECONDS",
+                        help="with --watch, seconds between looks at DIR where inotify is not available "
+                             "(default: %(default)s)")
+    parser.add_argument("--debounce", type=float, default=2, metavar="SECONDS",
+                        help="with --watch, write the output once no file changed for these seconds "
+                             "(default: %(default)s)")
+    parser.add_argument("--snapshot", metavar="FILE",
+                        help="save the parsed records in FILE, to compare the next run with them")
+    parser.add_argument("--diff-against", metavar="FILE",
+                        help="write only the devices, interfaces, neighbors and modules added, removed or changed "
+                             "since the snapshot in FILE, with the growth of the interface counters")
+    parser.add_argument("--history", metavar="DIR",
+                        help="add the error counters of the interfaces to the history in DIR, and write the "
+                             "Error trends sheet with the interfaces with most errors in the last days")
+    parser.add_argument("--trend-days", type=float, default=30, metavar="DAYS",
+                        help="with --history, days of history in the Error trends sheet (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=100,
+                        help="with --history, interfaces in the Error trends sheet, 0 for all (default: %(default)s)")
+    parser.add_argument("--spill", action="store_true",
+                        help="keep the parsed records in a temporary database on disk instead of in memory, "
+                             "for fleets too big for the memory")
+    parser.add_argument("--encoding", help="encoding of the input files (default: %s)"
+                                           % locale.getpreferredencoding(False))
+    parser.add_argument("--errors", default="replace",
+                        choices=["strict", "replace", "ignore", "backslashreplace", "surrogateescape"],
+                        help="what to do with the bytes that are not valid in the encoding (default: %(default)s)")
+    # options may come after the input files (parse_intermixed_args is new in Python 3.7)
+    args = getattr(parser, "parse_intermixed_args", parser.parse_args)(argv)
+
+    if args.watch:
+        if args.inputs or args.listen:
+            parser.error("--watch reads the input files from its directory")
+        if not os.path.isdir(args.watch):
+            parser.error("no directory " + args.watch)
+        # the output would be parsed as a new file each time it is written
+        if os.path.dirname(os.path.abspath(args.output)) == os.path.abspath(args.watch):
+            parser.error("the output file cannot be in the watched directory")
+        # the records of every file are kept in memory between changes
+        if args.spill:
+            parser.error("--spill cannot be used with --watch")
+    elif not args.inputs and not args.listen:
+        parser.error("no input files")
+    if args.encoding:
+        try:
+            codecs.lookup(args.encoding)
+        except LookupError:
+            parser.error("unknown encoding " + args.encoding)
+
+    # the snapshot is read first, it may be the same file that this run saves
+    snapshot = None
+    if args.diff_against:
+        if os.path.exists(args.diff_against):
+            try:
+                snapshot = load_snapshot(args.diff_against)
+            except ValueError as e:
+                print(e)
+                return 1
+        else:
+            print("No snapshot in " + args.diff_against + ", all the rows are added")
+            snapshot = {}
+
+    report = SpillReport() if args.spill else Report()
+    stats = {} if args.stats else None
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+
+    # takes all the input arguments, using glob to consider wildcards
+    files = []
+    for arg in args.inputs:
+        if arg == '-' and args.listen:
+            # with --listen, the standard input is one more producer
+            continue
+        files.extend([arg] if arg == '-' else glob.glob(arg))
+    cache = None if args.no_cache else Cache(args.cache_dir, args.cache_size * 1024 * 1024)
+    profile = [] if args.profile else None
+
+    if args.watch:
+        def parse(filename):
+            return parse_files([filename], jobs, None, args.chunk_size * 1024 * 1024, args.index or args.sidecar,
+                               args.sidecar, cache, None, args.encoding, args.errors)
+
+        Watcher(args.watch, args.output, args.format, parse, args.interval, args.debounce).watch()
+        return 0
+
+    failed = []
+    report.update(parse_files(files, jobs, stats, args.chunk_size * 1024 * 1024, args.index or args.sidecar,
+                              args.sidecar, cache, profile, args.encoding, args.errors, failed))
+    for filename, e in failed:
+        print("Could not parse " + filename + ". \nError: ", e)
+    parse_seconds = time.time() - start_time
+    write_seconds = {}
+
+    if cache is not None and cache.hits > 0:
+        print(cache.hits, " files read from cache")
+
+    if args.listen:
+        Server(report, args.output, args.format, args.encoding, args.errors).serve(args.listen, '-' in args.inputs)
+
+    # Writes all the information collected
+    counts = report.counts()
+    cont = counts['devices']
+    print(cont, " devices")
 
+    if cont > 0:
+        print(counts['interfaces'], " interfaces")
+        print(counts['neighbors'], " neighbors")
+        print(counts['modules'], " modules")
+        print(counts['mac addresses'], " mac addresses")
+        print(counts['arp entries'], " arp entries")
+    else:
+        print("No device found")
+
+    # with --diff-against, the output is written also without devices: all
+    # the ones of the snapshot were removed. The history and the snapshot
+    # are kept as they are then
+    if cont > 0 or snapshot is not None:
+        sheets = diff_sheets(report, snapshot) if snapshot is not None else None
+        if args.history and cont > 0:
+            try:
+                history = CounterHistory(args.history)
+                history.add(report)
+                sheets = (sheets or report_sheets(report)) + [('Error trends', trendfields,
+                                                               history.trends(args.trend_days, args.top))]
+            except (IOError, ValueError) as e:
+                print("Could not update the history in " + args.history + ". \nError: ", e)
+
+        try:
+            write_report(report, args.output, args.format, write_seconds, sheets)
+        except (IOError, sqlite3.Error) as e:
+            print("Could not write " + args.output + ". Check if file is not open in Excel. \nError: ", e)
+            return 1
+
+        if args.snapshot and cont > 0:
+            try:
+                save_snapshot(report, args.snapshot)
+            except IOError as e:
+                print("Could not write the snapshot " + args.snapshot + ". \nError: ", e)
+                return 1
+
+    if stats is not None:
+        print_stats(stats)
+
+    if profile is not None:
+        write_profile(args.profile, profile, parse_seconds, write_seconds, time.time() - start_time)
+
+    print("%s seconds" %(time.time() - start_time))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,427 @@
+# tech2xl service
+#
+# Resident HTTP service that runs tech2xl for the web upload page (see
+# upload.php), instead of starting a new tech2xl for each upload. The files
+# are parsed by a pool of worker processes that are started once, and each
+# file starts being parsed as soon as it is uploaded. The number of files
+# waiting to be parsed, and of open jobs, are limited: when they are full,
+# the service answers 503 and the client must retry later.
+#
+# usage: python tech2xl_service.py [--listen 127.0.0.1:8421] [--workers N] [--queue N] [--max-jobs N] [--dir DIR]
+#
+# API (all the answers but the result are JSON):
+#
+#   POST   /jobs?format=xlsx            creates a job, returns its id
+#   PUT    /jobs/<id>/files/<name>      uploads a file of the job (the body is the file) and starts parsing it
+#   POST   /jobs/<id>/done              no more files: the output is written when all of them are parsed
+#   GET    /jobs/<id>                   state of the job: receiving, parsing, writing, done or failed
+#   GET    /jobs/<id>/result            the output file, when the job is done
+#   DELETE /jobs/<id>                   removes the job and its files (also done one hour after it ends,
+#                                       or after its last file if done is never called)
+
+import os
+import re
+import sys
+import json
+import pickle
+import time
+import uuid
+import shutil
+import argparse
+import tempfile
+import functools
+import threading
+import concurrent.futures
+import http.server
+import socketserver
+import urllib.parse
+
+import tech2xl
+
+
+# Seconds that a job is kept after it ends
+job_lifetime = 3600
+
+# Seconds between looks for expired jobs
+expire_interval = 60
+
+# Output formats of the service (csv is not one, since it writes a file per sheet)
+content_types = {'xls': "application/vnd.ms-excel",
+                 'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                 'jsonl': "application/x-ndjson",
+                 'sqlite': "application/vnd.sqlite3"}
+
+
+# The records of an uploaded file are kept in a file with this suffix next to it
+records_suffix = ".records"
+
+
+# Parses an uploaded file in a worker process. The records are written to a
+# file next to it, pickled in batches, instead of sent back to the service,
+# that reads them only when it writes the output of the job, one file at a
+# time. Returns the number of records
+def _parse(filename):
+    count = 0
+    batch = []
+    with open(filename + records_suffix, "wb") as outfile:
+        for record in tech2xl.parse_file(filename):
+            batch.append(record)
+            if len(batch) >= tech2xl.cache_batch:
+                pickle.dump(batch, outfile, pickle.HIGHEST_PROTOCOL)
+                count += len(batch)
+                batch = []
+        pickle.dump(batch, outfile, pickle.HIGHEST_PROTOCOL)
+    return count + len(batch)
+
+
+# The records that _parse wrote for a file
+def _records(filename):
+    with open(filename + records_suffix, "rb") as infile:
+        while True:
+            try:
+                batch = pickle.load(infile)
+            except EOFError:
+                return
+            for record in batch:
+                yield record
+
+
+def _start():
+    return os.getpid()
+
+
+# Files and state of one job. state is receiving until done() is called,
+# then parsing until all the files are parsed, then writing and finally done
+# or failed. futures has the future of each file, in the order they were
+# uploaded (None while it is being uploaded), and is emptied once the output
+# is written
+class Job(object):
+
+    def __init__(self, directory, format):
+        self.id = uuid.uuid4().hex
+        self.directory = os.path.join(directory, self.id)
+        self.format = format
+        self.output = os.path.join(self.directory, "output." + format)
+        self.state = 'receiving'
+        self.error = None
+        self.names = []
+        self.futures = []
+        self.parsed = 0
+        self.failed = []
+        self.counts = None
+        self.ended = None
+        self.updated = time.time()
+        os.makedirs(os.path.join(self.directory, "files"))
+
+    # the uploaded file with that number
+    def file(self, number):
+        return os.path.join(self.directory, "files", "%d-%s" % (number, self.names[number]))
+
+    def status(self):
+        return {'id': self.id,
+                'state': self.state,
+                'files': len(self.names),
+                'parsed': self.parsed,
+                'failed': list(self.failed),
+                'counts': self.counts,
+                'error': self.error}
+
+
+class Service(object):
+
+    def __init__(self, directory, workers, queue, max_jobs):
+        self.directory = directory
+        self.queue = queue
+        self.max_jobs = max_jobs
+        self.jobs = {}
+        self.waiting = 0
+        self.lock = threading.Lock()
+        # notified when the future of an uploaded file is set
+        self.uploaded = threading.Condition(self.lock)
+
+        self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        # one thread writes the output files, so only one report at a time is being written
+        self.writer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+        # starts the worker processes now, so that the first uploads do not wait for them
+        for future in [self.pool.submit(_start) for i in range(workers)]:
+            future.result()
+
+        threading.Thread(target=self._expire_loop, daemon=True).start()
+
+    def create(self, format):
+        with self.lock:
+            self._expire()
+            if sum(1 for job in self.jobs.values() if job.ended is None) >= self.max_jobs:
+                return None
+            job = Job(self.directory, format)
+            self.jobs[job.id] = job
+            return job
+
+    # saves a file of a job from stream and submits it to the pool. Returns
+    # False if too many files are already waiting. The place of the file in
+    # the job is taken first, so files uploaded at the same time have each
+    # their own number. A file that cannot be saved is a failed one
+    def add_file(self, job, name, stream, length):
+        with self.lock:
+            if self.waiting >= self.queue:
+                return False
+            self.waiting += 1
+            number = len(job.names)
+            job.names.append(name)
+            job.futures.append(None)
+
+        try:
+            filename = job.file(number)
+            with open(filename, "wb") as outfile:
+                while length > 0:
+                    block = stream.read(min(length, 1024 * 1024))
+                    if not block:
+                        break
+                    outfile.write(block)
+                    length -= len(block)
+
+            future = self.pool.submit(_parse, filename)
+        except Exception as e:
+            future = concurrent.futures.Future()
+            future.set_exception(e)
+            raise
+        finally:
+            with self.uploaded:
+                job.futures[number] = future
+                job.updated = time.time()
+                self.uploaded.notify_all()
+            future.add_done_callback(functools.partial(self._parsed, job, name))
+        return True
+
+    def _parsed(self, job, name, future):
+        with self.lock:
+            self.waiting -= 1
+            job.parsed += 1
+            if future.cancelled() or future.exception() is not None:
+                job.failed.append(name)
+
+    def done(self, job):
+        with self.lock:
+            if job.state != 'receiving':
+                return
+            job.state = 'parsing'
+        threading.Thread(target=self._wait, args=(job,), daemon=True).start()
+
+    # waits for the files still being uploaded, and then for all of them to be parsed
+    def _wait(self, job):
+        with self.uploaded:
+            self.uploaded.wait_for(lambda: None not in job.futures)
+        concurrent.futures.wait(job.futures)
+        self.writer.submit(self._write, job)
+
+    # merges the records of all the files, in the order they were uploaded,
+    # and writes the output. The records are read from the files that the
+    # workers wrote, and kept on disk (see tech2xl.SpillReport), so the
+    # memory taken does not grow with the jobs nor with their files. Each
+    # file of records is removed once merged
+    def _write(self, job):
+        report = tech2xl.SpillReport()
+        try:
+            for number, future in enumerate(job.futures):
+                # a file that could not be parsed is reported in failed, the others are still written
+                if not future.cancelled() and future.exception() is None:
+                    report.update(_records(job.file(number)))
+                    os.remove(job.file(number) + records_suffix)
+
+            job.state = 'writing'
+            job.counts = dict(report.counts())
+            if job.counts['devices'] == 0:
+                raise ValueError("No device found")
+            tech2xl.write_report(report, job.output, job.format)
+            job.state = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.state = 'failed'
+        finally:
+            report.close()
+        job.futures = []
+        job.ended = time.time()
+
+    def delete(self, job):
+        with self.lock:
+            self.jobs.pop(job.id, None)
+        shutil.rmtree(job.directory, ignore_errors=True)
+
+    def _expire_loop(self):
+        while True:
+            time.sleep(expire_interval)
+            with self.lock:
+                self._expire()
+
+    # removes the jobs that ended, or stopped receiving files, more than
+    # job_lifetime seconds ago
+    def _expire(self):
+        for job in list(self.jobs.values()):
+            if (job.ended or (job.updated if job.state == 'receiving' else None) or time.time()) \
+                    < time.time() - job_lifetime:
+                del self.jobs[job.id]
+                shutil.rmtree(job.directory, ignore_errors=True)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    service = None
+
+    path_re = re.compile(r"/jobs(?:/([0-9a-f]+)(?:/(done|result|files/([^/]+)))?)?$")
+
+    def _answer(self, code, data=None):
+        body = json.dumps(data if data is not None else {}).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if code == 503:
+            self.send_header("Retry-After", "5")
+        self.end_headers()
+        self.wfile.write(body)
+
+    # returns (job, action, file name) of the path, or answers 404 and returns None
+    def _route(self):
+        url = urllib.parse.urlsplit(self.path)
+        m = self.path_re.match(url.path)
+        if m is None:
+            self._answer(404, {'error': "not found"})
+            return None
+
+        job = None
+        if m.group(1) is not None:
+            job = self.service.jobs.get(m.group(1))
+            if job is None:
+                self._answer(404, {'error': "no such job"})
+                return None
+
+        action = m.group(2)
+        if action is not None and action.startswith("files/"):
+            action = "files"
+        name = urllib.parse.unquote(m.group(3)) if m.group(3) else None
+        return job, action, name, urllib.parse.parse_qs(url.query)
+
+    def do_POST(self):
+        route = self._route()
+        if route is None:
+            return
+        job, action, name, query = route
+
+        if job is None:
+            format = query.get('format', ['xlsx'])[0]
+            if format not in content_types:
+                self._answer(400, {'error': "unknown format " + format})
+                return
+            job = self.service.create(format)
+            if job is None:
+                self._answer(503, {'error': "too many jobs"})
+                return
+            self._answer(201, job.status())
+
+        elif action == "done":
+            self.service.done(job)
+            self._answer(202, job.status())
+
+        else:
+            self._answer(405, {'error': "method not allowed"})
+
+    def do_PUT(self):
+        route = self._route()
+        if route is None:
+            return
+        job, action, name, query = route
+
+        if action != "files" or not name or "/" in name or name.startswith("."):
+            self._answer(400, {'error': "bad file name"})
+            return
+        if job.state != 'receiving':
+            self._answer(409, {'error': "job is not receiving files"})
+            return
+
+        try:
+            added = self.service.add_file(job, name, self.rfile, int(self.headers.get("Content-Length", 0)))
+        except Exception as e:
+            # the file is a failed one of the job (see Service.add_file)
+            self.close_connection = True
+            self._answer(500, {'error': "could not save the file: %s" % e})
+            return
+        if not added:
+            # the body was not read, so the connection cannot be used again
+            self.close_connection = True
+            self._answer(503, {'error': "too many files waiting"})
+            return
+        self._answer(201, job.status())
+
+    def do_GET(self):
+        route = self._route()
+        if route is None:
+            return
+        job, action, name, query = route
+
+        if job is None or action not in (None, "result"):
+            self._answer(405, {'error': "method not allowed"})
+            return
+
+        if action is None:
+            self._answer(200, job.status())
+            return
+
+        if job.state != 'done':
+            self._answer(409, job.status())
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_types.get(job.format, "application/octet-stream"))
+        self.send_header("Content-Length", str(os.path.getsize(job.output)))
+        self.send_header("Content-Disposition", "attachment; filename=output." + job.format)
+        self.end_headers()
+        with open(job.output, "rb") as infile:
+            shutil.copyfileobj(infile, self.wfile)
+
+    def do_DELETE(self):
+        route = self._route()
+        if route is None:
+            return
+        job, action, name, query = route
+
+        if job is None or action is not None:
+            self._answer(405, {'error': "method not allowed"})
+            return
+        self.service.delete(job)
+        self._answer(200)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="tech2xl_service")
+    parser.add_argument("--listen", default="127.0.0.1:8421", metavar="HOST:PORT", help="address of the service")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes, that is, files parsed at the same time")
+    parser.add_argument("--queue", type=int, default=100, help="maximum number of files waiting to be parsed")
+    parser.add_argument("--max-jobs", type=int, default=20, help="maximum number of open jobs")
+    parser.add_argument("--dir", help="directory for the uploaded files and the outputs")
+    args = parser.parse_args(argv)
+
+    directory = args.dir or tempfile.mkdtemp(prefix="tech2xl-service-")
+    os.makedirs(directory, exist_ok=True)
+
+    Handler.service = Service(directory, args.workers, args.queue, args.max_jobs)
+    host, port = args.listen.rsplit(":", 1)
+    server = Server((host, int(port)), Handler)
+    print("tech2xl service v%s listening on %s, files in %s" % (tech2xl.__version__, args.listen, directory))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+# Shared fixtures of the tests
+#
+# The captures in tests/data are small hand written outputs of the commands
+# that tech2xl supports: commands.txt has line commands of two devices,
+# showtech.txt a show tech of a router and tables.txt the tables of IOS,
+# NX-OS and older switches. expected.jsonl is the output of tech2xl for the
+# three of them, in that order: every way of parsing them must give it.
+
+import os
+import json
+import shutil
+
+import pytest
+
+import tech2xl
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+data_names = ["commands.txt", "showtech.txt", "tables.txt"]
+
+
+# Rows of a JSON Lines output (see JsonLinesWriter)
+def read_jsonl(filename):
+    with open(filename, encoding="utf-8") as infile:
+        return [json.loads(line) for line in infile]
+
+
+# Rows of every sheet of a report, as they would be written
+def report_rows(report):
+    return [(title, [[record[field] for field in fields] for record in records])
+            for title, fields, records in tech2xl.report_sheets(report)]
+
+
+# Type and values of each record, without its source
+def record_rows(records):
+    return [(type(record).__name__, list(record.values)) for record in records]
+
+
+# Runs tech2xl with the arguments, without the parse cache of the user
+def run(*args):
+    return tech2xl.main(["--no-cache"] + [str(arg) for arg in args])
+
+
+@pytest.fixture
+def expected():
+    return read_jsonl(os.path.join(data_dir, "expected.jsonl"))
+
+
+# Copies of the captures in a temporary directory, where the index and the
+# other files that tech2xl may write next to them do not touch tests/data
+@pytest.fixture
+def captures(tmp_path):
+    files = []
+    for name in data_names:
+        shutil.copy(os.path.join(data_dir, name), str(tmp_path / name))
+        files.append(str(tmp_path / name))
+    return files
@@ -0,0 +1,29 @@
+# The module as a library (see parse_stream and parse_file)
+
+import io
+import os
+import sys
+import subprocess
+
+import tech2xl
+from tests.conftest import data_dir
+
+
+# Importing the module writes nothing, and does not import the writers
+def test_import():
+    process = subprocess.run([sys.executable, "-c", "import sys, tech2xl; print(sorted(set(sys.modules) & "
+                                                    "{'xlwt', 'openpyxl', 'numpy'}))"],
+                             cwd=os.path.dirname(os.path.dirname(data_dir)), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    assert (process.returncode, process.stdout, process.stderr) == (0, "[]\n", "")
+
+
+# The records of each device are yielded when the next device starts
+def test_records_by_device():
+    capture = ("SW1#show version\n"
+               "Processor board ID FOC1\n"
+               "SW2#show version\n")
+    records = tech2xl.parse_stream(io.StringIO(capture))
+    first = next(records)
+    assert (type(first), first['Name'], first['System ID']) == (tech2xl.System, "SW1", "FOC1")
+    assert [(type(record), record['Name']) for record in records] == [(tech2xl.System, "SW2")]
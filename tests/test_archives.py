@@ -0,0 +1,74 @@
+# Archives parsed in worker processes (see _archive_jobs and _parse_member)
+
+import os
+import glob
+import tarfile
+import zipfile
+import tempfile
+
+import tech2xl
+from tests.conftest import record_rows
+
+
+def make_tar(directory, mode, members):
+    filename = os.path.join(str(directory), "captures.tar" + ("." + mode if mode else ""))
+    with tarfile.open(filename, "w:" + mode) as tar:
+        for number in range(members):
+            name = os.path.join(str(directory), "m%02d.txt" % number)
+            with open(name, "w") as outfile:
+                outfile.write("sw%02d#show version\nProcessor board ID FOC%04d\nsw%02d#\n" % (number, number, number))
+            tar.add(name, os.path.basename(name))
+    return filename
+
+
+# The members of an uncompressed tar are read by the workers at their offset
+def test_tar_offsets(tmp_path):
+    filename = make_tar(tmp_path, "", 3)
+    jobs = list(tech2xl._archive_jobs(filename, tech2xl.archive_type(filename), None))
+    assert [name for name, where in jobs] == ["m00.txt", "m01.txt", "m02.txt"]
+
+    with open(filename, "rb") as infile:
+        data = infile.read()
+    for name, (offset, size) in jobs:
+        with tech2xl.FileRange(filename, offset, size) as member:
+            assert member.read() == data[offset:offset + size]
+        with open(os.path.join(str(tmp_path), name), "rb") as infile:
+            assert data[offset:offset + size] == infile.read()
+
+
+# The members of a compressed tar are extracted to temporary files as the
+# workers need them: never more than the jobs submitted ahead, and none is
+# left at the end
+def test_compressed_tar_members(tmp_path, monkeypatch):
+    filename = make_tar(tmp_path, "gz", 30)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+    most = 0
+    records = []
+    for record in tech2xl.parse_files([filename], jobs=2):
+        most = max(most, len(glob.glob(os.path.join(str(tmp_path), "tech2xl-members-*", "*.member"))))
+        records.append(record)
+    assert 0 < most <= 2 * tech2xl.jobs_ahead
+    assert glob.glob(os.path.join(str(tmp_path), "tech2xl-members-*")) == []
+
+    assert record_rows(records) == record_rows(tech2xl.parse_file(filename))
+    assert [record['System ID'] for record in records] == ["FOC%04d" % number for number in range(30)]
+
+
+# The zip file opened for each member is closed, not left to the garbage collector
+def test_zip_closed(tmp_path, monkeypatch):
+    filename = str(tmp_path / "captures.zip")
+    with zipfile.ZipFile(filename, "w") as zf:
+        zf.writestr("sw1.txt", "sw1#show version\nProcessor board ID FOC1\nsw1#\n")
+
+    opened = []
+
+    class ZipFile(zipfile.ZipFile):
+        def __init__(self, *args, **kwargs):
+            super(ZipFile, self).__init__(*args, **kwargs)
+            opened.append(self)
+
+    monkeypatch.setattr(zipfile, "ZipFile", ZipFile)
+    records, stats, profile = tech2xl._parse_member(filename, tech2xl.archive_type(filename), "sw1.txt", None)
+    assert [record['System ID'] for record in records] == ["FOC1"]
+    assert [zf.fp for zf in opened] == [None]
@@ -0,0 +1,131 @@
+# The parse cache (see Cache and CacheEntry)
+
+import os
+import glob
+import pickle
+import shutil
+
+import tech2xl
+from tests.conftest import read_jsonl, record_rows
+
+
+def entries(directory):
+    return glob.glob(os.path.join(directory, "*" + tech2xl.cache_suffix + "*"))
+
+
+# The records of an entry are written and read in batches of cache_batch
+def test_batches(captures, tmp_path, monkeypatch):
+    monkeypatch.setattr(tech2xl, "cache_batch", 2)
+    cache = tech2xl.Cache(str(tmp_path / "cache"))
+    parsed = list(tech2xl.parse_files(captures[:1], cache=cache))
+    assert len(parsed) > 4
+
+    [entry] = entries(cache.directory)
+    batches = []
+    with open(entry, "rb") as infile:
+        assert pickle.load(infile) == captures[0]
+        while infile.tell() < os.path.getsize(entry):
+            batches.append(pickle.load(infile))
+    assert [len(batch) for batch in batches[:-1]] == [2] * (len(batches) - 1)
+
+    cached = list(tech2xl.parse_files(captures[:1], cache=cache))
+    assert cache.hits == 1
+    assert record_rows(cached) == record_rows(parsed)
+
+
+def test_spill(captures, expected, tmp_path):
+    cache = str(tmp_path / "cache")
+    for number in range(2):
+        out = str(tmp_path / ("out%d.jsonl" % number))
+        assert tech2xl.main([out, "--spill", "--cache-dir", cache] + captures) == 0
+        assert read_jsonl(out) == expected
+    assert len(entries(cache)) == 3
+
+
+# A file that is not read to its end leaves no entry
+def test_not_ended(captures, tmp_path):
+    cache = tech2xl.Cache(str(tmp_path / "cache"))
+    records = tech2xl.parse_files(captures[:1], cache=cache)
+    next(records)
+    records.close()
+    assert entries(cache.directory) == []
+
+
+def test_empty_file(tmp_path):
+    cache = tech2xl.Cache(str(tmp_path / "cache"))
+    empty = str(tmp_path / "empty.txt")
+    open(empty, "w").close()
+    assert list(tech2xl.parse_files([empty], cache=cache)) == []
+    assert list(tech2xl.parse_files([empty], cache=cache)) == []
+    assert cache.hits == 1
+
+
+# The entries are keyed by the content of the files: a copied, moved or
+# touched file is read from the cache, with its own name as source
+def test_key(captures, tmp_path):
+    cache = tech2xl.Cache(str(tmp_path / "cache"))
+    key = cache.key(captures[0])
+    assert key != cache.key(captures[0], ("latin-1", "strict"))
+
+    copy = str(tmp_path / "copy.txt")
+    shutil.copy(captures[0], copy)
+    assert cache.key(copy) == key
+    moved = str(tmp_path / "moved.txt")
+    os.rename(copy, moved)
+    os.utime(moved, (0, 0))
+    assert cache.key(moved) == key
+
+    parsed = list(tech2xl.parse_files(captures[:1], cache=cache))
+    cached = list(tech2xl.parse_files([moved], cache=cache))
+    assert cache.hits == 1
+    assert record_rows(cached) == record_rows(parsed)
+    assert set(record.source for record in cached) == {moved}
+
+    with open(moved, "ab") as outfile:
+        outfile.write(b"\n")
+    assert cache.key(moved) != key
+
+
+# The hash of a file whose stat did not change in the last cache_fresh
+# seconds is taken from cache_files, also in the next runs. Any write sets
+# the change time, even if the modification time is set back
+def test_key_stat(captures, tmp_path, monkeypatch):
+    monkeypatch.setattr(tech2xl, "cache_fresh", 0)
+    directory = str(tmp_path / "cache")
+    key = tech2xl.Cache(directory).key(captures[0])
+
+    cache = tech2xl.Cache(directory)
+    with monkeypatch.context() as patch:
+        patch.setattr(tech2xl, "open", None, raising=False)
+        assert cache.key(captures[0]) == key
+
+    info = os.stat(captures[0])
+    with open(captures[0], "r+b") as outfile:
+        outfile.write(b"X")
+    os.utime(captures[0], ns=(info.st_atime_ns, info.st_mtime_ns))
+    assert os.path.getsize(captures[0]) == info.st_size
+    assert tech2xl.Cache(directory).key(captures[0]) != key
+
+
+# The size of the cache is taken when it is opened and then counted, and the
+# directory is only scanned again when it grows over max_size
+def test_evict(captures, tmp_path, monkeypatch):
+    directory = str(tmp_path / "cache")
+    list(tech2xl.parse_files(captures, cache=tech2xl.Cache(directory)))
+    sizes = sorted(os.path.getsize(entry) for entry in entries(directory))
+
+    cache = tech2xl.Cache(directory, sum(sizes) + sizes[0])
+    assert cache.size == sum(sizes)
+
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: scans.append(path) or scandir(path))
+    for number in range(2):
+        name = str(tmp_path / ("copy%d.txt" % number))
+        with open(captures[1]) as infile, open(name, "w") as outfile:
+            outfile.write(infile.read() + "\n" * (number + 1))
+        list(tech2xl.parse_files([name], cache=cache))
+    # the first copy fits, the second one removes the entry used longest ago
+    assert len(scans) == 1
+    assert len(entries(directory)) == 4
+    assert cache.size == sum(os.path.getsize(entry) for entry in entries(directory)) <= cache.max_size
@@ -0,0 +1,72 @@
+# --snapshot and --diff-against
+
+import os
+
+import pytest
+
+from tests.conftest import read_jsonl, run
+
+
+@pytest.fixture
+def snapshot(captures, tmp_path):
+    filename = str(tmp_path / "snapshot")
+    assert run(tmp_path / "first.jsonl", "--snapshot", filename, *captures) == 0
+    return filename
+
+
+# Nothing changed, which is what most nightly runs find: the workbook still
+# has a sheet, the System one with only its header
+@pytest.mark.parametrize("extension", [".xlsx", ".xls"])
+def test_no_change(captures, snapshot, tmp_path, extension):
+    out = str(tmp_path / ("diff" + extension))
+    assert run(out, "--diff-against", snapshot, *captures) == 0
+
+    if extension == ".xlsx":
+        openpyxl = pytest.importorskip("openpyxl")
+        wb = openpyxl.load_workbook(out)
+        assert wb.sheetnames == ["System"]
+        rows = list(wb["System"].values)
+    else:
+        xlrd = pytest.importorskip("xlrd")
+        wb = xlrd.open_workbook(out)
+        assert wb.sheet_names() == ["System"]
+        rows = [wb.sheet_by_index(0).row_values(row) for row in range(wb.sheet_by_index(0).nrows)]
+    assert len(rows) == 1
+    assert list(rows[0][:3]) == ["Change", "Changes", "Name"]
+
+
+def test_no_change_jsonl(captures, snapshot, tmp_path):
+    assert run(tmp_path / "diff.jsonl", "--diff-against", snapshot, *captures) == 0
+    assert read_jsonl(str(tmp_path / "diff.jsonl")) == []
+
+
+def test_changes(captures, snapshot, tmp_path):
+    with open(captures[1]) as infile:
+        text = infile.read()
+    with open(captures[1], "w") as outfile:
+        outfile.write(text.replace("5 input errors", "12 input errors").replace("Uplink to ISP", "Uplink to ISP 2"))
+    # tables.txt is not parsed this time: its devices are removed
+    assert run(tmp_path / "diff.jsonl", "--diff-against", snapshot, *captures[:2]) == 0
+
+    rows = read_jsonl(str(tmp_path / "diff.jsonl"))
+    changed = [row for row in rows if row["Change"] == "changed"]
+    assert [(row["Name"], row["Interface"]) for row in changed] == [("R1", "GigabitEthernet0/0")]
+    assert changed[0]["Changes"] == "Description: Uplink to ISP -> Uplink to ISP 2, Input errors: 5 -> 12"
+    assert changed[0]["Input errors delta"] == 7
+    assert ("System", "removed", "NX1") in [(row["Sheet"], row["Change"], row["Name"]) for row in rows]
+    assert all(row["Change"] == "removed" for row in rows if row["Name"] in ("SW9", "NX1", "R5"))
+
+
+# A run without devices writes the diff: all the devices of the snapshot
+# were removed. The snapshot is kept as it was
+def test_all_removed(captures, snapshot, tmp_path):
+    empty = str(tmp_path / "empty.txt")
+    open(empty, "w").close()
+    mtime = os.path.getmtime(snapshot)
+    assert run(tmp_path / "diff.jsonl", "--diff-against", snapshot, "--snapshot", snapshot, empty) == 0
+
+    rows = read_jsonl(str(tmp_path / "diff.jsonl"))
+    assert set(row["Change"] for row in rows) == {"removed"}
+    assert sorted(row["Name"] for row in rows if row["Sheet"] == "System") == \
+        sorted(row["Name"] for row in read_jsonl(str(tmp_path / "first.jsonl")) if row["Sheet"] == "System")
+    assert os.path.getmtime(snapshot) == mtime
@@ -0,0 +1,61 @@
+# --encoding and --errors
+
+import os
+import asyncio
+
+import pytest
+
+import tech2xl
+from tests.conftest import read_jsonl, run
+
+
+def test_unknown_encoding(captures, tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit:
+        run(tmp_path / "out.jsonl", "--encoding", "no-such-encoding", *captures)
+    assert exit.value.code == 2
+    assert "unknown encoding no-such-encoding" in capsys.readouterr().err
+
+
+# With --errors strict, a file with an invalid byte is reported and the next
+# ones are parsed
+@pytest.mark.parametrize("options", [[], ["-j", "2"], ["-j", "2", "--chunk-size", "0"], ["--index"]])
+def test_strict(captures, expected, tmp_path, capsys, options):
+    bad = str(tmp_path / "bad.txt")
+    with open(bad, "wb") as outfile:
+        outfile.write(b"BAD#show version\nProcessor board ID \xff\xfe\nBAD#\n")
+    out = str(tmp_path / "out.jsonl")
+
+    assert run(out, "--encoding", "utf-8", "--errors", "strict", *([bad] + captures + options)) == 1
+    assert "Could not parse " + bad in capsys.readouterr().out
+    assert read_jsonl(out) == expected
+
+
+def test_strict_records(tmp_path):
+    bad = str(tmp_path / "bad.txt")
+    with open(bad, "wb") as outfile:
+        outfile.write(b"sw1#show version\nProcessor board ID FOC1\nsw1#show clock\n"
+                      b"sw2#show version\nProcessor board ID \xff\nsw2#\n")
+    failed = []
+    records = list(tech2xl.parse_files([bad], encoding="utf-8", errors="strict", failed=failed))
+    assert [record['Name'] for record in records] == ["sw1"]
+    assert [(filename, type(e)) for filename, e in failed] == [(bad, UnicodeDecodeError)]
+
+    with pytest.raises(UnicodeDecodeError):
+        list(tech2xl.parse_files([bad], encoding="utf-8", errors="strict"))
+
+
+# With --listen, the rest of an input with an invalid byte is left out
+def test_strict_listen(capsys):
+    report = tech2xl.Report()
+    server = tech2xl.Server(report, os.devnull, "jsonl", "utf-8", "strict")
+    loop = asyncio.new_event_loop()
+    try:
+        reader = asyncio.StreamReader(loop=loop)
+        reader.feed_data(b"sw1#show version\nProcessor board ID FOC1\nsw2#show version\nProcessor board ID \xff\n")
+        reader.feed_eof()
+        loop.run_until_complete(server._read(reader, "unix:test"))
+    finally:
+        loop.close()
+    assert "Could not parse unix:test" in capsys.readouterr().out
+    # the devices before the invalid byte are kept
+    assert report.counts()['devices'] == 2
@@ -0,0 +1,64 @@
+# Abbreviated commands and interface names (see expand and expand_string)
+
+import tech2xl
+
+
+# What expand did before the prefix tables: the first item that starts with s
+def scan(s, list):
+    for item in list:
+        if s.lower() == item.lower()[:len(s)]:
+            return item
+    return None
+
+
+def test_expand():
+    assert tech2xl.expand("sh", ["show", "shutdown"]) == "show"
+    assert tech2xl.expand("shu", ["show", "shutdown"]) == "shutdown"
+    assert tech2xl.expand("x", ["show"]) is None
+    assert tech2xl.expand_string("sh int status", tech2xl.commands) == "show interfaces status"
+    assert tech2xl.expand_string("sh ver extra words", tech2xl.commands) is None
+    assert tech2xl.table_interface("Gi1/0/1") == "GigabitEthernet1/0/1"
+    assert tech2xl.table_interface("Port 1") is None
+
+
+# A list with the id of one that no longer exists is not given its expansions
+def test_reused_id(monkeypatch):
+    monkeypatch.setattr(tech2xl, "_expanded", {})
+    monkeypatch.setattr(tech2xl, "_prefixes", {})
+    first = [["show"], ["version"]]
+    assert tech2xl.expand_string("sh ver", first) == "show version"
+
+    second = [["shutdown"], ["verbose"]]
+    # what a list created where the first one was would find
+    tech2xl._expanded[(id(second), "sh ver")] = tech2xl._expanded.pop((id(first), "sh ver"))
+    tech2xl._prefixes[id(second[0])] = tech2xl._prefixes[id(first[0])]
+    assert tech2xl.expand_string("sh ver", second) == "shutdown verbose"
+
+
+# The prefix table gives the item that the scan of the list would give, for
+# every prefix of the items and for words that are not prefixes
+def test_prefix_table():
+    lists = tech2xl.commands + [tech2xl.int_types]
+    for list in lists:
+        for word in list + ["", "X", "zz"]:
+            for end in range(len(word) + 2):
+                for s in (word[:end], word[:end].upper(), word[:end] + "x"):
+                    assert tech2xl.expand(s, list) == scan(s, list)
+
+
+# The strings expanded are kept until there are _expanded_size of them
+def test_memo(monkeypatch):
+    monkeypatch.setattr(tech2xl, "_expanded", {})
+    monkeypatch.setattr(tech2xl, "_expanded_size", 3)
+    assert tech2xl.expand_string("sh ver", tech2xl.commands) == "show version"
+    calls = []
+    expand = tech2xl.expand
+    monkeypatch.setattr(tech2xl, "expand", lambda s, list: calls.append(s) or expand(s, list))
+    assert tech2xl.expand_string("sh ver", tech2xl.commands) == "show version"
+    assert calls == []
+
+    for s in ("sh int", "sh cdp nei", "sh clock"):
+        tech2xl.expand_string(s, tech2xl.commands)
+    assert len(tech2xl._expanded) == 1
+    tech2xl.expand_string("sh ver", tech2xl.commands)
+    assert calls[-2:] == ["sh", "ver"]
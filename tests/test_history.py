@@ -0,0 +1,73 @@
+# --history (see CounterHistory)
+
+import sys
+import array
+import random
+
+import pytest
+
+import tech2xl
+
+day = 86400
+
+
+def trends(history, monkeypatch, numpy):
+    with monkeypatch.context() as patch:
+        if not numpy:
+            patch.setitem(sys.modules, "numpy", None)
+        return [list(trend.values) for trend in history.trends(days=30, top=0, now=10 * day)]
+
+
+# Appends a snapshot a day of the counters of each interface: counters[key]
+# has a list of values for each day, or None where the interface is missing
+def history_of(directory, counters):
+    history = tech2xl.CounterHistory(directory)
+    for number in range(max(len(values) for values in counters.values())):
+        keys = [key for key in sorted(counters) if counters[key][number] is not None]
+        history.append(keys, [array.array('q', [counters[key][number][i] for key in keys])
+                              for i in range(len(tech2xl.history_counters))], number * day)
+    return history
+
+
+def counters(input_errors, output_errors=0):
+    return [input_errors, 0, 0, 0, 0, output_errors, 0, 0]
+
+
+# A counter missing from a snapshot (-1) grows from its last known value to
+# the next one, and the errors per day of that increase are over both days
+@pytest.mark.parametrize("numpy", [True, False])
+def test_missing_value(tmp_path, monkeypatch, numpy):
+    if numpy:
+        pytest.importorskip("numpy")
+    history = history_of(str(tmp_path), {("sw1", "Gi1"): [counters(10, 0), counters(-1, 5), counters(30, 5)]})
+    [trend] = trends(history, monkeypatch, numpy)
+    fields = dict(zip(tech2xl.Trend.fields, trend))
+    assert fields['Snapshots'] == 3
+    assert fields['Errors'] == 25
+    assert fields['Input errors increase'] == 20
+    assert fields['Output errors increase'] == 5
+    assert fields['Counter resets'] == 0
+    assert fields['Peak errors per day'] == 10.0
+
+
+# NumPy and the row by row fallback give the same trends
+def test_numpy_fallback(tmp_path, monkeypatch):
+    pytest.importorskip("numpy")
+    rand = random.Random(1)
+    values = {}
+    for number in range(40):
+        key = ("sw%d" % (number % 7), "Gi%d" % number)
+        total = [0] * len(tech2xl.history_counters)
+        values[key] = []
+        for day_number in range(10):
+            total = [value + rand.choice([0, 0, 1, 5, 100]) for value in total]
+            if rand.random() < 0.1:
+                total = [0] * len(total)
+            if rand.random() < 0.1:
+                values[key].append(None)
+            else:
+                values[key].append([value if rand.random() > 0.2 else -1 for value in total])
+    history = history_of(str(tmp_path), values)
+    with_numpy = trends(history, monkeypatch, True)
+    assert len(with_numpy) > 20
+    assert trends(history, monkeypatch, False) == with_numpy
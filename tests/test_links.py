@@ -0,0 +1,63 @@
+# The Links sheet (see Report.links and _link_mismatch)
+
+import pytest
+
+import tech2xl
+from tests.conftest import report_rows
+
+
+@pytest.mark.parametrize("local, remote, mismatch", [("a-1000", "1000", False), ("a-full", "half", True),
+                                                     ("auto", "100", False), ("", "full", False),
+                                                     ("a-Full", "FULL", False), ("1000", "a-100", True),
+                                                     (10, "10", False), (10, 20, True)])
+def test_link_mismatch(local, remote, mismatch):
+    assert tech2xl._link_mismatch(local, remote) is mismatch
+    assert tech2xl._link_mismatch(remote, local) is mismatch
+
+
+def record(cls, key, **fields):
+    result = cls(key)
+    for field, value in fields.items():
+        result[field.replace('_', ' ').capitalize()] = value
+    return result
+
+
+def interface(name, item, speed="", duplex="", mode="", vlan=""):
+    return record(tech2xl.Interface, (name, item), name=name, interface=item, speed=speed, duplex=duplex,
+                  switchport_mode=mode, access_vlan=vlan)
+
+
+def neighbor(name, local, remote_name, remote):
+    return record(tech2xl.CDPNeighbor, (name + local + remote, remote_name), name=name, local_interface=local,
+                  remote_device_name=remote_name, remote_interface=remote)
+
+
+# A link seen from both ends is one row, and the fields of its ends that
+# differ are in Mismatch. The interfaces of the neighbors are found without
+# their spaces
+@pytest.mark.parametrize("report_type", [tech2xl.Report, tech2xl.SpillReport])
+def test_links(report_type):
+    report = report_type()
+    report.update([interface("SW1", "Gi1/0/1", "a-1000", "a-full", "trunk"),
+                   interface("SW2", "Gi1/0/1", "100", "a-half", "trunk"),
+                   interface("SW1", "Gi1/0/2", "a-1000", "full", "access", 10),
+                   interface("SW2", "Gi1/0/2", "1000", "auto", "trunk"),
+                   interface("SW1", "Gi1/0/3", "auto", "auto", "access", 10),
+                   interface("SW2", "Gi1/0/3", "1000", "full", "access", 20),
+                   neighbor("SW1", "Gi 1/0/1", "SW2", "Gi 1/0/1"),
+                   neighbor("SW2", "Gi 1/0/1", "SW1", "Gi 1/0/1"),
+                   neighbor("SW1", "Gi 1/0/2", "SW2", "Gi 1/0/2"),
+                   neighbor("SW1", "Gi 1/0/3", "SW2", "Gi 1/0/3"),
+                   neighbor("SW1", "Gi 1/0/4", "SW3", "Gi 0/1")])
+    rows = dict(report_rows(report))["Links"]
+    if report_type is tech2xl.SpillReport:
+        report.close()
+    fields = tech2xl.linkfields
+    assert [[row[fields.index(field)] for field in ("Name", "Interface", "Remote name", "Remote interface", "CDP",
+                                                     "Mismatch")] for row in rows] == [
+        ["SW1", "Gi1/0/1", "SW2", "Gi1/0/1", "both ends", "speed, duplex"],
+        ["SW1", "Gi1/0/2", "SW2", "Gi1/0/2", "one end", "switchport mode"],
+        ["SW1", "Gi1/0/3", "SW2", "Gi1/0/3", "one end", "vlan"],
+        ["SW1", "Gi1/0/4", "SW3", "Gi0/1", "one end", ""]]
+    assert rows[0][fields.index("Remote speed")] == "100"
+    assert rows[3][fields.index("Speed")] == ""
@@ -0,0 +1,240 @@
+# Every way of reading the captures must give the same output: the files one
+# by one, in worker processes, split in parts, with the index, as bytes or
+# text, from archives, received on a socket and kept on disk with --spill
+
+import io
+import os
+import sys
+import gzip
+import time
+import signal
+import socket
+import shutil
+import tarfile
+import zipfile
+import subprocess
+
+import pytest
+
+import tech2xl
+from tests.conftest import data_dir, read_jsonl, record_rows, report_rows, run
+
+
+def test_sequential(captures, expected, tmp_path):
+    assert run(tmp_path / "out.jsonl", *captures) == 0
+    assert read_jsonl(str(tmp_path / "out.jsonl")) == expected
+
+
+def test_expected_values(expected):
+    rows = dict(((row["Sheet"], row.get("Name"), row.get("Interface")), row) for row in expected)
+
+    r1 = rows[("System", "R1", None)]
+    assert (r1["Model"], r1["System ID"], r1["Image"]) == ("CISCO2911/K9", "FTX1234ABCD",
+                                                          "c2900-universalk9-mz.SPA.152-4.M6")
+
+    gi0 = rows[("Interfaces", "R1", "GigabitEthernet0/0")]
+    assert (gi0["Status"], gi0["Input errors"], gi0["CRC"], gi0["Duplex"]) == ("up", 5, 2, "auto-Full")
+
+    # the status table only fills what show interfaces and the configuration did not tell
+    gi1 = rows[("Interfaces", "SW1", "GigabitEthernet1/0/1")]
+    assert (gi1["Status"], gi1["Description"], gi1["Access vlan"]) == ("up", "Server A", "10")
+    gi2 = rows[("Interfaces", "SW1", "GigabitEthernet1/0/2")]
+    assert (gi2["Status"], gi2["Access vlan"]) == ("notconnect", "1")
+
+    subnets = [(row["Network"], row["Mask bits"], row["Devices"]) for row in expected if row["Sheet"] == "Subnets"]
+    assert ("10.1.1.0", 30, 2) in subnets
+
+    macs = [(row["Name"], row["Vlan"], row["Port"]) for row in expected if row["Sheet"] == "MAC addresses"]
+    assert ("NX1", "10", "Ethernet1/1") in macs
+    assert ("R5", "1", "FastEthernet0/1") in macs
+
+
+@pytest.mark.parametrize("options", [["-j", "2"], ["--index"], ["--sidecar"], ["--sidecar", "-j", "2"],
+                                     ["--spill"], ["--spill", "-j", "2"]])
+def test_options(captures, expected, tmp_path, options):
+    assert run(tmp_path / "out.jsonl", *(captures + options)) == 0
+    assert read_jsonl(str(tmp_path / "out.jsonl")) == expected
+
+    # the second run reads the index that the first one saved
+    if "--sidecar" in options:
+        assert all(os.path.exists(capture + tech2xl.index_suffix) for capture in captures)
+        assert run(tmp_path / "out2.jsonl", *(captures + options)) == 0
+        assert read_jsonl(str(tmp_path / "out2.jsonl")) == expected
+
+
+# The parts of a file split at its prompts and sections, parsed each in a
+# worker process, with and without the index. A device split in two parts
+# gives a record in each part, that the report merges
+@pytest.mark.parametrize("index", [False, True])
+def test_parts(captures, index):
+    sequential, parts = tech2xl.Report(), tech2xl.Report()
+    sequential.update(tech2xl.parse_files(captures))
+    assert len(tech2xl.split_file(captures[0], 512)) > 1
+    parts.update(tech2xl.parse_files(captures, jobs=2, part_size=512, index=index))
+    assert report_rows(parts) == report_rows(sequential)
+
+
+# The bytes of a file (see Parser.feed_bytes) and its text, with Windows and
+# old Mac line ends
+@pytest.mark.parametrize("end", ["\n", "\r\n", "\r"])
+def test_bytes_and_text(end):
+    for name in ["commands.txt", "showtech.txt", "tables.txt"]:
+        with open(os.path.join(data_dir, name), encoding="ascii") as infile:
+            text = infile.read().replace("\n", end)
+
+        from_text = record_rows(tech2xl.parse_stream(io.StringIO(text, newline="")))
+        from_bytes = record_rows(tech2xl.parse_stream(io.BytesIO(text.encode("ascii"))))
+        assert from_bytes == from_text
+        assert from_bytes == record_rows(tech2xl.parse_file(os.path.join(data_dir, name)))
+
+
+# A prompt left at the start of a line only once the terminal removes what
+# comes before it: text erased with backspaces, and an escape sequence that
+# sets the title of the window, after the output of a command without rules.
+# As bytes and text, with the index (see build_index), also kept in a
+# sidecar index, and parsed in parts in worker processes
+@pytest.mark.parametrize("before", ["show clo\b\b\b\b\b\b\b\b", "\x1b]0;SW1: ~\x07", "\x07"])
+def test_bytes_terminal(before, tmp_path):
+    with open(os.path.join(data_dir, "commands.txt"), encoding="ascii") as infile:
+        lines = infile.read().splitlines(True)
+    prompt = [number for number, line in enumerate(lines) if line.startswith("SW1#show interfaces")][0]
+    text = "".join(lines[:prompt] + ["SW1#show clock\n", "*10:00:00.000 UTC Mon Jan 1 2024\n", before + lines[prompt]]
+                   + lines[prompt + 1:])
+
+    from_text = record_rows(tech2xl.parse_stream(io.StringIO(text, newline="")))
+    from_bytes = record_rows(tech2xl.parse_stream(io.BytesIO(text.encode("ascii"))))
+    assert from_bytes == from_text
+    assert from_text == record_rows(tech2xl.parse_stream(io.StringIO("".join(lines), newline="")))
+
+    filename = str(tmp_path / "dirty.txt")
+    with open(filename, "w", encoding="ascii", newline="") as outfile:
+        outfile.write(text)
+    assert record_rows(tech2xl.parse_file(filename, index=True)) == from_text
+    assert record_rows(tech2xl.parse_file(filename, index=True, sidecar=True)) == from_text
+
+    sequential = tech2xl.Report()
+    sequential.update(tech2xl.parse_files([filename]))
+    assert len(tech2xl.split_file(filename, 256)) > 1
+    for index in (False, True):
+        parts = tech2xl.Report()
+        parts.update(tech2xl.parse_files([filename], jobs=2, part_size=256, index=index))
+        assert report_rows(parts) == report_rows(sequential)
+
+
+def make_archive(kind, captures, directory):
+    if kind == "gz":
+        files = []
+        for capture in captures:
+            with open(capture, "rb") as infile, gzip.open(capture + ".gz", "wb") as outfile:
+                shutil.copyfileobj(infile, outfile)
+            files.append(capture + ".gz")
+        return files
+
+    if kind == "zip":
+        filename = str(directory / "captures.zip")
+        with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as zf:
+            for capture in captures:
+                zf.write(capture, os.path.basename(capture))
+        return [filename]
+
+    filename = str(directory / ("captures." + kind))
+    with tarfile.open(filename, "w:" + kind.replace("tar", "").lstrip(".")) as tar:
+        for capture in captures:
+            tar.add(capture, os.path.basename(capture))
+    return [filename]
+
+
+@pytest.mark.parametrize("kind", ["gz", "zip", "tar", "tar.gz", "tar.xz"])
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_archives(captures, expected, tmp_path, kind, jobs):
+    archives = make_archive(kind, captures, tmp_path)
+    assert run(tmp_path / "out.jsonl", "-j", jobs, *archives) == 0
+    assert read_jsonl(str(tmp_path / "out.jsonl")) == expected
+
+
+# The records of a run are stored in the cache, and the next run reads them
+# from it instead of parsing the files again
+def test_cache(captures, expected, tmp_path, capsys):
+    cache = str(tmp_path / "cache")
+    for number in range(2):
+        out = str(tmp_path / ("out%d.jsonl" % number))
+        assert tech2xl.main([out, "--cache-dir", cache] + captures) == 0
+        assert read_jsonl(out) == expected
+    assert "3  files read from cache" in capsys.readouterr().out
+
+
+# Rows in an output that may be being written
+def written_rows(filename):
+    try:
+        return len(read_jsonl(filename))
+    except (IOError, ValueError):
+        return 0
+
+
+# tech2xl --listen, with the captures sent through a Unix socket or the
+# standard input. "cr" sends them with only "\r" as line end, after a line
+# longer than the blocks that are read, so all of it is a single long line.
+# SIGUSR1 writes the output, until it has all the rows, and SIGTERM ends it
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+@pytest.mark.parametrize("producer, end", [("socket", "\n"), ("socket", "\r"), ("stdin", "\r")])
+def test_listen(captures, expected, tmp_path, producer, end):
+    data = b""
+    for capture in captures:
+        with open(capture, "rb") as infile:
+            data += infile.read()
+    if end != "\n":
+        data = (b"x" * 100000 + b"\n" + data).replace(b"\n", end.encode("ascii"))
+
+    out = str(tmp_path / "out.jsonl")
+    address = str(tmp_path / "tech2xl.sock")
+    script = os.path.join(os.path.dirname(data_dir), os.pardir, "tech2xl.py")
+    inputs = ["-"] if producer == "stdin" else []
+    process = subprocess.Popen([sys.executable, script, out, "--no-cache", "--listen", "unix:" + address] + inputs,
+                               stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 20
+        while not os.path.exists(address):
+            assert time.time() < deadline and process.poll() is None
+            time.sleep(0.05)
+
+        if producer == "stdin":
+            process.stdin.write(data)
+        else:
+            client = socket.socket(socket.AF_UNIX)
+            client.connect(address)
+            client.sendall(data)
+            client.close()
+        process.stdin.close()
+
+        while written_rows(out) < len(expected):
+            assert time.time() < deadline
+            process.send_signal(signal.SIGUSR1)
+            time.sleep(0.2)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(20)
+
+    assert process.returncode == 0
+    assert read_jsonl(out) == expected
+
+
+# The lines before the first prompt are kept only if they may give something
+# once the name of the device is known: a long output without prompts does
+# not stay in memory
+def test_before_prompt():
+    parser = tech2xl.Parser()
+    for number in range(10000):
+        parser.feed("log line %d\n" % number)
+    parser.feed("------------------ show version ------------------\n")
+    parser.feed("Processor board ID FOC1\n")
+    parser.feed("------------------ show clock ------------------\n")
+    for number in range(10000):
+        parser.feed("*10:00:%02d UTC\n" % (number % 60))
+    assert len(parser.pending) == 3
+
+    parser.feed("------------------ show running-config ------------------\n")
+    parser.feed("hostname sw1\n")
+    parser.close()
+    assert parser.pending == []
+    assert [(record['Name'], record['System ID']) for record in parser.done if isinstance(record, tech2xl.System)] \
+        == [("sw1", "FOC1")]
@@ -0,0 +1,50 @@
+# --profile (see write_profile)
+
+import json
+
+import tech2xl
+from tests.conftest import run
+
+
+# The counters of a profile, without the seconds
+def counts(profile):
+    if isinstance(profile, dict):
+        return dict((key, counts(value)) for key, value in profile.items() if "seconds" not in key)
+    if isinstance(profile, list):
+        return [counts(value) for value in profile]
+    return profile
+
+
+def test_profile(captures, tmp_path):
+    out = str(tmp_path / "profile.json")
+    assert run(tmp_path / "out.jsonl", "--profile", out, *captures) == 0
+    with open(out) as infile:
+        profile = json.load(infile)
+
+    assert profile['version'] == tech2xl.__version__
+    assert [file['file'] for file in profile['files']] == captures
+    for file, capture in zip(profile['files'], captures):
+        with open(capture) as infile:
+            lines = len(infile.readlines())
+        assert file['cached'] is False
+        assert file['lines'] == lines
+        assert sum(section['lines'] for section in file['sections'].values()) == lines
+        assert sum(device['lines'] for device in file['devices'].values()) == lines
+
+    version = profile['files'][0]['sections']['show version']
+    assert version['rules']['image']['hits'] == 3
+    assert version['unmatched lines'] == 5
+    assert set(profile['files'][1]['devices']) == {"R1"}
+
+
+# The files parsed in parts have the same profile as when parsed at once
+def test_profile_parts(captures, tmp_path):
+    written = []
+    for options in ({}, {'jobs': 2, 'part_size': 256}):
+        files = []
+        list(tech2xl.parse_files(captures, profile=files, **options))
+        out = str(tmp_path / ("profile%d.json" % len(written)))
+        tech2xl.write_profile(out, files, 0, {}, 0)
+        with open(out) as infile:
+            written.append(counts(json.load(infile)))
+    assert written[0] == written[1]
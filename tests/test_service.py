@@ -0,0 +1,176 @@
+# tech2xl_service: jobs, uploads and the HTTP API
+
+import io
+import os
+import json
+import time
+import shutil
+import threading
+import http.client
+
+import pytest
+
+import tech2xl_service
+from tests.conftest import read_jsonl
+
+
+@pytest.fixture
+def service(tmp_path):
+    return tech2xl_service.Service(str(tmp_path / "service"), 2, 100, 20)
+
+
+def upload(service, job, filename, name=None):
+    with open(filename, "rb") as infile:
+        data = infile.read()
+    return service.add_file(job, name or os.path.basename(filename), io.BytesIO(data), len(data))
+
+
+def wait_done(job):
+    deadline = time.time() + 30
+    while job.state not in ('done', 'failed'):
+        assert time.time() < deadline
+        time.sleep(0.05)
+
+
+def test_job(service, captures, expected):
+    job = service.create('jsonl')
+    for capture in captures:
+        assert upload(service, job, capture)
+    service.done(job)
+    wait_done(job)
+
+    assert job.state == 'done'
+    assert read_jsonl(job.output) == expected
+    status = job.status()
+    assert (status['files'], status['parsed'], status['failed']) == (3, 3, [])
+    assert status['counts']['devices'] == 7
+    assert job.futures == []
+    # the files of records are removed once merged
+    assert os.listdir(os.path.join(job.directory, "files")) == ["%d-%s" % (number, os.path.basename(capture))
+                                                                for number, capture in enumerate(captures)]
+
+
+# The workers write the records of each file to disk, and send back only
+# their number, so the service does not keep them until the output is written
+def test_records_on_disk(service, captures):
+    job = service.create('jsonl')
+    assert upload(service, job, captures[0])
+    count = job.futures[0].result()
+    assert isinstance(count, int) and count > 0
+    assert len(list(tech2xl_service._records(job.file(0)))) == count
+
+
+# Files uploaded at the same time to the same job are all kept, each in its
+# own file, and merged in the order in which their upload started
+def test_concurrent_uploads(service, captures):
+    job = service.create('jsonl')
+    started = threading.Barrier(8)
+
+    class Slow(io.BytesIO):
+        def read(self, size=-1):
+            started.wait(10) if self.tell() == 0 else None
+            return super(Slow, self).read(size)
+
+    with open(captures[0], "rb") as infile:
+        data = infile.read()
+    threads = [threading.Thread(target=service.add_file, args=(job, "same.txt", Slow(data), len(data)))
+               for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    files = os.listdir(os.path.join(job.directory, "files"))
+    assert sorted(name for name in files if not name.endswith(tech2xl_service.records_suffix)) == \
+        ["%d-same.txt" % number for number in range(8)]
+    service.done(job)
+    wait_done(job)
+    assert job.status()['parsed'] == 8
+    assert job.state == 'done'
+
+
+def test_failed_file(service, captures, tmp_path):
+    job = service.create('jsonl')
+    broken = str(tmp_path / "broken.gz")
+    with open(broken, "wb") as outfile:
+        outfile.write(b"\x1f\x8b not really gzip")
+    assert upload(service, job, captures[0])
+    assert upload(service, job, broken)
+    service.done(job)
+    wait_done(job)
+
+    assert job.state == 'done'
+    assert job.status()['failed'] == ["broken.gz"]
+
+
+# Ended jobs are removed after job_lifetime seconds, also when no new job is created
+def test_expire(tmp_path, captures, monkeypatch):
+    monkeypatch.setattr(tech2xl_service, "job_lifetime", 0.2)
+    monkeypatch.setattr(tech2xl_service, "expire_interval", 0.1)
+    service = tech2xl_service.Service(str(tmp_path / "service"), 1, 100, 20)
+
+    job = service.create('jsonl')
+    assert upload(service, job, captures[0])
+    service.done(job)
+    wait_done(job)
+
+    deadline = time.time() + 10
+    while job.id in service.jobs or os.path.exists(job.directory):
+        assert time.time() < deadline
+        time.sleep(0.05)
+
+
+# Sends HTTP requests to a service listening on a free port
+@pytest.fixture
+def call(service):
+    tech2xl_service.Handler.service = service
+    server = tech2xl_service.Server(("127.0.0.1", 0), tech2xl_service.Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def request(method, path, body=None):
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=30)
+        connection.request(method, path, body)
+        response = connection.getresponse()
+        data = response.read()
+        connection.close()
+        return response.status, data
+
+    yield request
+    server.shutdown()
+    server.server_close()
+
+
+def test_http(service, call, captures, expected):
+    status, body = call("POST", "/jobs?format=jsonl")
+    assert status == 201
+    job = json.loads(body.decode("utf-8"))['id']
+    for capture in captures:
+        with open(capture, "rb") as infile:
+            assert call("PUT", "/jobs/%s/files/%s" % (job, os.path.basename(capture)), infile.read())[0] == 201
+    assert call("POST", "/jobs/%s/done" % job)[0] == 202
+
+    deadline = time.time() + 30
+    while json.loads(call("GET", "/jobs/" + job)[1].decode("utf-8"))['state'] != 'done':
+        assert time.time() < deadline
+        time.sleep(0.05)
+
+    status, body = call("GET", "/jobs/%s/result" % job)
+    assert status == 200
+    assert [json.loads(line) for line in body.decode("utf-8").splitlines()] == expected
+    assert call("DELETE", "/jobs/" + job)[0] == 200
+    assert call("GET", "/jobs/" + job)[0] == 404
+
+
+# A file that cannot be saved is answered with 500, and is a failed file of the job
+def test_http_save_error(service, call):
+    status, body = call("POST", "/jobs?format=jsonl")
+    job = service.jobs[json.loads(body.decode("utf-8"))['id']]
+    shutil.rmtree(os.path.join(job.directory, "files"))
+
+    status, body = call("PUT", "/jobs/%s/files/sw1.txt" % job.id, b"sw1#show version\n")
+    assert status == 500
+    assert "could not save the file" in json.loads(body.decode("utf-8"))['error']
+    deadline = time.time() + 10
+    while job.status()['failed'] != ["sw1.txt"]:
+        assert time.time() < deadline
+        time.sleep(0.05)
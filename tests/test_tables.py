@@ -0,0 +1,40 @@
+# Addresses that are not valid in the tables and the configuration
+
+import io
+
+import pytest
+
+import tech2xl
+from tests.conftest import report_rows
+
+
+@pytest.mark.parametrize("ip, expected", [("10.1.1.1", 0x0a010101), ("255.255.255.255", 0xffffffff),
+                                          ("10.1.1", None), ("10..1.1", None), ("10.1.1.256", None),
+                                          ("10.1.1.x", None), ("1.2.3.4.5", None), ("incomplete", None),
+                                          ("", None)])
+def test_ip_int(ip, expected):
+    assert tech2xl.ip_int(ip) == expected
+
+
+# The rows of show ip arp with something else than an address are left out,
+# and so are the interfaces configured with a malformed address from the
+# Subnets sheet
+def test_malformed_addresses():
+    capture = ("SW9#show ip arp\n"
+               "Protocol  Address          Age (min)  Hardware Addr   Type   Interface\n"
+               "Internet  10.1.1.1                -   0011.2233.4455  ARPA   Vlan10\n"
+               "Internet  10.1.1                  5   0011.2233.4466  ARPA   Vlan10\n"
+               "Internet  incomplete              -   0011.2233.4477  ARPA   Vlan10\n"
+               "Internet  10.1.1.300              -   0011.2233.4488  ARPA   Vlan10\n"
+               "SW9#show running-config\n"
+               "interface Vlan10\n"
+               " ip address 10.1.1.1 255.255.255.0\n"
+               "interface Vlan20\n"
+               " ip address 10..2.1 255.255.255.0\n"
+               "SW9#\n")
+    report = tech2xl.Report()
+    report.update(tech2xl.parse_stream(io.StringIO(capture)))
+    rows = dict(report_rows(report))
+
+    assert [row[1] for row in rows["ARP"]] == ["10.1.1.1"]
+    assert [row[0] for row in rows["Subnets"]] == ["10.1.1.0"]
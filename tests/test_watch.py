@@ -0,0 +1,61 @@
+# --watch (see Watcher)
+
+import os
+import shutil
+
+import pytest
+
+import tech2xl
+from tests.conftest import read_jsonl, run
+
+
+@pytest.fixture
+def watched(tmp_path):
+    directory = tmp_path / "watched"
+    directory.mkdir()
+    return str(directory)
+
+
+def write_jsonl(report, filename):
+    tech2xl.write_report(report, filename)
+    return filename
+
+
+# Each update parses the files added or changed since the last one, and
+# writes the output from the records of all the files
+def test_update(captures, expected, watched, tmp_path, capsys):
+    output = str(tmp_path / "out.jsonl")
+    watcher = tech2xl.Watcher(watched, output)
+    for capture in captures:
+        shutil.copy(capture, watched)
+    with open(os.path.join(watched, ".copying.txt"), "w") as outfile:
+        outfile.write("sw9#show version\n")
+    watcher.update()
+    assert read_jsonl(output) == expected
+    assert sorted(watcher.files) == sorted(os.path.basename(capture) for capture in captures)
+
+    parsed = []
+    watcher.parse = lambda filename: parsed.append(os.path.basename(filename)) or tech2xl.parse_file(filename)
+    os.remove(os.path.join(watched, "tables.txt"))
+    with open(os.path.join(watched, "commands.txt"), "a") as outfile:
+        outfile.write("\n")
+    watcher.update()
+    assert parsed == ["commands.txt"]
+    assert sorted(watcher.files) == ["commands.txt", "showtech.txt"]
+    assert "1 files parsed, 1 removed" in capsys.readouterr().out
+
+    report = tech2xl.Report()
+    report.update(tech2xl.parse_files(captures[:2]))
+    assert read_jsonl(output) == read_jsonl(write_jsonl(report, str(tmp_path / "two.jsonl")))
+
+    # nothing changed, nothing is written
+    os.remove(output)
+    watcher.update()
+    assert not os.path.exists(output)
+
+
+def test_watch_spill(watched, tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit:
+        run(tmp_path / "out.jsonl", "--watch", watched, "--spill")
+    assert exit.value.code == 2
+    assert "--spill cannot be used with --watch" in capsys.readouterr().err
@@ -0,0 +1,70 @@
+# The output formats (see write_report)
+
+import csv
+import sqlite3
+import collections
+
+import pytest
+
+import tech2xl
+from tests.conftest import run
+
+
+# The numbers are stored as numbers, not as text
+def test_sqlite_types(captures, tmp_path):
+    out = str(tmp_path / "out.db")
+    assert run(out, *captures) == 0
+
+    db = sqlite3.connect(out)
+    try:
+        rows = db.execute('SELECT typeof("Name"), typeof("Input errors"), typeof("CRC") FROM interfaces '
+                          'WHERE "Name" = ? AND "Interface" = ?', ("R1", "GigabitEthernet0/0")).fetchall()
+        assert rows == [("text", "integer", "integer")]
+        assert db.execute('SELECT typeof("Mask bits") FROM subnets').fetchone() == ("integer",)
+    finally:
+        db.close()
+
+
+# The floats are numeric cells in .xlsx files, as in .xls files
+def test_xlsx_numbers(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    out = str(tmp_path / "out.xlsx")
+    writer = tech2xl.XlsxWriter(out)
+    writer.write_sheet("Numbers", ["Name", "Count", "Rate"],
+                       [{"Name": "a", "Count": 3, "Rate": 0.25}, {"Name": "b", "Count": 0, "Rate": 1e-05},
+                        {"Name": "c", "Count": "", "Rate": float("inf")}])
+    writer.close()
+
+    rows = list(openpyxl.load_workbook(out)["Numbers"].values)
+    assert rows[1:] == [("a", 3, 0.25), ("b", 0, 1e-05), ("c", None, "inf")]
+
+
+# Each sheet is in its own CSV file, with the same rows as the other formats
+def test_csv(captures, expected, tmp_path):
+    assert run(tmp_path / "out.csv", *captures) == 0
+
+    sheets = collections.OrderedDict()
+    for row in expected:
+        sheets.setdefault(row.pop("Sheet"), []).append(row)
+    for title, rows in sheets.items():
+        with open(str(tmp_path / ("out_%s.csv" % title.replace(' ', '_'))), newline='', encoding="utf-8") as infile:
+            written = list(csv.reader(infile))
+        assert written[0] == list(rows[0])
+        assert written[1:] == [[str(value) for value in row.values()] for row in rows]
+
+
+# The tables of the SQLite database have the rows of the other formats
+def test_sqlite(captures, expected, tmp_path):
+    out = str(tmp_path / "out.db")
+    assert run(out, *captures) == 0
+
+    db = sqlite3.connect(out)
+    try:
+        written = []
+        for title, fields, records in tech2xl.report_sheets(tech2xl.Report()):
+            table = title.lower().replace(' ', '_')
+            for values in db.execute('SELECT * FROM "%s" ORDER BY rowid' % table):
+                written.append(dict([("Sheet", title)] + list(zip(fields, values))))
+        assert written == expected
+    finally:
+        db.close()
@@ -1,15 +1,57 @@
 <?php
-$target_dir = "uploads/" . date("YmdHis") . "-" . uniqid() . "/";
-mkdir($target_dir);
+// The files are parsed by tech2xl_service.py, which must be running:
+//   python3 tech2xl_service.py --listen 127.0.0.1:8421
+$service = "http://127.0.0.1:8421";
+$format = "xlsx";
 
+// Sends a request to the service, with the content of $file as body if given.
+// Retries while the service is busy (503). Returns array(HTTP code, body)
+function service_request($method, $url, $file = null, $output = null) {
+  for ($try = 0; $try < 60; $try++) {
+    $ch = curl_init($url);
+    curl_setopt($ch, CURLOPT_CUSTOMREQUEST, $method);
+    if ($output !== null) {
+      curl_setopt($ch, CURLOPT_FILE, $output);
+    } else {
+      curl_setopt($ch, CURLOPT_RETURNTRANSFER, true);
+    }
+    if ($file !== null) {
+      $fh = fopen($file, "rb");
+      curl_setopt($ch, CURLOPT_UPLOAD, true);
+      curl_setopt($ch, CURLOPT_INFILE, $fh);
+      curl_setopt($ch, CURLOPT_INFILESIZE, filesize($file));
+    }
+    $body = curl_exec($ch);
+    $code = curl_getinfo($ch, CURLINFO_HTTP_CODE);
+    curl_close($ch);
+    if ($file !== null) {
+      fclose($fh);
+    }
+
+    if ($code != 503) {
+      return array($code, $body);
+    }
+    sleep(5);
+  }
+  return array($code, $body);
+}
+
+list($code, $body) = service_request("POST", $service . "/jobs?format=" . $format);
+if ($code != 201) {
+  die("Error: tech2xl service is not available.");
+}
+$job = json_decode($body, true);
+$job_url = $service . "/jobs/" . $job["id"];
+
+// each file is sent to the service as soon as it is checked, and it starts being parsed while the next one is sent
 $uploadOk = 1;
 for($i=0; $i<count($_FILES["fileToUpload"]["name"]); $i++) {
-  $target_file = $target_dir . basename($_FILES["fileToUpload"]["name"][$i]);
+  $name = basename($_FILES["fileToUpload"]["name"][$i]);
 
 
   // Check file size
   if ($_FILES["fileToUpload"]["size"][$i] > 500000000) {
-    echo "Sorry, your file " . basename($_FILES["fileToUpload"]["name"][$i]) . " is too large.";
+    echo "Sorry, your file " . $name . " is too large.";
     $uploadOk = 0;
   }
 
@@ -18,11 +60,12 @@ for($i=0; $i<count($_FILES["fileToUpload"]["name"]); $i++) {
     echo "Sorry, your file was not uploaded.";
 
 
-  // if everything is ok, try to upload file
+  // if everything is ok, send the file to the service
   } else {
-    $moved=move_uploaded_file($_FILES["fileToUpload"]["tmp_name"][$i], $target_file);
-    if (!$moved) {
-      echo "Server error moving " . basename($_FILES["fileToUpload"]["name"][$i]);
+    list($code, $body) = service_request("PUT", $job_url . "/files/" . rawurlencode($name),
+                                         $_FILES["fileToUpload"]["tmp_name"][$i]);
+    if ($code != 201) {
+      echo "Server error sending " . $name;
       $uploadOk = 0;
     }
   }
@@ -30,28 +73,40 @@ for($i=0; $i<count($_FILES["fileToUpload"]["name"]); $i++) {
 
 if ($uploadOk == 1) {
 
-        ob_start();
-        passthru('/usr/bin/python3.4 /home/andres/git/tech2xl/tech2xl.py ' . $target_dir .  'output.xls ' . $target_dir . '*');
-        $output=ob_get_clean();
+        service_request("POST", $job_url . "/done");
+
+        // waits until the output is written
+        do {
+            usleep(500000);
+            list($code, $body) = service_request("GET", $job_url);
+            $status = json_decode($body, true);
+        } while ($code == 200 && ($status["state"] != "done" && $status["state"] != "failed"));
 
-        $attachment_location = $target_dir . "output.xls";
-        if (file_exists($attachment_location)) {
+        if ($code == 200 && $status["state"] == "done") {
 
+            $attachment_location = tempnam(sys_get_temp_dir(), "tech2xl");
+            $output = fopen($attachment_location, "wb");
+            service_request("GET", $job_url . "/result", null, $output);
+            fclose($output);
+            service_request("DELETE", $job_url);
 
             header($_SERVER["SERVER_PROTOCOL"] . " 200 OK");
             header("Cache-Control: public"); // needed for i.e.
             header("Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet");
             header("Content-Transfer-Encoding: Binary");
             header("Content-Length:".filesize($attachment_location));
-            header("Content-Disposition: attachment; filename=output.xls");
+            header("Content-Disposition: attachment; filename=output." . $format);
             readfile($attachment_location);
-            die();        
+            unlink($attachment_location);
+            die();
         } else {
-            die("Error: File not found.");
-        } 
+            service_request("DELETE", $job_url);
+            die("Error: " . ($status["error"] ? $status["error"] : "File not found."));
+        }
 
 
     } else {
+        service_request("DELETE", $job_url);
         echo "Not uploaded because of error";
     }
 